@@ -385,7 +385,7 @@ def SIMM(# the data to be fitted to:
             
             sumWM = np.sum(WM, axis=0)
             WM[:, sumWM>0] /= sumWM[sumWM>0]
-            HM *= sumWM
+            HM *= np.vstack(sumWM)
             
             SM = np.dot(WM, HM, out=SM) # np.maximum(np.dot(WM, HM), eps)
             hatSX = np.maximum(SF0 * SPHI + SM, eps)
@@ -34,12 +34,14 @@ Reference
 
 import numpy as np 
 from numpy.testing import assert_array_almost_equal # FOR DEBUG/DEV
-import warnings, os
+import warnings, os, tempfile, time, json, copy
+from multiprocessing.pool import ThreadPool
 
 import audioObject as ao
 import demixTF as demix
 
 import SeparateLeadStereo.SeparateLeadStereoTF as SLS
+from SeparateLeadStereo.tracking._tracking import viterbiTracking
 
 from sourcefilter.filter import generateHannBasis
 from spatial.steering_vectors import gen_steer_vec_far_src_uniform_linear_array
@@ -47,8 +49,12 @@ from spatial.steering_vectors import gen_steer_vec_far_src_uniform_linear_array
 import tftransforms.tft as tft # loads the possible transforms
 
 import tools.signalTools as st
-from tools.signalTools import inv_herm_mat_2d
-from tools.nmf import NMF_decomp_init, NMF_decomposition
+from tools.signalTools import inv_herm_mat_2d, inv_herm_mat, unpack_herm_mat
+from tools.signalTools import solve_mat
+from tools.nmf import NMF_decomp_init, NMF_decomposition, NMF_multi_restart
+from tools.utils import flatten_tree, unflatten_tree
+from tools.profiling import IterationProfiler
+from specCompStore import SpecCompStore
 
 tftransforms = {
     'stftold': tft.TFTransform, # just making dummy, in FASST, not used
@@ -104,6 +110,131 @@ class FASST(object):
         number of bins per octave, for Constant-Q-based representations
     :param double lambdaCorr:
         penalization term to control the correlation between the sources.
+    :param str suffStatEngine:
+        the implementation used to compute the sufficient statistics in
+        :py:meth:`FASST.compute_suff_stat`, either `'loop'` (loops over the
+        pairs of sub-sources) or `'einsum'` (all the sub-sources at once,
+        with stacked tensor contractions, see
+        :py:meth:`FASST.compute_suff_stat_einsum`). This only concerns
+        stereo signals: for any other number of channels,
+        :py:meth:`FASST.compute_suff_stat_nchan` is used.
+    :param dtype:
+        the floating point type of the arrays of the model (signal
+        representation, parameters and statistics), either `numpy.float64`
+        (default) or `numpy.float32`. The complex arrays are then
+        respectively `numpy.complex128` and `numpy.complex64`. In single
+        precision, the memory footprint is halved, and the floor values
+        (see :py:attr:`FASST.eps`) are adapted.
+    :param integer frameBlockSize:
+        if not `None`, the GEM algorithm is run block by block of
+        `frameBlockSize` frames (see :py:meth:`FASST.GEM_iteration_blocked`),
+        and the (`nbFreqsSigRepr` x `nbFramesSigRepr`) arrays,
+        :py:attr:`FASST.Cx` in particular, are stored in memory-mapped
+        temporary files. The memory then grows with the block size instead
+        of the signal length. The separation methods also compute the Wiener
+        filters block by block (see
+        :py:meth:`FASST.iter_separate_comps_blocked`), but the transforms
+        of the channels are still computed and inverted one full channel
+        at a time.
+    :param str memmapDir:
+        the directory for the memory-mapped temporary files, with
+        `frameBlockSize`. If `None`, the default temporary directory.
+    :param double tol:
+        if not `None`, relative tolerance on the log-likelihood: the
+        estimation in :py:meth:`FASST.estim_param_a_post_model` is
+        considered as converged when the relative improvement of the
+        log-likelihood has been lower than `tol` for `patience`
+        consecutive iterations.
+    :param integer patience:
+        number of consecutive iterations without sufficient improvement
+        before convergence is declared.
+    :param double maxTime:
+        if not `None`, the wall-clock budget, in seconds, for
+        :py:meth:`FASST.estim_param_a_post_model`.
+    :param callback:
+        if not `None`, a function called after each GEM iteration, as
+        ``callback(model, i, loglik)``, with `model` the FASST instance,
+        `i` the iteration index and `loglik` its log-likelihood. The
+        estimation is aborted if it returns `True`.
+    :param str checkpointFile:
+        if not `None`, the ``.npz`` file where the estimation state is
+        saved by :py:meth:`FASST.save_state`, at the beginning and at the end
+        of :py:meth:`FASST.estim_param_a_post_model`, and every
+        `checkpointEvery` iterations. The estimation can then be resumed
+        with :py:meth:`FASST.resume_estimation`.
+    :param integer checkpointEvery:
+        number of GEM iterations between two saves of the estimation state.
+    :param str cxCacheFile:
+        if not `None`, a ``.npy`` file where :py:attr:`FASST.Cx` is stored
+        once computed, along with its description, in the file with the
+        suffix ``.json``. If the file already exists, and if it was computed
+        from the same audio signal with the same parameters, it is loaded
+        (memory-mapped) instead of computing the signal representation.
+        Otherwise, it is computed and saved again.
+    :param integer nbThreads:
+        if more than 1, the number of threads used to update concurrently
+        the spectral components of different spatial components, in
+        :py:meth:`FASST.update_spectral_components`. The resulting
+        parameters are the same as with the sequential updates.
+    :param bool keepTransf:
+        if `True`, the transforms of the channels computed by
+        :py:meth:`FASST.comp_transf_Cx` are kept in
+        :py:attr:`FASST.mixTransf`, and reused by the separation methods
+        instead of being computed again (see
+        :py:meth:`FASST.comp_mix_transf`). This costs the memory of
+        another `nchannels` (`nbFreqsSigRepr` x `nbFramesSigRepr`)
+        complex arrays.
+    :param double mixStatFraction:
+        if not `None`, the fraction of the frames, between 0 and 1, on which
+        the statistics for the mixing parameters, `hat_Rxs` and `hat_Rss`,
+        are computed at each GEM iteration (see
+        :py:meth:`FASST.draw_stat_frames`). These noisy estimates are then
+        averaged over the iterations, with decaying steps (see
+        :py:meth:`FASST.average_mix_stats`). The expected powers, for the
+        updates of the spectral parameters, are still computed on all the
+        frames.
+    :param str mixStatSampling:
+        how the frames are drawn, with `mixStatFraction`: either
+        `'uniform'`, or `'energy'`, with probabilities proportional to the
+        energy of the frames.
+    :param double mixStatDecay:
+        exponent of the decay of the averaging steps, with
+        `mixStatFraction`: the estimates at iteration `t` (starting at 0)
+        are averaged with the step ``(t + 1) ** (- mixStatDecay)``.
+    :param str acceleration:
+        if `'squarem'`, the GEM iterations of
+        :py:meth:`FASST.estim_param_a_post_model` are accelerated by
+        extrapolating the trajectories of the free parameters, see
+        :py:meth:`FASST.GEM_iteration_squarem`.
+    :param bool stackSpecComps:
+        if `True`, the factors of the spectral components with the same
+        shapes are stacked in contiguous arrays at the beginning of
+        :py:meth:`FASST.estim_param_a_post_model` (see
+        :py:meth:`FASST.stack_spec_comps`), and their powers are computed
+        with batched matrix products.
+    :param bool compactCx:
+        if `True`, and for more than one channel, :py:attr:`FASST.Cx` is a
+        :py:class:`pyfasst.tools.signalTools.PackedCx`: the diagonal
+        elements of the covariance matrices, the powers of the channels,
+        are stored in real arrays, and only the off-diagonal elements in
+        complex arrays. This saves a third of the memory for stereo
+        signals, and the products with the powers are real. The cache
+        file `cxCacheFile` keeps the complex packed layout: when loaded, it
+        is copied in the compact layout in memory-mapped temporary files
+        (in `memmapDir`), and not in memory.
+    :param list profileSinks:
+        if not `None`, the sinks receiving, after each GEM iteration, the
+        record of the durations, memory and array sizes of its stages
+        (see :py:class:`pyfasst.tools.profiling.IterationProfiler`): any
+        callable taking the record as argument, such as
+        :py:class:`pyfasst.tools.profiling.JSONLinesSink`.
+    :param integer stateBlockSize:
+        the number of discrete states whose powers are evaluated at once,
+        for the factors with the time constraints `'GMM'`, `'GSMM'`,
+        `'HMM'` and `'SHMM'` (see
+        :py:meth:`FASST.comp_state_IS_divergences`). The memory then
+        grows as `stateBlockSize` (`nbFreqsSigRepr` x `nbFramesSigRepr`)
+        arrays.
     
     Some important attributes of this class are:
     
@@ -141,7 +272,19 @@ class FASST(object):
         The computed transform, after :py:meth:`FASST.omp_transf_Cx` has been
         called. For memory management, as of 20130820, :py:attr:`FASST.Cx`,
         for a given frame and given frequency, is supposed to be Hermitian:
-        only the upper diagonal is therefore kept. 
+        only the upper diagonal is therefore kept. With `compactCx`, the
+        diagonal elements are stored as real arrays, see
+        :py:class:`pyfasst.tools.signalTools.PackedCx`.
+        
+    :var double eps:
+        the minimum value for the powers and the denominators in the
+        updates. In single precision, it is raised such that its square
+        stays a normal floating point number.
+        
+    :var dict estim_state:
+        the state of :py:meth:`FASST.estim_param_a_post_model`: iteration
+        counter, log-likelihoods, position in the annealing schedule and
+        stopping criteria variables.
         
     For examples, see also:
 
@@ -155,6 +298,13 @@ class FASST(object):
     # for now only stft:
     implemented_transf = ['stft','stftold', 'mqt', 'minqt', 'cqt']
     implemented_annealing = ['ann', 'no_ann', ]
+    implemented_suff_stat_engines = ['loop', 'einsum', ]
+    implemented_dtypes = [np.float64, np.float32, ]
+    implemented_mix_stat_samplings = ['uniform', 'energy', ]
+    implemented_accelerations = [None, 'squarem', ]
+    # attributes saved by save_state:
+    state_attributes = ['spat_comps', 'spec_comps', 'noise', 'estim_state',
+                        'mix_stats', 'accel_state', ]
     
     def __init__(self,
                  audio,
@@ -170,7 +320,28 @@ class FASST(object):
                  tffmax=18000,
                  tfWinFunc=None,
                  tfbpo=48,
-                 lambdaCorr=0.):
+                 lambdaCorr=0.,
+                 suffStatEngine='loop',
+                 dtype=np.float64,
+                 frameBlockSize=None,
+                 memmapDir=None,
+                 tol=None,
+                 patience=1,
+                 maxTime=None,
+                 callback=None,
+                 checkpointFile=None,
+                 checkpointEvery=None,
+                 cxCacheFile=None,
+                 nbThreads=None,
+                 keepTransf=False,
+                 mixStatFraction=None,
+                 mixStatSampling='uniform',
+                 mixStatDecay=0.6,
+                 acceleration=None,
+                 stackSpecComps=False,
+                 compactCx=False,
+                 profileSinks=None,
+                 stateBlockSize=8):
         """**FASST**: Flexible Audio Source Separation Toolbox
         
         """
@@ -178,6 +349,21 @@ class FASST(object):
         self.verbose = verbose
         self.nmfUpdateCoeff = nmfUpdateCoeff
         
+        if suffStatEngine not in self.implemented_suff_stat_engines:
+            raise NotImplementedError(suffStatEngine
+                                      + " engine not yet implemented.")
+        self.suffStatEngine = suffStatEngine
+        
+        if np.dtype(dtype) not in self.implemented_dtypes:
+            raise NotImplementedError(str(dtype)
+                                      + " precision not yet implemented.")
+        self.dtype = np.dtype(dtype)
+        self.complexDtype = np.result_type(self.dtype, np.complex64)
+        self.eps = max(eps, np.finfo(self.dtype).tiny ** .25)
+        
+        self.frameBlockSize = frameBlockSize
+        self.memmapDir = memmapDir
+        
         if isinstance(audio, ao.AudioObject):
             self.audioObject = audio
         elif isinstance(audio, str) or isinstance(audio, unicode):
@@ -237,20 +423,66 @@ class FASST(object):
         
         # noise parameters
         self.noise = {}
-        self.noise['PSD'] = np.zeros(self.sig_repr_params['fsize']/2+1)
+        self.noise['PSD'] = np.zeros(self.sig_repr_params['fsize']/2+1,
+                                     dtype=self.dtype)
         self.noise['sim_ann_opt'] = sim_ann_opt
-        self.noise['ann_PSD_lim'] = ann_PSD_lim
+        # copy, not to modify the default argument in comp_transf_Cx:
+        self.noise['ann_PSD_lim'] = list(ann_PSD_lim)
         
         self.spat_comps = {}
         self.spec_comps = {}
         
         self.iter_num = iter_num
         self.lambdaCorr = lambdaCorr
+        
+        # stopping criteria for estim_param_a_post_model:
+        self.tol = tol
+        self.patience = patience
+        self.maxTime = maxTime
+        self.callback = callback
+        
+        self.checkpointFile = checkpointFile
+        self.checkpointEvery = checkpointEvery
+        self.cxCacheFile = cxCacheFile
+        
+        self.nbThreads = nbThreads
+        self.keepTransf = keepTransf
+        
+        if mixStatSampling not in self.implemented_mix_stat_samplings:
+            raise NotImplementedError(mixStatSampling
+                                      + " sampling not yet implemented.")
+        self.mixStatFraction = mixStatFraction
+        self.mixStatSampling = mixStatSampling
+        self.mixStatDecay = mixStatDecay
+        # averaged statistics for the mixing parameters, see
+        # average_mix_stats:
+        self.mix_stats = None
+        
+        if acceleration not in self.implemented_accelerations:
+            raise NotImplementedError(str(acceleration)
+                                      + " acceleration not yet implemented.")
+        self.acceleration = acceleration
+        # past parameters, for the extrapolation of GEM_iteration_squarem:
+        self.accel_state = None
+        
+        self.stackSpecComps = stackSpecComps
+        self.spec_comp_store = None
+        
+        self.compactCx = compactCx
+        
+        # instrumentation of the GEM iterations:
+        self.profiler = IterationProfiler(profileSinks)
+        
+        self.stateBlockSize = stateBlockSize
     
     def comp_transf_Cx(self):
         """Computes the signal representation, according
         to the provided signal representation flag, in
         :py:attr:`FASST.sig_repr_params['transf']`
+        
+        If :py:attr:`FASST.cxCacheFile` is provided, :py:attr:`FASST.Cx` is
+        saved in that file once computed, or, if the file exists, loaded
+        from it as a read-only memory-mapped array.
         """
         if not hasattr(self.audioObject, '_data'):
             self.audioObject._read()
@@ -259,74 +491,251 @@ class FASST(object):
             raise ValueError(self.sig_repr_params['transf'] +
                              " not implemented - yet?")
         
+        nc = self.audioObject.channels
+        cached_Cx = self.load_Cx_cache()
+        if cached_Cx is not None:
+            self.Cx = cached_Cx
+            # the transforms are not cached:
+            self.mixTransf = None
+            self.nbFreqsSigRepr, self.nbFramesSigRepr = self.Cx.shape[-2:]
+            del self.audioObject.data
+            if self.compactCx and nc > 1:
+                # copied in memory-mapped files, as the cache:
+                self.Cx = self.create_packed_Cx(packedCx=self.Cx,
+                                                memmap=True)
+        else:
+            self.comp_Cx_from_signal()
+            if self.cxCacheFile is not None and \
+                   isinstance(self.Cx, st.PackedCx):
+                # the cache keeps the complex packed layout, written
+                # element after element:
+                cache = np.lib.format.open_memmap(
+                    self.cxCacheFile, mode='w+', dtype=self.complexDtype,
+                    shape=self.Cx.shape)
+                for n in range(len(self.Cx)):
+                    cache[n] = self.Cx[n]
+                del cache
+            elif self.cxCacheFile is not None:
+                np.save(self.cxCacheFile, self.Cx)
+            if self.cxCacheFile is not None:
+                with open(self.cxCacheFile + '.json', 'w') as fileobj:
+                    json.dump(self.Cx_cache_description(self.Cx.shape),
+                              fileobj)
+        
+        if self.noise['ann_PSD_lim'][0] is None or \
+               self.noise['ann_PSD_lim'][1] is None:
+            mix_psd = 0
+            # average power, for each frequency band, across the frames
+            if nc == 1:
+                mix_psd += np.mean(self.Cx, axis=1)
+            else:
+                for n1 in range(nc):
+                    n = np.sum(np.arange(nc, nc-n1, -1)) # n2 = n1
+                    mix_psd += np.mean(self.Cx[n], axis=1)
+                    
+            if self.verbose>1:
+                print "mix_psd", mix_psd
+            mix_psd /= nc
+            if self.verbose>1:
+                print "mix_psd/nc", mix_psd
+            if self.noise['ann_PSD_lim'][0] is None:
+                self.noise['ann_PSD_lim'][0] = np.real(mix_psd) / 100.
+            if self.noise['ann_PSD_lim'][1] is None:
+                self.noise['ann_PSD_lim'][1] = np.real(mix_psd) / 10000.
+        if self.noise['sim_ann_opt'] in ('ann'):
+            self.noise['PSD'] = self.noise['ann_PSD_lim'][0]
+    
+    def Cx_cache_description(self, shape):
+        """Returns the description of :py:attr:`FASST.Cx`, of the given
+        `shape`, stored next to the cache :py:attr:`FASST.cxCacheFile`, in
+        the file with the suffix ``.json``: the signal representation
+        parameters, the audio file and signal, and the shape and type of the
+        array.
+        """
+        sig_repr = dict(self.sig_repr_params)
+        # the window function, by name:
+        sig_repr['tfWinFunc'] = getattr(sig_repr['tfWinFunc'], '__name__',
+                                        str(sig_repr['tfWinFunc']))
+        description = {
+            'sig_repr': sig_repr,
+            'filename': self.audioObject.filename,
+            'samplerate': self.audioObject.samplerate,
+            'channels': self.audioObject.channels,
+            'nframes': self.audioObject.nframes,
+            'dtype': np.dtype(self.complexDtype).name,
+            'shape': [int(dim) for dim in shape],}
+        # as read back from the file:
+        return json.loads(json.dumps(description))
+    
+    def load_Cx_cache(self):
+        """Loads, memory-mapped and read-only, the covariance matrices
+        cached in :py:attr:`FASST.cxCacheFile`, if they have been computed
+        for the same audio signal and signal representation parameters,
+        according to the description stored next to it (see
+        :py:meth:`FASST.Cx_cache_description`). Returns `None` otherwise,
+        and the cache is then computed again.
+        """
+        if self.cxCacheFile is None or \
+               not os.path.isfile(self.cxCacheFile):
+            return None
+        try:
+            with open(self.cxCacheFile + '.json') as fileobj:
+                description = json.load(fileobj)
+        except (IOError, ValueError):
+            description = None
+        Cx = np.load(self.cxCacheFile, mmap_mode='r')
+        if description != self.Cx_cache_description(Cx.shape):
+            if self.verbose:
+                print ("The signal representation in", self.cxCacheFile,
+                       "does not match the parameters, computed again")
+            del Cx
+            return None
+        if self.verbose:
+            print ("Loading the signal representation from",
+                   self.cxCacheFile)
+        return Cx
+    
+    def comp_Cx_from_signal(self):
+        """Computes the transforms of the channels of the audio signal, and
+        the corresponding (upper diagonal of the) covariance matrices
+        :py:attr:`FASST.Cx`. Called by :py:meth:`FASST.comp_transf_Cx`.
+        """
         if self.verbose:
             print ("Computing the chosen signal representation:",
                    self.sig_repr_params['transf'] )
         
         nc = self.audioObject.channels
+        # for mono signals, the data is 1D:
+        data = self.audioObject.data.reshape(self.audioObject.nframes, nc)
         Xchan = []
         for n in range(nc):
             if self.sig_repr_params['transf'] == 'stftold':
                 X, freqs, times = ao.stft(
-                    self.audioObject.data[:,n],
+                    data[:,n],
                     window=np.hanning(self.sig_repr_params['wlen']),
                     hopsize=self.sig_repr_params['hopsize'],
                     nfft=self.sig_repr_params['fsize'],
                     fs=self.audioObject.samplerate
                     )
             else:
-                self.tft.computeTransform(self.audioObject.data[:,n],)
+                self.tft.computeTransform(data[:,n],)
                 X = self.tft.transfo
-            Xchan.append(X)
+            if self.frameBlockSize is None:
+                Xchan.append(X.astype(self.complexDtype, copy=False))
+            else:
+                # only one channel at a time in memory:
+                Xchan.append(self.create_memmap(X.shape, self.complexDtype))
+                Xchan[n][:] = X
             
         if self.verbose>1:
             print X.shape
         
         self.nbFreqsSigRepr, self.nbFramesSigRepr = X.shape
         ##assert self.nbFreqsSigRepr == self.tft.freqbins
-        del X
+        del X, data
         del self.audioObject.data
         
         if nc == 1:
-            self.Cx = np.abs(Xchan[0])**2
+            Cx_shape = [self.nbFreqsSigRepr, self.nbFramesSigRepr]
+            Cx_dtype = self.dtype
         else:
-            self.Cx = np.zeros([nc * (nc + 1) / 2,
-                                self.nbFreqsSigRepr,
-                                self.nbFramesSigRepr],
-                               dtype=complex)
+            Cx_shape = [nc * (nc + 1) / 2,
+                        self.nbFreqsSigRepr,
+                        self.nbFramesSigRepr]
+            Cx_dtype = self.complexDtype
+        if self.compactCx and nc > 1:
+            self.Cx = self.create_packed_Cx()
+        elif self.frameBlockSize is None:
+            self.Cx = np.zeros(Cx_shape, dtype=Cx_dtype)
+        else:
+            self.Cx = self.create_memmap(Cx_shape, Cx_dtype)
+        
+        for frames in self.frame_blocks():
+            if nc == 1:
+                self.Cx[:,frames] = np.abs(Xchan[0][:,frames])**2
+                continue
             for n1 in range(nc):
                 for n2 in range(n1, nc):
                     # note : we keep only upper diagonal of Cx
                     # lower diagonal is conjugate of upper one.
                     n = n2 - n1 + np.sum(np.arange(nc, nc-n1, -1))
-                    self.Cx[n] = Xchan[n1] * np.conj(Xchan[n2])
-        
-        if self.noise['ann_PSD_lim'][0] is None or \
-               self.noise['ann_PSD_lim'][1] is None:
-            mix_psd = 0
-            # average power, for each frequency band, across the frames
-            if nc == 1:
-                mix_psd += np.mean(self.Cx, axis=1)
-            else:
-                for n1 in range(nc):
-                    n = np.sum(np.arange(nc, nc-n1, -1)) # n2 = n1
-                    mix_psd += np.mean(self.Cx[n], axis=1)
-                    
-            if self.verbose>1:
-                print "mix_psd", mix_psd
-            mix_psd /= nc
-            if self.verbose>1:
-                print "mix_psd/nc", mix_psd
-            if self.noise['ann_PSD_lim'][0] is None:
-                self.noise['ann_PSD_lim'][0] = np.real(mix_psd) / 100.
-            if self.noise['ann_PSD_lim'][1] is None:
-                self.noise['ann_PSD_lim'][1] = np.real(mix_psd) / 10000.
-        if self.noise['sim_ann_opt'] in ('ann'):
-            self.noise['PSD'] = self.noise['ann_PSD_lim'][0]
-        
+                    if n1 == n2:
+                        self.Cx[n][:,frames] = (
+                            np.abs(Xchan[n1][:,frames])**2)
+                        continue
+                    self.Cx[n][:,frames] = (
+                        Xchan[n1][:,frames] * np.conj(Xchan[n2][:,frames]))
+        
+        if self.keepTransf:
+            # reused by the separation methods, see comp_mix_transf:
+            self.mixTransf = Xchan
         # useless for the rest of computations:
         del Xchan
     
+    def create_packed_Cx(self, packedCx=None, memmap=False):
+        """Allocates :py:attr:`FASST.Cx` with the compact layout of
+        :py:class:`pyfasst.tools.signalTools.PackedCx`, in memory-mapped
+        temporary files with :py:attr:`FASST.frameBlockSize` or if `memmap`
+        is `True`. If provided, the elements of the packed ndarray
+        `packedCx` are copied in it.
+        """
+        nc = self.audioObject.channels
+        diag_shape = [nc, self.nbFreqsSigRepr, self.nbFramesSigRepr]
+        off_shape = [nc * (nc - 1) / 2,
+                     self.nbFreqsSigRepr, self.nbFramesSigRepr]
+        if self.frameBlockSize is None and not memmap:
+            diag = np.zeros(diag_shape, dtype=self.dtype)
+            off = np.zeros(off_shape, dtype=self.complexDtype)
+        else:
+            diag = self.create_memmap(diag_shape, self.dtype)
+            off = self.create_memmap(off_shape, self.complexDtype)
+        if packedCx is None:
+            return st.PackedCx(diag, off)
+        return st.PackedCx.from_packed(packedCx, diag=diag, off=off)
+    
+    def create_memmap(self, shape, dtype):
+        """Allocates an array of the given `shape` and `dtype`, in a
+        memory-mapped temporary file in :py:attr:`FASST.memmapDir`. The
+        file is deleted when the array is.
+        """
+        return np.memmap(tempfile.TemporaryFile(dir=self.memmapDir),
+                         dtype=dtype, mode='w+', shape=tuple(shape))
+    
+    def frame_blocks(self):
+        """Generates the slices of frames to process, as blocks of
+        :py:attr:`FASST.frameBlockSize` frames. A single slice with all the
+        frames if :py:attr:`FASST.frameBlockSize` is `None`.
+        """
+        if self.frameBlockSize is None:
+            yield slice(0, self.nbFramesSigRepr)
+            return
+        for start in range(0, self.nbFramesSigRepr, self.frameBlockSize):
+            yield slice(start,
+                        min(start + self.frameBlockSize,
+                            self.nbFramesSigRepr))
+    
+    def get_Cx(self, frames=None):
+        """Returns :py:attr:`FASST.Cx` or, if the slice `frames` is
+        provided, the corresponding frames of :py:attr:`FASST.Cx`, loaded
+        in memory.
+        """
+        if frames is None:
+            return self.Cx
+        if isinstance(self.Cx, st.PackedCx):
+            return self.Cx[..., frames].copy()
+        return np.array(self.Cx[..., frames])
+    
+    def comp_mono_Cx(self):
+        """Computes the monaural signal representation, the powers of the
+        channels (the diagonal of :py:attr:`FASST.Cx`) averaged over the
+        channels, for the NMF initializations.
+        """
+        nc = self.audioObject.channels
+        if nc == 1:
+            return np.array(self.Cx, dtype=self.dtype)
+        return np.mean(st.herm_mat_diag(self.Cx, nc), axis=0,
+                       dtype=self.dtype)
+    
     def estim_param_a_post_model(self,):
         """Estimates the `a posteriori` model for the provided
         audio signal. In particular, this runs self.iter_num times
@@ -343,43 +752,389 @@ class FASST(object):
         Consider using :py:meth:`FASST.separate_spat_comps` or
         :py:meth:`FASST.separate_spatial_filter_comp` to obtain the separated time
         series, once the parameters have been estimated.
+        
+        The estimation stops earlier if the log-likelihood has converged
+        (see :py:attr:`FASST.tol` and :py:attr:`FASST.patience`), if the
+        time budget :py:attr:`FASST.maxTime` is exhausted, or if
+        :py:attr:`FASST.callback` returns `True`. With annealing, the
+        remaining annealing schedule is then compressed rather than cut
+        off: when the log-likelihood converges before the end of the
+        schedule, or when the time budget does not allow the remaining
+        iterations, the noise PSD decreases faster, such that the last
+        iterations are still run with the final noise PSD of the schedule.
+        
+        After each GEM iteration, :py:meth:`FASST.post_GEM_iteration` is
+        called with the progress in the schedule, for the subclasses to
+        update their own parameters.
+        
+        The state of the estimation is kept in
+        :py:attr:`FASST.estim_state`, and saved in
+        :py:attr:`FASST.checkpointFile`, if provided (see
+        :py:meth:`FASST.save_state` and :py:meth:`FASST.resume_estimation`).
 
         :returns:
-            `logliks`: The log-likelihoods as computed after each GEM iteration.
+            `logliks`: The log-likelihoods as computed after each GEM
+            iteration that was run.
         
         """
         
-        logliks = np.ones(self.iter_num)
+        if self.stackSpecComps:
+            self.stack_spec_comps()
         
         # TODO: move this back in __init__, and remove from subclasses...
         if self.noise['sim_ann_opt'] in ['ann', ]:
             self.noise['PSD'] = self.noise['ann_PSD_lim'][0]
-        elif self.noise['sim_ann_opt'] is 'no_ann':
+        elif self.noise['sim_ann_opt'] == 'no_ann':
             self.noise['PSD'] = self.noise['ann_PSD_lim'][1]
         else:
             warnings.warn("To add noise to the signal, provide the "+
                           "sim_ann_opt from any of 'ann', "+
                           "'no_ann' or 'ann_ns_inj' ")
+        
+        self.init_estim_state()
+        
+        return self.run_GEM_iterations()
+    
+    def init_estim_state(self, schedPos=0.):
+        """Initializes :py:attr:`FASST.estim_state`, for a new estimation
+        starting at the position `schedPos` in the annealing schedule, and
+        saves it in :py:attr:`FASST.checkpointFile`, if provided.
+        """
+        # 'sched_pos' is the position in the annealing schedule, going
+        # from 0 to its end by 'sched_step' at each iteration, unless the
+        # schedule is compressed:
+        self.estim_state = {
+            'iter': 0,
+            'logliks': np.ones(self.iter_num),
+            'sched_pos': schedPos,
+            'sched_step': 1. / max(self.iter_num, 1),
+            'nb_stalls': 0,
+            'elapsed': 0.,
+            'stopped': False,
+            }
+        self.mix_stats = None
+        self.accel_state = None
+        if self.checkpointFile is not None:
+            self.save_state()
+    
+    def estim_param_coarse_to_fine(self, decimation=4, fineIterNum=5):
+        """Estimates the parameters as
+        :py:meth:`FASST.estim_param_a_post_model`, first on a signal
+        representation decimated in time, then at full resolution.
+        
+        The :py:attr:`FASST.iter_num` iterations of the estimation schedule,
+        with the annealing, are run on the representation
+        :py:attr:`FASST.Cx` averaged over groups of `decimation` frames,
+        with time weights `TW` (or time blobs `TB`) averaged accordingly.
+        Each iteration then costs about `decimation` times less. The time
+        weights are then repeated over the frames of their groups, and
+        `fineIterNum` GEM iterations are run on the full resolution
+        representation, with the noise PSD at the end of the schedule.
+        
+        Only implemented for NMF time constraints, that is `TW_constr` is
+        ``'NMF'`` for all the factors. The checkpoints, if any, are only
+        saved during the full resolution iterations.
+        
+        :returns:
+            `logliks_coarse`: the log-likelihoods of the decimated
+            representation, after each GEM iteration at low resolution.
             
-        for i in range(self.iter_num):
+            `logliks`: the log-likelihoods after each GEM iteration at full
+            resolution.
+        """
+        for spec_comp in self.spec_comps.values():
+            for factor in spec_comp['factor'].values():
+                if factor['TW_constr'] != 'NMF':
+                    raise NotImplementedError(
+                        "Coarse to fine estimation only implemented for "+
+                        "NMF time weights.")
+        
+        Cx = self.Cx
+        nbFrames = self.nbFramesSigRepr
+        checkpointFile = self.checkpointFile
+        # the first frames of the groups, and their sizes:
+        groups = np.arange(0, nbFrames, decimation)
+        sizes = np.diff(np.append(groups, nbFrames))
+        # averaged over the groups, keeping the type (real for mono):
+        decimate = lambda array: (
+            np.asarray(np.add.reduceat(array, groups, axis=-1)) /
+            sizes).astype(array.dtype)
+        if isinstance(Cx, st.PackedCx):
+            self.Cx = Cx.map(decimate)
+        else:
+            self.Cx = decimate(Cx)
+        self.nbFramesSigRepr = groups.size
+        self.checkpointFile = None
+        self.map_time_params(decimate)
+        try:
+            logliks_coarse = self.estim_param_a_post_model()
+        finally:
+            self.Cx = Cx
+            self.nbFramesSigRepr = nbFrames
+            self.checkpointFile = checkpointFile
+            self.map_time_params(
+                lambda array: np.repeat(array, sizes, axis=-1))
+        
+        # at full resolution, the schedule is over:
+        iter_num = self.iter_num
+        sim_ann_opt = self.noise['sim_ann_opt']
+        self.iter_num = fineIterNum
+        self.noise['sim_ann_opt'] = 'no_ann'
+        self.noise['PSD'] = self.noise['ann_PSD_lim'][1]
+        try:
+            self.init_estim_state(
+                schedPos=(self.iter_num - 1.) / max(self.iter_num, 1))
+            logliks = self.run_GEM_iterations()
+        finally:
+            self.iter_num = iter_num
+            self.noise['sim_ann_opt'] = sim_ann_opt
+        
+        return logliks_coarse, logliks
+    
+    def map_time_params(self, function):
+        """Replaces the frame dependent parameters of the factors of the
+        spectral components, the time blobs `TB` if any, otherwise the time
+        weights `TW`, by `function` applied to them. `function` should only
+        change their last axis, the frames.
+        
+        The factors stacked in :py:attr:`FASST.spec_comp_store` are
+        modified in the stacked arrays (see
+        :py:meth:`pyfasst.specCompStore.SpecCompStore.map_time_params`),
+        and stay stacked.
+        """
+        modified = set()
+        if self.spec_comp_store is not None:
+            modified = self.spec_comp_store.map_time_params(function,
+                                                            self.spec_comps)
+        for k, spec_comp in self.spec_comps.items():
+            for f, factor in spec_comp['factor'].items():
+                if (k, f) in modified:
+                    continue
+                timeParam = 'TB' if len(factor['TB']) else 'TW'
+                factor[timeParam] = function(factor[timeParam])
+    
+    def resume_estimation(self, filename=None):
+        """Resumes the estimation of :py:meth:`FASST.estim_param_a_post_model`
+        from the state saved in `filename` (by default,
+        :py:attr:`FASST.checkpointFile`), see :py:meth:`FASST.load_state`.
+        The model should have been instantiated with the same parameters,
+        and its signal representation computed (possibly loaded from
+        :py:attr:`FASST.cxCacheFile`).
+        
+        :returns:
+            `logliks`: The log-likelihoods of all the GEM iterations, since
+            the beginning of the estimation.
+        """
+        self.load_state(filename)
+        return self.run_GEM_iterations()
+    
+    def run_GEM_iterations(self,):
+        """Runs the GEM iterations from the current
+        :py:attr:`FASST.estim_state`, until :py:attr:`FASST.iter_num`
+        iterations have been run or a stopping criterion is met. See
+        :py:meth:`FASST.estim_param_a_post_model`.
+        
+        :returns:
+            `logliks`: The log-likelihoods as computed after each GEM
+            iteration that was run.
+        """
+        state = self.estim_state
+        logliks = state['logliks']
+        schedEnd = (self.iter_num - 1.) / max(self.iter_num, 1)
+        startTime = time.time() - state['elapsed']
+        for i in range(state['iter'], self.iter_num):
+            if state['stopped']:
+                break
             if self.verbose:
                 print "Iteration", i+1, "on", self.iter_num
             # adding the noise psd if required:
             if self.noise['sim_ann_opt'] in ['ann', 'ann_ns_inj']:
                 self.noise['PSD'] = (
-                    (np.sqrt(self.noise['ann_PSD_lim'][0]) *
-                     (self.iter_num - i) +
-                     np.sqrt(self.noise['ann_PSD_lim'][1]) * i) /
-                    self.iter_num) ** 2
+                    np.sqrt(self.noise['ann_PSD_lim'][0]) *
+                    (1. - state['sched_pos']) +
+                    np.sqrt(self.noise['ann_PSD_lim'][1]) *
+                    state['sched_pos']) ** 2
                 
             # running the GEM iteration:
-            logliks[i] = self.GEM_iteration()
+            if self.acceleration == 'squarem':
+                logliks[i] = self.GEM_iteration_squarem()
+            else:
+                logliks[i] = self.GEM_iteration()
+            state['iter'] = i + 1
+            state['elapsed'] = time.time() - startTime
             if self.verbose:
                 print "    log-likelihood:", logliks[i]
                 if i>0:
                     print "        improvement:", logliks[i]-logliks[i-1]
-
-        return logliks
+            
+            self.post_GEM_iteration(
+                state['sched_pos'] / schedEnd if schedEnd > 0 else 0.)
+            
+            # stopping criteria:
+            if self.callback is not None and \
+                   self.callback(self, i, logliks[i]):
+                if self.verbose:
+                    print "    aborted by the callback."
+                state['stopped'] = True
+            
+            # number of iterations left to reach the end of the schedule:
+            nbRemaining = self.iter_num - state['iter']
+            if self.tol is not None and i > 0:
+                improvement = ((logliks[i] - logliks[i-1]) /
+                               max(np.abs(logliks[i-1]), self.eps))
+                if improvement < self.tol:
+                    state['nb_stalls'] += 1
+                else:
+                    state['nb_stalls'] = 0
+                if state['nb_stalls'] >= self.patience:
+                    if state['sched_pos'] >= schedEnd:
+                        if self.verbose:
+                            print "    converged."
+                        state['stopped'] = True
+                    else:
+                        # finishing the schedule within patience iterations:
+                        nbRemaining = min(nbRemaining, self.patience)
+                        state['nb_stalls'] = 0
+            if self.maxTime is not None:
+                nbAffordable = int((self.maxTime - state['elapsed']) /
+                                   (state['elapsed'] / state['iter']))
+                if nbAffordable <= 0:
+                    if self.verbose:
+                        print "    time budget exhausted."
+                    state['stopped'] = True
+                nbRemaining = min(nbRemaining, nbAffordable)
+            
+            if nbRemaining > 0:
+                state['sched_step'] = max(
+                    state['sched_step'],
+                    (schedEnd - state['sched_pos']) / nbRemaining)
+            state['sched_pos'] = min(state['sched_pos'] + state['sched_step'],
+                                     schedEnd)
+            
+            if self.checkpointFile is not None and (
+                state['stopped'] or state['iter'] == self.iter_num or
+                (self.checkpointEvery and
+                 state['iter'] % self.checkpointEvery == 0)):
+                self.save_state()
+            
+        return logliks[:state['iter']]
+    
+    def save_state(self, filename=None):
+        """Saves the estimation state in the ``.npz`` archive `filename`
+        (by default, :py:attr:`FASST.checkpointFile`): the attributes
+        listed in :py:attr:`FASST.state_attributes` and the state of the
+        random number generator, such that a resumed estimation continues
+        exactly where it was saved.
+        
+        The nested dictionaries are flattened with
+        :py:func:`pyfasst.tools.utils.flatten_tree`. The archive is first
+        written to a temporary file, then renamed, so that an interrupted
+        save does not corrupt the previous one.
+        """
+        if filename is None:
+            filename = self.checkpointFile
+        if self.verbose>1:
+            print "Saving the estimation state in", filename
+        state = dict((attr, getattr(self, attr))
+                     for attr in self.state_attributes
+                     if hasattr(self, attr))
+        state['random_state'] = np.random.get_state()
+        skeleton, arrays = flatten_tree(state)
+        tmpFilename = filename + '.tmp'
+        with open(tmpFilename, 'wb') as fileobj:
+            np.savez(fileobj, skeleton=json.dumps(skeleton), **arrays)
+        os.rename(tmpFilename, filename)
+    
+    def load_state(self, filename=None):
+        """Loads the estimation state saved by :py:meth:`FASST.save_state`
+        in `filename` (by default, :py:attr:`FASST.checkpointFile`).
+        """
+        if filename is None:
+            filename = self.checkpointFile
+        if self.verbose:
+            print "Loading the estimation state from", filename
+        archive = np.load(filename)
+        skeleton = json.loads(str(archive['skeleton']))
+        arrays = dict((key, archive[key])
+                      for key in archive.files if key != 'skeleton')
+        archive.close()
+        state = unflatten_tree(skeleton, arrays)
+        np.random.set_state(state.pop('random_state'))
+        for attr, value in state.items():
+            setattr(self, attr, value)
+    
+    def warm_start(self, spec_comps, spat_comps):
+        """Initializes the parameters with the spectral and spatial
+        components `spec_comps` and `spat_comps` of a model fitted on
+        another signal, for instance loaded from a
+        :py:class:`pyfasst.modelStore.ModelStore`, so that the GEM
+        algorithm starts close to a solution.
+        
+        The components are copied, and the time dependent parameters
+        are adapted to the number of frames of this signal: the time
+        weights `TW` (or the time blobs `TB`, if any), and the weights of
+        the discrete states `TW_all`, are set to their average over the
+        frames of the fitted signal. The other parameters, as well as the
+        degrees of freedom, are kept.
+        
+        The representations should be the same: an `AttributeError` is
+        raised if the number of channels or of frequency bins do not match.
+        """
+        nc = self.audioObject.channels
+        for spat_comp in spat_comps.values():
+            if spat_comp['mix_type'] == 'conv':
+                # rank x nchannels x nbFreqsSigRepr
+                shape = spat_comp['params'].shape[1:]
+            else:
+                # nchannels x rank
+                shape = (spat_comp['params'].shape[0], self.nbFreqsSigRepr)
+            if shape != (nc, self.nbFreqsSigRepr):
+                raise AttributeError("Size of provided spatial parameters"+
+                                     " is not consistent with inner"+
+                                     " attributes")
+        for spec_comp in spec_comps.values():
+            for factor in spec_comp['factor'].values():
+                if factor['FB'].shape[0] != self.nbFreqsSigRepr:
+                    raise AttributeError("Size of provided FB is not"+
+                                         " consistent with inner attributes")
+        
+        self.spat_comps = copy.deepcopy(spat_comps)
+        for spat_comp in self.spat_comps.values():
+            spat_comp['params'] = np.asarray(
+                spat_comp['params'],
+                dtype=np.result_type(spat_comp['params'], self.dtype))
+        self.spec_comps = copy.deepcopy(spec_comps)
+        for spec_comp in self.spec_comps.values():
+            for factor in spec_comp['factor'].values():
+                factor['FB'] = np.asarray(factor['FB'], dtype=self.dtype)
+                factor['FW'] = np.asarray(factor['FW'], dtype=self.dtype)
+                if len(factor['TB']):
+                    factor['TW'] = np.asarray(factor['TW'], dtype=self.dtype)
+                    factor['TB'] = np.outer(
+                        np.mean(factor['TB'], axis=1),
+                        np.ones(self.nbFramesSigRepr)).astype(self.dtype)
+                else:
+                    factor['TW'] = np.outer(
+                        np.mean(factor['TW'], axis=1),
+                        np.ones(self.nbFramesSigRepr)).astype(self.dtype)
+                if 'TW_all' in factor:
+                    # the weights of the discrete states, per frame:
+                    factor['TW_all'] = np.outer(
+                        np.mean(factor['TW_all'], axis=1),
+                        np.ones(self.nbFramesSigRepr)).astype(self.dtype)
+        
+        self.renormalize_parameters()
+    
+    def post_GEM_iteration(self, progress):
+        """Called by :py:meth:`FASST.estim_param_a_post_model` after each
+        GEM iteration, with `progress` the position in the estimation
+        schedule, from 0 (first iteration) to 1 (end of the schedule).
+        
+        Does nothing here: subclasses can overload it to update
+        parameters that are not estimated by the GEM iterations (see
+        :py:meth:`multiChanSourceF0Filter.post_GEM_iteration`).
+        """
+        pass
     
     def GEM_iteration(self,):
         """GEM iteration: one iteration of the Generalized Expectation-
@@ -390,45 +1145,402 @@ class FASST(object):
             `loglik` (double): the log-likelihood of the data,
             given the updated parameters
         
+        If :py:attr:`FASST.frameBlockSize` is set, the iteration is
+        delegated to :py:meth:`FASST.GEM_iteration_blocked`.
+        
         """
-        if self.audioObject.channels==2:
+        if self.frameBlockSize is not None:
+            return self.GEM_iteration_blocked()
+        
+        profiler = self.profiler
+        profiler.start()
+        with profiler.stage('retrieve_subsrc_params') as stage:
             spat_comp_powers, mix_matrix, rank_part_ind = (
                 self.retrieve_subsrc_params())
-            
-            # compute the sufficient statistics
+            stage.add_arrays(spat_comp_powers, mix_matrix)
+        
+        # compute the sufficient statistics
+        with profiler.stage('compute_suff_stat') as stage:
+            statFrames, statWeights = self.draw_stat_frames()
             hat_Rxx, hat_Rxs, hat_Rss, hat_Ws, loglik = (
-                self.compute_suff_stat(spat_comp_powers, mix_matrix))
+                self.compute_suff_stat(spat_comp_powers, mix_matrix,
+                                       statFrames=statFrames,
+                                       statWeights=statWeights))
+            if statFrames is not None:
+                hat_Rxs, hat_Rss = self.average_mix_stats(hat_Rxs, hat_Rss)
+            stage.add_arrays(hat_Rxx, hat_Rxs, hat_Rss, hat_Ws)
+        
+        # update the mixing matrix
+        with profiler.stage('update_mix_matrix'):
+            self.update_mix_matrix(hat_Rxs, hat_Rss, mix_matrix,
+                                   rank_part_ind)
+        
+        # from sub-sources to sources
+        # (as given by the different spatial comps)
+        #     had better have shape = [nbSpatComps,F,N]
+        hat_W = np.zeros([len(rank_part_ind),
+                          self.nbFreqsSigRepr,
+                          self.nbFramesSigRepr], dtype=self.dtype)
+        if self.verbose > 1:
+            print "rank_part_in", rank_part_ind
+        for w in range(len(rank_part_ind)):
+            hat_W[w] = np.mean(hat_Ws[rank_part_ind[w]], axis=0)
+            
+        del spat_comp_powers, mix_matrix, rank_part_ind
+        del hat_Rxx, hat_Rxs, hat_Rss, hat_Ws
+        
+        # update the spectral parameters
+        with profiler.stage('update_spectral_components') as stage:
+            self.update_spectral_components(hat_W)
+            stage.add_arrays(hat_W)
+        
+        # normalize parameters
+        with profiler.stage('renormalize_parameters'):
+            self.renormalize_parameters()
+        
+        profiler.finish(loglik, iteration=self.current_iteration())
+        return loglik
+    
+    def GEM_iteration_blocked(self,):
+        """GEM iteration, processing the frames by blocks of
+        :py:attr:`FASST.frameBlockSize` frames, see
+        :py:meth:`FASST.GEM_iteration`.
+        
+        The sufficient statistics `hat_Rxx`, `hat_Rxs`, `hat_Rss` and the
+        log-likelihood, which are averages over the frames, are accumulated
+        block by block, and the expected powers `hat_W` are written in a
+        memory-mapped array, which is then given to
+        :py:meth:`FASST.update_spectral_components_blocked`. Only the arrays
+        for one block of frames are kept in memory.
+        
+        :returns:
+            `loglik` (double): the log-likelihood of the data,
+            given the updated parameters
+        
+        """
+        hat_Rxx = 0.
+        hat_Rxs = 0.
+        hat_Rss = 0.
+        loglik = 0.
+        hat_W = None
+        profiler = self.profiler
+        profiler.start()
+        for frames in self.frame_blocks():
+            if self.verbose>1:
+                print "    Frames", frames.start, "to", frames.stop
+            with profiler.stage('retrieve_subsrc_params') as stage:
+                spat_comp_powers, mix_matrix, rank_part_ind = (
+                    self.retrieve_subsrc_params(frames=frames))
+                stage.add_arrays(spat_comp_powers, mix_matrix)
             
-            # update the mixing matrix
-            self.update_mix_matrix(hat_Rxs, hat_Rss, mix_matrix, rank_part_ind)
+            # compute the sufficient statistics for the block
+            with profiler.stage('compute_suff_stat') as stage:
+                statFrames, statWeights = self.draw_stat_frames(frames)
+                hat_Rxx_b, hat_Rxs_b, hat_Rss_b, hat_Ws, loglik_b = (
+                    self.compute_suff_stat(spat_comp_powers, mix_matrix,
+                                           frames=frames,
+                                           statFrames=statFrames,
+                                           statWeights=statWeights))
+                stage.add_arrays(hat_Rxx_b, hat_Rxs_b, hat_Rss_b, hat_Ws)
+            weight = (frames.stop - frames.start) * 1. / self.nbFramesSigRepr
+            hat_Rxx += weight * hat_Rxx_b
+            hat_Rxs += weight * hat_Rxs_b
+            hat_Rss += weight * hat_Rss_b
+            loglik += weight * loglik_b
             
             # from sub-sources to sources
-            # (as given by the different spatial comps)
-            #     had better have shape = [nbSpatComps,F,N]
-            hat_W = np.zeros([len(rank_part_ind),
-                              self.nbFreqsSigRepr,
-                              self.nbFramesSigRepr])
-            if self.verbose > 1:
-                print "rank_part_in", rank_part_ind
+            if hat_W is None:
+                hat_W = self.create_memmap([len(rank_part_ind),
+                                            self.nbFreqsSigRepr,
+                                            self.nbFramesSigRepr],
+                                           self.dtype)
             for w in range(len(rank_part_ind)):
-                hat_W[w] = np.mean(hat_Ws[rank_part_ind[w]], axis=0)
-                
-            del spat_comp_powers, mix_matrix, rank_part_ind
-            del hat_Rxx, hat_Rxs, hat_Rss, hat_Ws
-        else:
-            raise AttributeError("Nb channels "+str(self.audioObject.channels)+
-                                 " not implemented yet")
+                hat_W[w][:,frames] = np.mean(hat_Ws[rank_part_ind[w]], axis=0)
+            
+            del spat_comp_powers, hat_Rxx_b, hat_Rxs_b, hat_Rss_b, hat_Ws
+        
+        if self.mixStatFraction is not None:
+            hat_Rxs, hat_Rss = self.average_mix_stats(hat_Rxs, hat_Rss)
+        
+        # update the mixing matrix
+        with profiler.stage('update_mix_matrix'):
+            self.update_mix_matrix(hat_Rxs, hat_Rss, mix_matrix,
+                                   rank_part_ind)
+        del mix_matrix, rank_part_ind, hat_Rxx, hat_Rxs, hat_Rss
         
         # update the spectral parameters
-        self.update_spectral_components(hat_W)
+        with profiler.stage('update_spectral_components'):
+            self.update_spectral_components_blocked(hat_W)
+        del hat_W
         
         # normalize parameters
-        self.renormalize_parameters()
+        with profiler.stage('renormalize_parameters'):
+            self.renormalize_parameters()
+        
+        profiler.finish(loglik, iteration=self.current_iteration())
+        return loglik
+    
+    def current_iteration(self):
+        """Returns the index of the GEM iteration being run by
+        :py:meth:`FASST.run_GEM_iterations`, or `None` if the iteration is
+        run outside of an estimation.
+        """
+        state = getattr(self, 'estim_state', None)
+        if state is None:
+            return None
+        return state['iter']
+    
+    def GEM_iteration_squarem(self,):
+        """GEM iteration, accelerated with a squared extrapolation scheme
+        (SQUAREM), as in:
+        
+            R. Varadhan and C. Roland,
+            Simple and Globally Convergent Methods for Accelerating the
+            Convergence of Any EM Algorithm,
+            Scandinavian Journal of Statistics, 35(2):335-353, 2008.
+        
+        The calls are grouped by cycles of 3: the first two run
+        :py:meth:`FASST.GEM_iteration`, from the parameters `theta0` to
+        `theta1` and `theta2`. The third one extrapolates the parameters
+        (see :py:meth:`FASST.extrapolate_params`), and runs
+        :py:meth:`FASST.GEM_iteration` from the extrapolated parameters.
+        Its log-likelihood, that of the extrapolated parameters, should not
+        be lower than that of `theta1`: otherwise, the extrapolation is
+        discarded, and the parameters, as well as the averaged statistics
+        :py:attr:`FASST.mix_stats`, are set back to `theta2`. The GEM
+        iteration from `theta2` is then the first call of the next cycle,
+        such that each call runs exactly one GEM iteration. Between two
+        calls, the parameters are therefore always those obtained by a GEM
+        iteration.
+        
+        With the simulated annealing (`sim_ann_opt` set to `'ann'` or
+        `'ann_ns_inj'`), the noise PSD decreases between the calls, and the
+        log-likelihoods compared by this safeguard are not computed with the
+        same noise PSD: the test is only approximate, until the end of the
+        annealing schedule.
+        
+        The past parameters are kept in :py:attr:`FASST.accel_state`.
         
+        :returns:
+            `loglik` (double): the log-likelihood of the data,
+            given the parameters before the update. When the extrapolation
+            is discarded, the log-likelihood of `theta1`, a lower bound of
+            that of `theta2`.
+        """
+        if self.accel_state is None:
+            self.accel_state = {'phase': 0, 'params': [], 'loglik': None,
+                                'nb_rejected': 0}
+        state = self.accel_state
+        state['params'].append(self.get_free_params())
+        if state['phase'] < 2:
+            loglik = self.GEM_iteration()
+            state['phase'] += 1
+            state['loglik'] = loglik
+            return loglik
+        
+        mix_stats = self.mix_stats
+        if mix_stats is not None:
+            mix_stats = dict(mix_stats)
+        self.set_free_params(self.extrapolate_params(*state['params']))
+        loglik = self.GEM_iteration()
+        if not np.isfinite(loglik) or loglik < state['loglik']:
+            if self.verbose:
+                print "    extrapolation rejected."
+            state['nb_rejected'] += 1
+            # the GEM iteration from theta2 is left to the next call:
+            self.set_free_params(state['params'][2])
+            self.mix_stats = mix_stats
+            loglik = state['loglik']
+        state['phase'] = 0
+        state['params'] = []
         return loglik
     
+    def get_free_params(self,):
+        """Returns a copy of the free parameters of the model, as a list
+        of arrays, in the order expected by
+        :py:meth:`FASST.set_free_params`: the parameters of the spatial
+        components, and the frequency bases `FB`, frequency weights `FW`,
+        time weights `TW` and time blobs `TB` of the factors of the
+        spectral components, if their degree of freedom is ``'free'``. The
+        time weights with a ``'GMM'`` or ``'HMM'`` constraint are not
+        included.
+        """
+        return [np.copy(param) for param in self.iter_free_params()]
+    
+    def set_free_params(self, params):
+        """Sets the free parameters of the model to `params`, as returned
+        by :py:meth:`FASST.get_free_params`.
+        """
+        params = iter(params)
+        for spat_comp in self.spat_comps.values():
+            if spat_comp['frdm_prior'] == 'free':
+                spat_comp['params'] = np.copy(params.next())
+        for spec_comp in self.spec_comps.values():
+            for factor in spec_comp['factor'].values():
+                for part in self.free_factor_parts(factor):
+                    factor[part] = np.copy(params.next())
+    
+    def iter_free_params(self,):
+        """Iterates over the free parameters, see
+        :py:meth:`FASST.get_free_params`.
+        """
+        for spat_comp in self.spat_comps.values():
+            if spat_comp['frdm_prior'] == 'free':
+                yield spat_comp['params']
+        for spec_comp in self.spec_comps.values():
+            for factor in spec_comp['factor'].values():
+                for part in self.free_factor_parts(factor):
+                    yield factor[part]
+    
+    def free_factor_parts(self, factor):
+        """Returns the list of the free parameters of the spectral
+        component factor `factor`, among `'FB'`, `'FW'`, `'TW'` and `'TB'`.
+        """
+        parts = []
+        for part in ('FB', 'FW', 'TW', 'TB'):
+            if factor[part+'_frdm_prior'] != 'free' or not len(factor[part]):
+                continue
+            if part == 'TW' and factor['TW_constr'] in ('GMM', 'HMM'):
+                continue
+            parts.append(part)
+        return parts
+    
+    def extrapolate_params(self, params0, params1, params2):
+        """Extrapolates the trajectory of the parameters `params0`,
+        `params1` and `params2`, obtained by 2 successive GEM iterations
+        (see :py:meth:`FASST.GEM_iteration_squarem`), with the steplength
+        `alpha`::
+        
+            r = params1 - params0
+            v = params2 - 2 * params1 + params0
+            alpha = - max(|r| / |v|, 1)
+            params = params0 - 2 * alpha * r + alpha**2 * v
+        
+        where `|.|` is the norm over all the parameters. The parameters
+        of the spatial components, which may be complex (and become so
+        after the first update of instantaneous mixtures), are extrapolated
+        linearly. The extrapolation of the spectral parameters, which are
+        non-negative, is done on their logarithms, such that they remain
+        non-negative. The elements which are 0 in one of the spectral
+        parameters are not extrapolated, and set to their value in
+        `params2`. The extrapolated parameters have the types of those in
+        `params2`.
+        
+        :returns:
+            the list of the extrapolated parameters.
+        """
+        # the free spatial parameters come first, see get_free_params:
+        nbSpatParams = len([spat_comp
+                            for spat_comp in self.spat_comps.values()
+                            if spat_comp['frdm_prior'] == 'free'])
+        rs = []
+        vs = []
+        logs = []
+        for n, (param0, param1, param2) in enumerate(zip(params0, params1,
+                                                         params2)):
+            if n < nbSpatParams:
+                logs.append(None)
+            else:
+                mask = (param0 > 0) * (param1 > 0) * (param2 > 0)
+                logs.append(mask)
+                param0, param1, param2 = [
+                    np.log(np.where(mask, param, 1.))
+                    for param in (param0, param1, param2)]
+            rs.append(param1 - param0)
+            vs.append(param2 - 2. * param1 + param0)
+        
+        norm_r = np.sqrt(sum(np.sum(np.abs(r)**2) for r in rs))
+        norm_v = np.sqrt(sum(np.sum(np.abs(v)**2) for v in vs))
+        if norm_v <= self.eps * norm_r:
+            return params2
+        alpha = - max(norm_r / norm_v, 1.)
+        if self.verbose>1:
+            print "    extrapolation steplength:", alpha
+        
+        params = []
+        for param0, param2, r, v, mask in zip(params0, params2, rs, vs, logs):
+            if mask is None:
+                params.append((param0 - 2. * alpha * r + alpha**2 * v).astype(
+                    param2.dtype))
+            else:
+                log_param = (np.log(np.where(mask, param0, 1.)) -
+                             2. * alpha * r + alpha**2 * v)
+                params.append(np.where(mask, np.exp(log_param),
+                                       param2).astype(param2.dtype))
+        return params
+    
+    def draw_stat_frames(self, frames=None):
+        """Draws the frames on which the statistics for the mixing
+        parameters are computed, if :py:attr:`FASST.mixStatFraction` is
+        set: a fraction :py:attr:`FASST.mixStatFraction` of the frames
+        (within the slice `frames`, if provided), drawn as set by
+        :py:attr:`FASST.mixStatSampling`.
+        
+        :returns:
+            `statFrames`: the sorted indices of the drawn frames, or `None`
+            if :py:attr:`FASST.mixStatFraction` is `None`.
+            
+            `statWeights`: their weights, such that the weighted sums of
+            the statistics over the drawn frames are unbiased estimates of
+            their means over all the frames. With the `'energy'` sampling,
+            the frames are drawn with replacement, with probabilities
+            proportional to their energies, and weighted by the inverse of
+            these probabilities.
+        """
+        if self.mixStatFraction is None:
+            return None, None
+        if frames is None:
+            nbFrames = self.nbFramesSigRepr
+        else:
+            nbFrames = frames.stop - frames.start
+        nbStatFrames = max(int(np.ceil(self.mixStatFraction * nbFrames)), 1)
+        if self.mixStatSampling == 'energy':
+            nc = self.audioObject.channels
+            Cx = self.get_Cx(frames)
+            if nc == 1:
+                Cx = Cx.reshape(1, self.nbFreqsSigRepr, nbFrames)
+            energy = np.sum(st.herm_mat_diag(Cx, nc), axis=0)
+            energy = np.sum(energy, axis=0) + self.eps
+            proba = energy / np.sum(energy)
+            statFrames = np.sort(np.random.choice(nbFrames, nbStatFrames,
+                                                  p=proba))
+            statWeights = 1. / (nbStatFrames * nbFrames * proba[statFrames])
+        else:
+            statFrames = np.sort(np.random.choice(nbFrames, nbStatFrames,
+                                                  replace=False))
+            statWeights = np.ones(nbStatFrames) / nbStatFrames
+        return statFrames, statWeights.astype(self.dtype)
+    
+    def average_mix_stats(self, hat_Rxs, hat_Rss):
+        """Averages the statistics for the mixing parameters `hat_Rxs` and
+        `hat_Rss`, estimated on subsets of frames (see
+        :py:meth:`FASST.draw_stat_frames`), over the GEM iterations, as a
+        stochastic approximation: at the `t`-th call since the beginning
+        of the estimation (starting at 0), with the step
+        ``gamma = (t + 1) ** (- mixStatDecay)``::
+        
+            hat_R = (1 - gamma) * hat_R_previous + gamma * hat_R_t
+        
+        The averaged statistics are kept in :py:attr:`FASST.mix_stats`.
+        
+        :returns:
+            the averaged `hat_Rxs` and `hat_Rss`.
+        """
+        if self.mix_stats is None:
+            self.mix_stats = {'hat_Rxs': hat_Rxs,
+                              'hat_Rss': hat_Rss,
+                              'nb_updates': 1,}
+        else:
+            step = (self.mix_stats['nb_updates'] + 1.) ** (-self.mixStatDecay)
+            self.mix_stats['hat_Rxs'] = (
+                (1. - step) * self.mix_stats['hat_Rxs'] + step * hat_Rxs)
+            self.mix_stats['hat_Rss'] = (
+                (1. - step) * self.mix_stats['hat_Rss'] + step * hat_Rss)
+            self.mix_stats['nb_updates'] += 1
+        return self.mix_stats['hat_Rxs'], self.mix_stats['hat_Rss']
+    
     def comp_spat_comp_power(self, spat_comp_ind,
-                             spec_comp_ind=[], factor_ind=[]):
+                             spec_comp_ind=[], factor_ind=[], frames=None):
         """Matlab FASST Toolbox help::
         
         % V = comp_spat_comp_power(mix_str, spat_comp_ind,                  
@@ -458,6 +1570,8 @@ class FASST(object):
             corresponds to the provided `spat_comp_ind`
         :param list factor_ind:
             list of indices of factors to be included. 
+        :param slice frames:
+            if provided, only computes the power for these frames.
 
         Note: thanks to object-oriented programming, no need to provide the
         structure containing all the parameters, the instance has direct access
@@ -466,7 +1580,12 @@ class FASST(object):
         Note2: this may not completely work because the factor_ind should
         actually also depend on the index of the spectral component. TODO?
         """
-        V = np.zeros([self.nbFreqsSigRepr, self.nbFramesSigRepr])
+        if frames is None:
+            nbFrames = self.nbFramesSigRepr
+        else:
+            nbFrames = len(xrange(*frames.indices(self.nbFramesSigRepr)))
+        V = np.zeros([self.nbFreqsSigRepr, nbFrames],
+                     dtype=self.dtype)
         if len(spec_comp_ind):
             spec_comp_ind_arr = spec_comp_ind
         else:
@@ -474,29 +1593,199 @@ class FASST(object):
         
         for k in spec_comp_ind_arr:
             if spat_comp_ind == self.spec_comps[k]['spat_comp_ind']:
-                V_comp = np.ones([self.nbFreqsSigRepr, self.nbFramesSigRepr])
+                V_comp = np.ones([self.nbFreqsSigRepr, nbFrames],
+                                 dtype=self.dtype)
                 if len(factor_ind):
                     factors_ind_arr = factor_ind
                 else:
                     factors_ind_arr = self.spec_comps[k]['factor'].keys()
                     
                 for f in factors_ind_arr:
-                    factor = self.spec_comps[k]['factor'][f]
-                    W = np.dot(factor['FB'], factor['FW'])
-                    if len(factor['TB']):
-                        H = np.dot(factor['TW'],factor['TB'])
-                    else:
-                        H = factor['TW']
-                    V_comp *= np.dot(W, H)
-                    del W
-                    del H
+                    V_comp *= self.comp_factor_power(k, f, frames=frames)
                     
                 V += V_comp
                 del V_comp
-                del factor
         
         return V
     
+    def comp_factor_power(self, spec_comp_ind, fact_ind, frames=None):
+        """Computes the (`nbFreqsSigRepr` x `nbFramesSigRepr`) power of the
+        factor `fact_ind` of the spectral component `spec_comp_ind`, i.e.
+        :math:`(FB FW) (TW TB)`, restricted to the slice `frames` if
+        provided.
+        """
+        if frames is None:
+            frames = slice(None)
+        factor = self.spec_comps[spec_comp_ind]['factor'][fact_ind]
+        W = np.dot(factor['FB'], factor['FW'])
+        if len(factor['TB']):
+            H = np.dot(factor['TW'],factor['TB'][:,frames])
+        else:
+            H = factor['TW'][:,frames]
+        return np.dot(W, H)
+    
+    def stack_spec_comps(self,):
+        """Stacks the factors of the spectral components which have the
+        same shapes in contiguous arrays, in
+        :py:attr:`FASST.spec_comp_store`, a
+        :py:class:`pyfasst.specCompStore.SpecCompStore`. The factors in
+        :py:attr:`FASST.spec_comps` are replaced by
+        :py:class:`pyfasst.specCompStore.StackedFactor` views, which
+        behave as the original dictionaries.
+        
+        The powers of the stacked factors are then computed with batched
+        matrix products, by :py:meth:`FASST.iter_factor_powers`.
+        """
+        self.spec_comp_store = SpecCompStore(self.spec_comps, self.dtype)
+    
+    def iter_factor_powers(self, frames=None):
+        """Computes the powers of all the factors of all the spectral
+        components, as :py:meth:`FASST.comp_factor_power`, restricted to
+        the slice `frames` if provided. The factors stacked in
+        :py:attr:`FASST.spec_comp_store`, if any, are computed by
+        batches.
+        
+        :returns:
+            a generator of tuples ``(k, f, power)``, with `power` the
+            power of the factor `f` of the spectral component `k`.
+        """
+        stacked = set()
+        if self.spec_comp_store is not None:
+            for k, f, power in self.spec_comp_store.iter_factor_powers(
+                    self.spec_comps, frames=frames):
+                stacked.add((k, f))
+                yield k, f, power
+        for k, spec_comp in self.spec_comps.items():
+            for f in spec_comp['factor'].keys():
+                if (k, f) not in stacked:
+                    yield k, f, self.comp_factor_power(k, f, frames=frames)
+    
+    def comp_spat_comp_powers(self, frames=None):
+        """Computes the powers of all the spatial components, as
+        :py:meth:`FASST.comp_spat_comp_power`, from the factor powers
+        given by :py:meth:`FASST.iter_factor_powers`.
+        
+        :returns:
+            a dictionary, with the power of the spatial component `j` for
+            key `j`.
+        """
+        if frames is None:
+            nbFrames = self.nbFramesSigRepr
+        else:
+            nbFrames = len(xrange(*frames.indices(self.nbFramesSigRepr)))
+        comp_powers = dict(
+            (k, np.ones([self.nbFreqsSigRepr, nbFrames], dtype=self.dtype))
+            for k in self.spec_comps)
+        for k, f, power in self.iter_factor_powers(frames=frames):
+            comp_powers[k] *= power
+        spat_powers = dict(
+            (j, np.zeros([self.nbFreqsSigRepr, nbFrames], dtype=self.dtype))
+            for j in self.spat_comps)
+        for k, spec_comp in self.spec_comps.items():
+            spat_powers[spec_comp['spat_comp_ind']] += comp_powers.pop(k)
+        return spat_powers
+    
+    def init_spec_power_cache(self):
+        """Computes the cache of spectral powers, used in
+        :py:meth:`FASST.update_spectral_components`, in order not to
+        re-compute the powers of all the factors each time one of them is
+        updated. :py:attr:`FASST.spec_power_cache` is a dictionary with:
+        
+        * `'factor'`: `spec_power_cache['factor'][k][f]` is the power of
+          factor `f` of spectral component `k`, as given by
+          :py:meth:`FASST.comp_factor_power`
+        * `'comp'`: `spec_power_cache['comp'][k]` is the power of the
+          spectral component `k`, the product of its factor powers
+        * `'spat'`: `spec_power_cache['spat'][j]` is the power of the
+          spatial component `j`, the sum of the powers of its spectral
+          components, as given by :py:meth:`FASST.comp_spat_comp_power`
+        * `'total'`: only with correlation penalization
+          (:py:attr:`FASST.lambdaCorr`), the sum of the powers of all the
+          spatial components
+        
+        The cache is only valid as long as the parameters are modified
+        through :py:meth:`FASST.update_spec_power_cache`.
+        """
+        self.spec_power_cache = {'factor': {}, 'comp': {}, 'spat': {}}
+        for spat_ind in self.spat_comps.keys():
+            self.spec_power_cache['spat'][spat_ind] = (
+                np.zeros([self.nbFreqsSigRepr, self.nbFramesSigRepr],
+                         dtype=self.dtype))
+        for k in self.spec_comps.keys():
+            self.spec_power_cache['factor'][k] = {}
+            self.spec_power_cache['comp'][k] = (
+                np.ones([self.nbFreqsSigRepr, self.nbFramesSigRepr],
+                        dtype=self.dtype))
+        for k, f, power in self.iter_factor_powers():
+            self.spec_power_cache['factor'][k][f] = power
+            self.spec_power_cache['comp'][k] *= power
+        for k, spec_comp in self.spec_comps.items():
+            self.spec_power_cache['spat'][spec_comp['spat_comp_ind']] += (
+                self.spec_power_cache['comp'][k])
+        if self.lambdaCorr > 0:
+            self.spec_power_cache['total'] = np.sum(
+                self.spec_power_cache['spat'].values(), axis=0)
+            
+    def comp_other_factors_power(self, spec_comp_ind, fact_ind):
+        """Computes, from :py:attr:`FASST.spec_power_cache`, the product of
+        the powers of all the factors of spectral component `spec_comp_ind`,
+        except `fact_ind`.
+        
+        When the factor power has no zero, it is divided out from the
+        spectral component power, otherwise the product of the other
+        factor powers is computed.
+        
+        NB: as in :py:meth:`FASST.comp_spat_comp_power`, with an empty list
+        of factors, a component with a single factor returns its own power.
+        """
+        fact_powers = self.spec_power_cache['factor'][spec_comp_ind]
+        if len(fact_powers) == 1:
+            return np.copy(self.spec_power_cache['comp'][spec_comp_ind])
+        fact_power = fact_powers[fact_ind]
+        if np.all(fact_power > 0):
+            return self.spec_power_cache['comp'][spec_comp_ind] / fact_power
+        other_power = np.ones([self.nbFreqsSigRepr, self.nbFramesSigRepr],
+                              dtype=self.dtype)
+        for f, other_fact_power in fact_powers.items():
+            if f != fact_ind:
+                other_power *= other_fact_power
+        return other_power
+    
+    def update_spec_power_cache(self, spec_comp_ind, fact_ind,
+                                other_fact_power=None):
+        """Updates :py:attr:`FASST.spec_power_cache` after the parameters of
+        factor `fact_ind` of spectral component `spec_comp_ind` were
+        modified: only the power of this factor is re-computed, and the
+        corresponding spectral, spatial component and total powers are
+        updated in place.
+        
+        :param other_fact_power:
+            the product of the powers of the other factors of the spectral
+            component, as given by
+            :py:meth:`FASST.comp_other_factors_power`. Computed if not
+            provided.
+        """
+        spat_ind = self.spec_comps[spec_comp_ind]['spat_comp_ind']
+        fact_powers = self.spec_power_cache['factor'][spec_comp_ind]
+        if len(fact_powers) == 1:
+            other_fact_power = 1.
+        elif other_fact_power is None:
+            other_fact_power = self.comp_other_factors_power(spec_comp_ind,
+                                                             fact_ind)
+        fact_powers[fact_ind] = self.comp_factor_power(spec_comp_ind,
+                                                       fact_ind)
+        V_comp = self.spec_power_cache['comp'][spec_comp_ind]
+        V_spat = self.spec_power_cache['spat'][spat_ind]
+        V_total = self.spec_power_cache.get('total')
+        V_spat -= V_comp
+        if V_total is not None:
+            V_total -= V_comp
+        V_comp[:] = other_fact_power
+        V_comp *= fact_powers[fact_ind]
+        V_spat += V_comp
+        if V_total is not None:
+            V_total += V_comp
+        
     def comp_spat_cmps_powers(self, spat_comp_ind,
                               spec_comp_ind=[], factor_ind=[]):
         """Compute the sum of the spectral powers corresponding to the
@@ -511,10 +1800,11 @@ class FASST(object):
             V += self.comp_spat_comp_power(spat_comp_ind=i)
         return V
     
-    def retrieve_subsrc_params(self,):
+    def retrieve_subsrc_params(self, frames=None):
         """\
         Computes the various quantities necessary for the estimation of the
-        main parameters:
+        main parameters, for all the frames or only for the slice `frames`
+        if provided:
         
         **Outputs**
         
@@ -555,15 +1845,20 @@ class FASST(object):
                 np.arange(rank))
             rank_total += rank
         
+        if frames is None:
+            nbFrames = self.nbFramesSigRepr
+        else:
+            nbFrames = len(xrange(*frames.indices(self.nbFramesSigRepr)))
         spat_comp_powers = np.zeros([rank_total,
                                      self.nbFreqsSigRepr,
-                                     self.nbFramesSigRepr])
+                                     nbFrames], dtype=self.dtype)
         
         mix_matrix = np.zeros([rank_total,
                                self.audioObject.channels,
-                               self.nbFreqsSigRepr], dtype=complex)
+                               self.nbFreqsSigRepr], dtype=self.complexDtype)
+        spat_powers = self.comp_spat_comp_powers(frames=frames)
         for j, spat_comp in self.spat_comps.items():
-            spat_comp_j = self.comp_spat_comp_power(spat_comp_ind=j)
+            spat_comp_j = spat_powers.pop(j)
             for r in rank_part_ind[j]:
                 spat_comp_powers[r] = spat_comp_j
             if spat_comp['mix_type'] == 'inst':
@@ -577,7 +1872,8 @@ class FASST(object):
                 
         return spat_comp_powers, mix_matrix, rank_part_ind
     
-    def compute_suff_stat(self, spat_comp_powers, mix_matrix):
+    def compute_suff_stat(self, spat_comp_powers, mix_matrix, frames=None,
+                          statFrames=None, statWeights=None):
         """\
         Computes the sufficient statistics, used to update the parameters.
         
@@ -591,6 +1887,14 @@ class FASST(object):
             (`total_spat_rank` x `nchannels` x `nbFreqsSigRepr`) `ndarray`.
             the mixing parameters, as a rank x n_channels x n_freqs `ndarray`.
             Computed from :py:meth:`FASST.retrieve_subsrc_params`
+        :param numpy.ndarray statFrames:
+            if not `None`, the indices of the frames (within `frames`, if
+            provided) on which `hat_Rxs` and `hat_Rss` are estimated, as
+            the sums of their values on these frames weighted by
+            `statWeights`, instead of their means over all the frames
+            (see :py:meth:`FASST.draw_stat_frames`).
+        :param numpy.ndarray statWeights:
+            the weights of the frames `statFrames`.
         
         **Outputs:**
 
@@ -601,18 +1905,49 @@ class FASST(object):
             4. `hat_Ws`
             5. `loglik`
         
+        For stereo signals, the computation is delegated to the engine
+        chosen with :py:attr:`FASST.suffStatEngine`, that is
+        :py:meth:`FASST.compute_suff_stat_loop` or
+        :py:meth:`FASST.compute_suff_stat_einsum`, which both use the
+        explicit formulas for 2 x 2 matrices. For any other number of
+        channels, :py:meth:`FASST.compute_suff_stat_nchan` is used. The
+        statistics on a subset of frames `statFrames` are only implemented
+        in the latter two, and :py:meth:`FASST.compute_suff_stat_einsum`
+        is then used for stereo signals.
+        
+        """
+        if self.audioObject.channels != 2:
+            return self.compute_suff_stat_nchan(spat_comp_powers, mix_matrix,
+                                                frames=frames,
+                                                statFrames=statFrames,
+                                                statWeights=statWeights)
+        elif self.suffStatEngine == 'einsum' or statFrames is not None:
+            return self.compute_suff_stat_einsum(spat_comp_powers, mix_matrix,
+                                                 frames=frames,
+                                                 statFrames=statFrames,
+                                                 statWeights=statWeights)
+        else:
+            return self.compute_suff_stat_loop(spat_comp_powers, mix_matrix,
+                                               frames=frames)
+    
+    def compute_suff_stat_loop(self, spat_comp_powers, mix_matrix,
+                               frames=None):
+        """Computes the sufficient statistics, looping over all the pairs
+        of sub-sources. See :py:meth:`FASST.compute_suff_stat` for the
+        inputs and outputs.
         """
         if self.audioObject.channels != 2:
             raise ValueError("Nb channels not supported:"+
                              str(self.audioObject.channels))
         
         if self.verbose: print "    Computing sufficient statistics"
-        nbspatcomp = spat_comp_powers.shape[0]
+        nbspatcomp, nbFreqs, nbFrames = spat_comp_powers.shape
+        Cx = self.get_Cx(frames)
         
         # CAUTION! non-initialized arrays !
         sigma_x_diag = np.empty([2,
-                                 self.nbFreqsSigRepr,
-                                 self.nbFramesSigRepr])
+                                 nbFreqs,
+                                 nbFrames], dtype=self.dtype)
         #sigma_x_off = np.zeros([self.nbFreqsSigRepr,
         #                        self.nbFramesSigRepr], dtype=complex)
         
@@ -653,19 +1988,19 @@ class FASST(object):
             
         inv_sigma_x_diag, inv_sigma_x_off, det_sigma_x = (
             inv_herm_mat_2d(sigma_x_diag, sigma_x_off,
-                            verbose=self.verbose))
+                            verbose=self.verbose, eps=self.eps))
         del sigma_x_diag, sigma_x_off
         
         # compute log likelihood
         loglik = - np.mean(np.log(det_sigma_x * np.pi) +
-                           inv_sigma_x_diag[0] * self.Cx[0] +
-                           inv_sigma_x_diag[1] * self.Cx[2] +
-                           2. * np.real(inv_sigma_x_off * np.conj(self.Cx[1]))
-                           )
+                           inv_sigma_x_diag[0] * Cx[0] +
+                           inv_sigma_x_diag[1] * Cx[2] +
+                           2. * np.real(inv_sigma_x_off * np.conj(Cx[1])),
+                           dtype=np.float64)
         # compute expectations of Rss and Ws sufficient statistics
         Gs = np.empty((2, nbspatcomp,
-                       self.nbFreqsSigRepr,
-                       self.nbFramesSigRepr), dtype=np.complex) # {}
+                       nbFreqs,
+                       nbFrames), dtype=self.complexDtype) # {}
         # one for each channel (stereo, here)
         #Gs[0] = {}
         #Gs[1] = {}
@@ -685,27 +2020,28 @@ class FASST(object):
 
         # the following quantities are assigned later, so
         # an empty allocation should do.
-        hat_Rss = np.empty([self.nbFreqsSigRepr,
+        hat_Rss = np.empty([nbFreqs,
                             nbspatcomp,
                             nbspatcomp],
-                           dtype=complex)
+                           dtype=self.complexDtype)
         hat_Ws = np.empty([nbspatcomp,
-                           self.nbFreqsSigRepr,
-                           self.nbFramesSigRepr])
-        hatRssLoc1 = np.empty_like(self.Cx[0])
-        hatRssLoc2 = np.empty_like(self.Cx[0])
-        hatRssLoc3 = np.empty_like(self.Cx[0])
+                           nbFreqs,
+                           nbFrames], dtype=self.dtype)
+        # Cx[0] may be real, see compactCx:
+        hatRssLoc1 = np.empty(Cx[0].shape, dtype=self.complexDtype)
+        hatRssLoc2 = np.empty(Cx[0].shape, dtype=self.complexDtype)
+        hatRssLoc3 = np.empty(Cx[0].shape, dtype=self.complexDtype)
         for r1 in range(nbspatcomp):
             for r2 in range(nbspatcomp):
                 # TODO: could probably factor a bit more the following formula:
-                hatRssLoc1[:] = np.copy(self.Cx[0])
+                hatRssLoc1[:] = np.copy(Cx[0])
                 hatRssLoc1 *= np.conj(Gs[0,r2])
-                hatRssLoc1 += (np.conj(Gs[1,r2]) * self.Cx[1])
+                hatRssLoc1 += (np.conj(Gs[1,r2]) * Cx[1])
                 hatRssLoc1 *= Gs[0,r1]
                 
-                hatRssLoc2[:] = np.copy(self.Cx[2])
+                hatRssLoc2[:] = np.copy(Cx[2])
                 hatRssLoc2 *= np.conj(Gs[1,r2])
-                hatRssLoc2 += (np.conj(Gs[0,r2] * self.Cx[1]))
+                hatRssLoc2 += (np.conj(Gs[0,r2] * Cx[1]))
                 hatRssLoc2 *= Gs[1,r1]
                 
                 hatRssLoc3[:] = np.copy(Gs[0,r1])
@@ -731,7 +2067,7 @@ class FASST(object):
                 hat_Rss[:,r1,r2] = np.mean(hatRssLoc1, axis=1)
                 
         # To assure hermitian symmetry:
-        for f in range(self.nbFreqsSigRepr):
+        for f in range(nbFreqs):
             if self.verbose>10: # DEBUG
                 assert_array_almost_equal(
                     hat_Rss[f],
@@ -740,29 +2076,252 @@ class FASST(object):
             hat_Rss[f] = (hat_Rss[f] + np.conj(hat_Rss[f]).T) / 2.
             
         # Expectations of Rxs sufficient statistics
-        hat_Rxs = np.empty([self.nbFreqsSigRepr,
+        hat_Rxs = np.empty([nbFreqs,
                             2,
                             nbspatcomp],
-                           dtype=complex)
+                           dtype=self.complexDtype)
         for r in range(nbspatcomp):
             hat_Rxs[:,0,r] = (
-                np.mean(np.conj(Gs[0][r]) * self.Cx[0] +
-                        np.conj(Gs[1][r]) * self.Cx[1], axis=1)
+                np.mean(np.conj(Gs[0][r]) * Cx[0] +
+                        np.conj(Gs[1][r]) * Cx[1], axis=1)
                 )
             hat_Rxs[:,1,r] = (
-                np.mean(np.conj(Gs[0][r]) * np.conj(self.Cx[1]) +
-                        np.conj(Gs[1][r]) * self.Cx[2], axis=1)
+                np.mean(np.conj(Gs[0][r]) * np.conj(Cx[1]) +
+                        np.conj(Gs[1][r]) * Cx[2], axis=1)
                 )
         
         del Gs
         
         # at last Rxx sufficient statistics:
-        hat_Rxx = np.mean(self.Cx, axis=-1)
+        hat_Rxx = np.mean(Cx, axis=-1)
         # recommendation, use logarithm:
         # hat_Rxx[]
         
         return hat_Rxx, hat_Rxs, hat_Rss, hat_Ws, loglik
     
+    def compute_suff_stat_einsum(self, spat_comp_powers, mix_matrix,
+                                 frames=None, statFrames=None,
+                                 statWeights=None):
+        """Computes the sufficient statistics for all the sub-sources at
+        once, replacing the loop over the pairs of sub-sources in
+        :py:meth:`FASST.compute_suff_stat_loop` by stacked tensor
+        contractions (:py:func:`numpy.einsum`). The results are the same,
+        see :py:meth:`FASST.compute_suff_stat` for the inputs and outputs.
+        
+        With :math:`G_{ir}` the posterior gain of sub-source :math:`r` on
+        channel :math:`i`, :math:`a_{ri}` its mixing parameter and
+        :math:`v_r` its power, for each frequency bin:
+        
+        .. math::
+        
+            \\hat{R}_{ss}(r_1, r_2) = \\frac{1}{N}\\sum_{i,n}
+            G_{ir_1} (B_{ir_2} - a_{r_2i} v_{r_2})
+            + \\delta_{r_1 r_2} \\frac{1}{N}\\sum_n v_{r_1}
+        
+        with :math:`B_{ir} = \\sum_j C_{x,ij} G^*_{jr}`, and
+        :math:`\\hat{R}_{xs}(i, r)` the mean of :math:`B_{ir}` over the
+        frames.
+        
+        NB: this engine trades memory for speed: the array :math:`B` is
+        as big as the posterior gains `Gs`.
+        """
+        if self.audioObject.channels != 2:
+            raise ValueError("Nb channels not supported:"+
+                             str(self.audioObject.channels))
+        
+        if self.verbose: print "    Computing sufficient statistics (einsum)"
+        nbspatcomp, nbFreqs, nbFrames = spat_comp_powers.shape
+        Cx = self.get_Cx(frames)
+        
+        # mixture covariance, summing all the sub-source contributions:
+        sigma_x_diag = np.einsum('rcf,rfn->cfn',
+                                 np.abs(mix_matrix)**2,
+                                 spat_comp_powers)
+        sigma_x_diag += np.vstack(self.noise['PSD'])
+        sigma_x_off = np.einsum('rf,rfn->fn',
+                                mix_matrix[:,0] * np.conj(mix_matrix[:,1]),
+                                spat_comp_powers)
+        
+        inv_sigma_x_diag, inv_sigma_x_off, det_sigma_x = (
+            inv_herm_mat_2d(sigma_x_diag, sigma_x_off,
+                            verbose=self.verbose, eps=self.eps))
+        del sigma_x_diag, sigma_x_off
+        
+        # compute log likelihood
+        loglik = - np.mean(np.log(det_sigma_x * np.pi) +
+                           inv_sigma_x_diag[0] * Cx[0] +
+                           inv_sigma_x_diag[1] * Cx[2] +
+                           2. * np.real(inv_sigma_x_off * np.conj(Cx[1])),
+                           dtype=np.float64)
+        del det_sigma_x
+        
+        # posterior gains, all sub-sources at once:
+        #     Gs[i,r] = spat_comp_powers[r] * (a_r^H inv_sigma_x)[i]
+        conj_mix = np.conj(mix_matrix)[:,:,:,np.newaxis]
+        Gs = np.empty((2, nbspatcomp, nbFreqs, nbFrames),
+                      dtype=self.complexDtype)
+        Gs[0] = (conj_mix[:,0] * inv_sigma_x_diag[0] +
+                 conj_mix[:,1] * np.conj(inv_sigma_x_off))
+        Gs[1] = (conj_mix[:,0] * inv_sigma_x_off +
+                 conj_mix[:,1] * inv_sigma_x_diag[1])
+        Gs *= spat_comp_powers
+        del conj_mix, inv_sigma_x_diag, inv_sigma_x_off
+        
+        # B[i,r] = sum_j Cx[i,j] conj(Gs[j,r])
+        B = np.conj(Gs)
+        B_1 = B[1] * Cx[1]
+        B[1] *= Cx[2]
+        B[1] += B[0] * np.conj(Cx[1])
+        B[0] *= Cx[0]
+        B[0] += B_1
+        del B_1
+        
+        # Expectations of Rxs sufficient statistics
+        if statFrames is None:
+            hat_Rxs = np.ascontiguousarray(
+                np.mean(B, axis=-1).transpose(2, 0, 1))
+        else:
+            hat_Rxs = np.einsum('irfn,n->fir', B[..., statFrames],
+                                statWeights)
+        
+        # removing the "prior" part, B[i,r] - a_r[i] v_r:
+        B -= (mix_matrix.transpose(1, 0, 2)[:,:,:,np.newaxis] *
+              spat_comp_powers)
+        
+        # compute expectations of Rss and Ws sufficient statistics
+        diag_ind = np.arange(nbspatcomp)
+        if statFrames is None:
+            hat_Rss = np.einsum('irfn,isfn->frs', Gs, B)
+            hat_Rss /= nbFrames
+            hat_Rss[:, diag_ind, diag_ind] += np.mean(spat_comp_powers,
+                                                      axis=-1).T
+        else:
+            hat_Rss = np.einsum('irfn,isfn->frs', Gs[..., statFrames],
+                                B[..., statFrames] * statWeights)
+            hat_Rss[:, diag_ind, diag_ind] += np.einsum(
+                'rfn,n->fr', spat_comp_powers[..., statFrames], statWeights)
+        # To assure hermitian symmetry:
+        hat_Rss += np.conj(hat_Rss.transpose(0, 2, 1))
+        hat_Rss /= 2.
+        
+        hat_Ws = np.real(np.einsum('irfn,irfn->rfn', Gs, B))
+        hat_Ws += spat_comp_powers
+        hat_Ws = np.abs(hat_Ws)
+        
+        del Gs, B
+        
+        # at last Rxx sufficient statistics:
+        hat_Rxx = np.mean(Cx, axis=-1)
+        
+        return hat_Rxx, hat_Rxs, hat_Rss, hat_Ws, loglik
+    
+    def compute_suff_stat_nchan(self, spat_comp_powers, mix_matrix,
+                                frames=None, statFrames=None,
+                                statWeights=None):
+        """Computes the sufficient statistics for any number of channels
+        `nc`. See :py:meth:`FASST.compute_suff_stat` for the inputs and
+        outputs.
+        
+        The packed mixture covariances :py:attr:`FASST.Cx` are unpacked
+        into full `nc` x `nc` Hermitian matrices, one frequency bin at a
+        time, and the mixture covariance matrices of the model are
+        inverted with batched Cholesky decompositions over all the frames
+        (:py:func:`pyfasst.tools.signalTools.inv_herm_mat`), instead of
+        the explicit formulas for 2 x 2 matrices of
+        :py:meth:`FASST.compute_suff_stat_einsum`. The frequency bins are
+        processed one after the other, such that the memory only grows
+        with the number of frames.
+        
+        NB: for stereo signals, this gives the same results as the
+        dedicated engines, which are faster.
+        """
+        nc = self.audioObject.channels
+        
+        if self.verbose: print "    Computing sufficient statistics (nchan)"
+        nbspatcomp, nbFreqs, nbFrames = spat_comp_powers.shape
+        
+        Cx = self.get_Cx(frames)
+        # for mono signals, Cx is F x N, without the channel axis:
+        if nc == 1:
+            packed_Cx = Cx.reshape(1, nbFreqs, nbFrames)
+        else:
+            packed_Cx = Cx
+        noise_psd = np.ones(nbFreqs, dtype=self.dtype) * self.noise['PSD']
+        
+        hat_Rxs = np.empty([nbFreqs, nc, nbspatcomp],
+                           dtype=self.complexDtype)
+        hat_Rss = np.empty([nbFreqs, nbspatcomp, nbspatcomp],
+                           dtype=self.complexDtype)
+        hat_Ws = np.empty([nbspatcomp, nbFreqs, nbFrames], dtype=self.dtype)
+        loglik = 0.
+        diag_ind = np.arange(nbspatcomp)
+        chan_ind = np.arange(nc)
+        for f in range(nbFreqs):
+            power_f = spat_comp_powers[:,f]
+            mix_f = mix_matrix[:,:,f]
+            # N x nc x nc covariance matrices, observed and modelled:
+            Rx = unpack_herm_mat(packed_Cx[:,f], nc)
+            sigma_x = np.einsum('rn,ri,rj->nij',
+                                power_f, mix_f, np.conj(mix_f))
+            sigma_x[:, chan_ind, chan_ind] += noise_psd[f]
+            
+            inv_sigma_x, det_sigma_x = inv_herm_mat(sigma_x,
+                                                    verbose=self.verbose>1,
+                                                    eps=self.eps)
+            del sigma_x
+            
+            # log likelihood, summed over the frames:
+            loglik += np.sum(
+                np.log(det_sigma_x * np.pi) +
+                np.real(np.einsum('nij,nji->n', inv_sigma_x, Rx)),
+                dtype=np.float64)
+            del det_sigma_x
+            
+            # posterior gains, Gs[n,i,r] = power_r (a_r^H inv_sigma_x)[i]
+            Gs = np.einsum('rn,rj,nji->nir',
+                           power_f, np.conj(mix_f), inv_sigma_x)
+            del inv_sigma_x
+            
+            # B[n,i,r] = sum_j Rx[n,i,j] conj(Gs[n,j,r])
+            B = np.einsum('nij,njr->nir', Rx, np.conj(Gs))
+            del Rx
+            
+            # Expectations of Rxs sufficient statistics
+            if statFrames is None:
+                hat_Rxs[f] = np.mean(B, axis=0)
+            else:
+                hat_Rxs[f] = np.einsum('nir,n->ir', B[statFrames],
+                                       statWeights)
+            
+            # removing the "prior" part, B[i,r] - a_r[i] v_r:
+            B -= np.einsum('ri,rn->nir', mix_f, power_f)
+            
+            # compute expectations of Rss and Ws sufficient statistics
+            if statFrames is None:
+                hat_Rss[f] = np.einsum('nir,nis->rs', Gs, B) / nbFrames
+                hat_Rss[f, diag_ind, diag_ind] += np.mean(power_f, axis=-1)
+            else:
+                hat_Rss[f] = np.einsum(
+                    'nir,nis->rs', Gs[statFrames],
+                    B[statFrames] * statWeights[:,np.newaxis,np.newaxis])
+                hat_Rss[f, diag_ind, diag_ind] += np.dot(
+                    power_f[:, statFrames], statWeights)
+            
+            hat_Ws[:,f] = np.abs(
+                np.real(np.einsum('nir,nir->rn', Gs, B)) + power_f)
+            del Gs, B
+            
+        loglik = - loglik / (nbFreqs * nbFrames)
+        
+        # To assure hermitian symmetry:
+        hat_Rss += np.conj(hat_Rss.transpose(0, 2, 1))
+        hat_Rss /= 2.
+        
+        # at last Rxx sufficient statistics:
+        hat_Rxx = np.mean(Cx, axis=-1)
+        
+        return hat_Rxx, hat_Rxs, hat_Rss, hat_Ws, loglik
+    
     def update_mix_matrix(self,hat_Rxs, hat_Rss, mix_matrix, rank_part_ind):
         """Update the mixing parameters, according to the current estimated
         spectral component parameters.
@@ -815,12 +2374,8 @@ class FASST(object):
             #                        K_inst])
             hat_Rxs_bis = hat_Rxs[:,:,upd_inst_ind]
             if len(upd_inst_other_ind):
-                for f in range(self.nbFreqsSigRepr):
-                    hat_Rxs_bis[f] -= (
-                        np.dot(mix_matrix[upd_inst_other_ind,:,f].T,
-                               hat_Rss[f][np.vstack(upd_inst_other_ind),
-                                                        upd_inst_ind]))
-                    # hat_Rss[f][upd_inst_other_ind][:,upd_inst_ind])
+                hat_Rxs_bis -= self.mix_matrix_correction(
+                    hat_Rss, mix_matrix, upd_inst_other_ind, upd_inst_ind)
             hat_Rxs_bis = np.real(np.mean(hat_Rxs_bis, axis=0))
             rm_hat_Rss = np.real(np.mean(hat_Rss[:,np.vstack(upd_inst_ind),
                                                  upd_inst_ind], axis=0))
@@ -846,22 +2401,19 @@ class FASST(object):
                 print "    Updating mixing matrix, convolutive sources"
             hat_Rxs_bis = hat_Rxs[:,:,upd_conv_ind]
             if len(upd_conv_other_ind):
-                for f in range(self.nbFreqsSigRepr):
-                    hat_Rxs_bis[f] -= (
-                        np.dot(mix_matrix[upd_conv_other_ind,:,f].T,
-                               hat_Rss[f][np.vstack(upd_conv_other_ind),
-                                          upd_conv_ind]))
-            for f in range(self.nbFreqsSigRepr):
-                try:
-                    mix_matrix[upd_conv_ind,:,f] = (
-                        np.linalg.solve(hat_Rss[f].T, hat_Rxs_bis[f].T))
-                except np.linalg.linalg.LinAlgError:
-                    print "hat_Rss[f]:", hat_Rss[f]
-                    print "hat_Rxs_bis[f]:", hat_Rxs_bis[f]
-                    raise np.linalg.LinAlgError('Singular Matrix')
-                except:
-                    raise # re-raise the exception if that was not linalgerror...
-                    
+                hat_Rxs_bis -= self.mix_matrix_correction(
+                    hat_Rss, mix_matrix, upd_conv_other_ind, upd_conv_ind)
+            # one stacked solve for all the frequency bins, singular bins
+            # being regularised:
+            mix_matrix_conv = solve_mat(
+                np.transpose(hat_Rss[:,np.vstack(upd_conv_ind),upd_conv_ind],
+                             (0, 2, 1)),
+                np.transpose(hat_Rxs_bis, (0, 2, 1)),
+                verbose=self.verbose>1)
+            mix_matrix[upd_conv_ind] = np.transpose(mix_matrix_conv,
+                                                    (1, 2, 0))
+            del mix_matrix_conv
+
             ## smoothing
             ##for n in upd_conv_ind:
             ##    for nc in range(self.audioObject.channels):
@@ -888,9 +2440,74 @@ class FASST(object):
         # should we normalize here?
         ##self.renormalize_parameters()
         
+    def mix_matrix_correction(self, hat_Rss, mix_matrix, other_ind, upd_ind):
+        """Computes, for all the frequency bins at once, the contribution
+        of the components `other_ind` that are not updated to the
+        intercorrelation between the observation and the components
+        `upd_ind`, to be removed from `hat_Rxs` in
+        :py:meth:`FASST.update_mix_matrix`.
+        
+        :returns:
+            (`nbFreqsSigRepr` x `nchannels` x `len(upd_ind)`) `ndarray`
+        """
+        return np.einsum('kcf,fkl->fcl',
+                         mix_matrix[other_ind],
+                         hat_Rss[:,np.vstack(other_ind),upd_ind])
+    
+    def comp_mix_transf(self):
+        """Returns the transforms of the channels of the mixture, for the
+        separation methods, as a list of (`nbFreqsSigRepr` x
+        `nbFramesSigRepr`) `ndarray`.
+        
+        These are the transforms kept by :py:meth:`FASST.comp_transf_Cx`,
+        in :py:attr:`FASST.mixTransf`, if :py:attr:`FASST.keepTransf` is
+        `True`. Otherwise, they are computed, and the caller should reuse
+        them for all its sources.
+        """
+        if getattr(self, 'mixTransf', None) is not None:
+            return self.mixTransf
+        nc = self.audioObject.channels
+        X = []
+        for chan in range(nc):
+            self.tft.computeTransform(self.audioObject.data[:,chan])
+            if self.frameBlockSize is None:
+                X.append(self.tft.transfo.astype(self.complexDtype,
+                                                 copy=False))
+            else:
+                X.append(self.create_memmap(self.tft.transfo.shape,
+                                            self.complexDtype))
+                X[chan][:] = self.tft.transfo
+        del self.tft.transfo
+        return X
+    
+    def filter_mix_transf(self, WG, X):
+        """Filters the mixture transforms `X` (see
+        :py:meth:`FASST.comp_mix_transf`) with the Wiener gains `WG`, as
+        computed by :py:meth:`FASST.compute_Wiener_gain_2d`, and inverts
+        the resulting transforms.
+        
+        :returns:
+            `ndata`: the filtered signal, (`nsamples` x `nchannels`)
+        """
+        nc = len(X)
+        ndata = []
+        for chan1 in range(nc):
+            self.tft.transfo = np.zeros([self.nbFreqsSigRepr,
+                                         self.nbFramesSigRepr],
+                                        dtype=self.complexDtype)
+            for chan2 in range(nc):
+                if WG.ndim == 3:
+                    self.tft.transfo += np.vstack(WG[chan1, chan2]) * X[chan2]
+                else:
+                    self.tft.transfo += WG[chan1, chan2] * X[chan2]
+            ndata.append(self.tft.invertTransform())
+            del self.tft.transfo
+        return np.array(ndata).T
+    
     def separate_spatial_filter_comp(self,
                                      dir_results=None,
-                                     suffix=None):
+                                     suffix=None,
+                                     writeFiles=True):
         """separate_spatial_filter_comp
         
         Separates the sources using only the estimated spatial
@@ -926,40 +2543,71 @@ class FASST(object):
            Fixed Beamforming with HRTFs, 
            in proc. of INTERSPEECH, 2011.
         
+        :param dir_results:
+            provide the (existing) folder where to write the results
+        :param dict suffix:
+            a dictionary containing the labels for each source.
+        :param bool writeFiles:
+            if `False`, the images are only returned, no file is written.
+        
+        :returns:
+            `images`: the list of the source images, as given by
+            :py:meth:`FASST.iter_spatial_filter_comps`.
+        
         """
-        # grouping the indices by spatial component
-        spec_comp_ind = {}
-        for spat_ind in range(len(self.spat_comps)):
-            spec_comp_ind[spat_ind] = []
-        for spec_ind, spec_comp in self.spec_comps.items():
-            # add the spec comp index to the corresponding spatial comp:
-            spec_comp_ind[spec_comp['spat_comp_ind']].append(spec_ind)
+        if writeFiles:
+            # copying from separate_spec_comps - could modify that one later
+            if dir_results is None:
+                dir_results = (
+                    '/'.join(
+                    self.audioObject.filename.split('/')[:-1])
+                    )
+                if self.verbose:
+                    print "Writing to same directory as input file: " + \
+                          dir_results
             
-        # copying from separate_spec_comps -  could modify that one later...
-        if dir_results is None:
-            dir_results = (
-                '/'.join(
-                self.audioObject.filename.split('/')[:-1])
-                )
-            if self.verbose:
-                print "Writing to same directory as input file: " + dir_results
+            if not hasattr(self, 'files'):
+                self.files = {}
+            self.files['spatial'] = []
+            fileroot = self.audioObject.filename.split('/')[-1][:-4]
         
+        nbSources = len(self.spat_comps)
+        images = []
+        for n, ndata in self.iter_spatial_filter_comps():
+            if writeFiles:
+                _suffix = '_spatial'
+                if suffix is not None and n in suffix:
+                    _suffix += '_' + suffix[n]
+                outAudioName = (
+                    dir_results + '/' + fileroot + '_' + str(n) + 
+                    '-' + str(nbSources) + _suffix + '.wav')
+                self.files['spatial'].append(outAudioName)
+                self.write_audio(ndata, outAudioName)
+            images.append(ndata)
+        return images
+    
+    def iter_spatial_filter_comps(self):
+        """Generates the source images separated with the spatial filters
+        only, as described in :py:meth:`FASST.separate_spatial_filter_comp`,
+        one spatial component at a time.
+        
+        :returns:
+            a generator of `(n, image)` tuples, with `n` the index of the
+            spatial component, and `image` its image, a (`nsamples` x
+            `nchannels`) `ndarray` in the same scale as the audio data,
+            :py:attr:`FASST.audioObject.data`.
+        """
         nc = self.audioObject.channels
         if nc != 2:
             raise NotImplementedError()
         
-        nbSources = len(spec_comp_ind)
-        sigma_comps_diag = np.zeros([nbSources, 2,
-                                    self.nbFreqsSigRepr,
-                                    self.nbFramesSigRepr])
-        sigma_comps_off = np.zeros([nbSources,
-                                   self.nbFreqsSigRepr,
-                                   self.nbFramesSigRepr], dtype=np.complex)
+        nbSources = len(self.spat_comps)
         
         # computing individual spatial variance
-        R_diag0 = np.zeros([nbSources, self.nbFreqsSigRepr])
-        R_diag1 = np.zeros([nbSources, self.nbFreqsSigRepr])
-        R_off  = np.zeros([nbSources, self.nbFreqsSigRepr], dtype=np.complex)
+        R_diag0 = np.zeros([nbSources, self.nbFreqsSigRepr], dtype=self.dtype)
+        R_diag1 = np.zeros([nbSources, self.nbFreqsSigRepr], dtype=self.dtype)
+        R_off  = np.zeros([nbSources, self.nbFreqsSigRepr],
+                          dtype=self.complexDtype)
         
         for n in range(nbSources):
             if self.spat_comps[n]['mix_type'] == 'inst':
@@ -987,12 +2635,10 @@ class FASST(object):
             [Raa_00, Raa_11],
             Raa_01, verbose=self.verbose)
         
-        if not hasattr(self, 'files'):
-            self.files = {}
-            
-        self.files['spatial'] = []
+        if self.sig_repr_params['transf'] != 'stftold':
+            # the mixture transform, computed once for all the sources:
+            X = self.comp_mix_transf()
         
-        fileroot = self.audioObject.filename.split('/')[-1][:-4]
         for n in range(nbSources):
             WG = self.compute_Wiener_gain_2d(
                     [R_diag0[n], R_diag1[n]],
@@ -1002,7 +2648,7 @@ class FASST(object):
                 timeInvariant=True)
             normalization = np.real(WG[0,0] + WG[1,1])
             WG /= [[normalization]]
-            if self.sig_repr_params['transf'] is 'stftold':
+            if self.sig_repr_params['transf'] == 'stftold':
                 # compute the stft/istft
                 ndata = ao.filter_stft(
                     self.audioObject.data, WG, analysisWindow=None,
@@ -1011,58 +2657,26 @@ class FASST(object):
                     nfft=self.sig_repr_params['fsize'],
                     fs=self.audioObject.samplerate)
             else:
-                #raise NotImplementedError("TODO")
-                X = []
-                for chan1 in range(nc):
-                    self.tft.computeTransform(
-                        self.audioObject.data[:,chan1])
-                    X.append(self.tft.transfo)
-                ndata = []
-                if WG.ndim == 3:
-                    for chan1 in range(nc):
-                        self.tft.transfo = np.zeros([self.nbFreqsSigRepr,
-                                                     self.nbFramesSigRepr],
-                                                    dtype=np.complex)
-                        for chan2 in range(nc):
-                            self.tft.transfo += (
-                                np.vstack(WG[chan1, chan2])
-                                * X[chan2])
-                        ndata.append(self.tft.invertTransform())
-                        del self.tft.transfo
-                elif WG.ndim == 4:
-                    for chan1 in range(nc):
-                        self.tft.transfo = np.zeros([self.nbFreqsSigRepr,
-                                                     self.nbFramesSigRepr],
-                                                    dtype=np.complex)
-                        for chan2 in range(nc):
-                            self.tft.transfo += (
-                                WG[chan1, chan2]
-                                * X[chan2])
-                        ndata.append(self.tft.invertTransform())
-                        del self.tft.transfo
-                        
-                ndata = np.array(ndata).T
-                
-            _suffix = '_spatial'
-            if suffix is not None and n in suffix:
-                _suffix += '_' + suffix[n]
-            outAudioName = (
-                dir_results + '/' + fileroot + '_' + str(n) + 
-                '-' + str(nbSources) + _suffix + '.wav')
-            self.files['spatial'].append(outAudioName)
-            outAudioObj = ao.AudioObject(filename=outAudioName,
-                                         mode='w')
-            outAudioObj._data = np.int16(
-                ndata[:self.audioObject.nframes,:] *
-                self.audioObject._maxdata)#(2**15))
-            outAudioObj._maxdata = 1
-            outAudioObj._encoding = 'pcm16'
-            outAudioObj.samplerate = self.audioObject.samplerate
-            outAudioObj._write()
+                ndata = self.filter_mix_transf(WG, X)
+            del WG
+            yield n, ndata[:self.audioObject.nframes]
+        
+    def write_audio(self, ndata, filename):
+        """Writes the signal `ndata`, in the same scale as the audio data
+        :py:attr:`FASST.audioObject.data`, as a 16 bits PCM audio file
+        `filename`, at the sampling rate of the audio data.
+        """
+        outAudioObj = ao.AudioObject(filename=filename, mode='w')
+        outAudioObj._data = np.int16(ndata * self.audioObject._maxdata)
+        outAudioObj._maxdata = 1
+        outAudioObj._encoding = 'pcm16'
+        outAudioObj.samplerate = self.audioObject.samplerate
+        outAudioObj._write()
         
     def separate_spat_comps(self,
                             dir_results=None,
-                            suffix=None):
+                            suffix=None,
+                            writeFiles=True):
         """separate_spat_comps
         
         This separates the sources for each spatial component.
@@ -1073,6 +2687,12 @@ class FASST(object):
             a dictionary containing the labels for each source. If None,
             then no suffix is appended to the file names and the files
             are simply numbered `XXX_nbComps`. 
+        :param bool writeFiles:
+            if `False`, the images are only returned, no file is written.
+        
+        :returns:
+            `images`: the list of the source images, see
+            :py:meth:`FASST.separate_comps`.
         
         """
         spec_comp_ind = {}
@@ -1081,14 +2701,16 @@ class FASST(object):
         for spec_ind, spec_comp in self.spec_comps.items():
             spec_comp_ind[spec_comp['spat_comp_ind']].append(spec_ind)
             
-        self.separate_comps(dir_results=dir_results,
-                            spec_comp_ind=spec_comp_ind,
-                            suffix=suffix)
+        return self.separate_comps(dir_results=dir_results,
+                                   spec_comp_ind=spec_comp_ind,
+                                   suffix=suffix,
+                                   writeFiles=writeFiles)
     
     def separate_comps(self,
                        dir_results=None,
                        spec_comp_ind=None,
-                       suffix=None):
+                       suffix=None,
+                       writeFiles=True):
         """separate_comps
         
         Separate the sources as defined by the spectral
@@ -1111,18 +2733,69 @@ class FASST(object):
             a dictionary containing the labels for each source. If None,
             then no suffix is appended to the file names and the files
             are simply numbered `XXX_nbComps`. 
+        :param bool writeFiles:
+            if `False`, the images are only returned, no file is written.
+        
+        :returns:
+            `images`: the list of the source images, as (`nsamples` x
+            `nchannels`) `ndarray`, see :py:meth:`FASST.iter_separate_comps`.
+            To process the sources one at a time, without keeping all of
+            them in memory, use :py:meth:`FASST.iter_separate_comps`
+            directly.
         
         Note: Trying to bring into one method
         ozerov's separate_spec_comps and separate_spat_comps
         """
-        if dir_results is None:
-            dir_results = (
-                '/'.join(
-                self.audioObject.filename.split('/')[:-1])
-                )
-            if self.verbose:
-                print "Writing to same directory as input file: " + dir_results
+        if spec_comp_ind is None:
+            spec_comp_ind = {}
+            for spec_ind in range(len(self.spec_comps)):
+                spec_comp_ind[spec_ind] = [spec_ind,]
+        
+        if writeFiles:
+            if dir_results is None:
+                dir_results = (
+                    '/'.join(
+                    self.audioObject.filename.split('/')[:-1])
+                    )
+                if self.verbose:
+                    print "Writing to same directory as input file: " + \
+                          dir_results
+            
+            if not hasattr(self, "files"):
+                self.files = {}
+            self.files['spat_comp'] = []
+            fileroot = self.audioObject.filename.split('/')[-1][:-4]
+        
+        nbSources = len(spec_comp_ind)
+        images = []
+        for n, ndata in self.iter_separate_comps(spec_comp_ind):
+            if writeFiles:
+                _suffix = ''
+                if suffix is not None and n in suffix:
+                    _suffix = '_' + suffix[n]
+                outAudioName = \
+                    dir_results + '/' + fileroot + '_' + str(n) + \
+                    '-' + str(nbSources) + _suffix + '.wav'
+                self.files['spat_comp'].append(outAudioName)
+                self.write_audio(ndata, outAudioName)
+            images.append(ndata)
+        return images
+    
+    def iter_separate_comps(self, spec_comp_ind=None):
+        """Generates the source images, with the Wiener filters derived from
+        the model, for the sources defined by `spec_comp_ind`, as in
+        :py:meth:`FASST.separate_comps`, one source at a time.
         
+        :returns:
+            a generator of `(n, image)` tuples, with `n` the index of the
+            source in `spec_comp_ind`, and `image` its image, a
+            (`nsamples` x `nchannels`) `ndarray` in the same scale as the
+            audio data, :py:attr:`FASST.audioObject.data`.
+        
+        If :py:attr:`FASST.frameBlockSize` is not `None`, the Wiener
+        filters are computed block by block, see
+        :py:meth:`FASST.iter_separate_comps_blocked`.
+        """
         nc = self.audioObject.channels
         if nc != 2:
             raise NotImplementedError()
@@ -1132,13 +2805,19 @@ class FASST(object):
             for spec_ind in range(len(self.spec_comps)):
                 spec_comp_ind[spec_ind] = [spec_ind,]
         
+        if self.frameBlockSize is not None:
+            for n, ndata in self.iter_separate_comps_blocked(spec_comp_ind):
+                yield n, ndata
+            return
+        
         nbSources = len(spec_comp_ind)
         sigma_comps_diag = np.zeros([nbSources, 2,
                                      self.nbFreqsSigRepr,
-                                     self.nbFramesSigRepr])
+                                     self.nbFramesSigRepr], dtype=self.dtype)
         sigma_comps_off = np.zeros([nbSources,
                                     self.nbFreqsSigRepr,
-                                    self.nbFramesSigRepr], dtype=np.complex)
+                                    self.nbFramesSigRepr],
+                                    dtype=self.complexDtype)
         
         # computing individual source variance
         for n in range(nbSources):
@@ -1163,78 +2842,123 @@ class FASST(object):
             sigma_comps_diag,
             sigma_comps_off)
         
-        if not hasattr(self, "files"):
-            self.files = {}
-        self.files['spat_comp'] = []
+        if self.sig_repr_params['transf'] != 'stftold':
+            # the mixture transform, computed once for all the sources:
+            X = self.comp_mix_transf()
         
-        if True: # self # IF TRANSFO is STFT !!!... 20130507 corrected now?
-            fileroot = self.audioObject.filename.split('/')[-1][:-4]
-            for n in range(nbSources):
-                # get the Wiener filters:
-                WG = self.compute_Wiener_gain_2d(
-                    sigma_comps_diag[n],
-                    sigma_comps_off[n],
-                    inv_sigma_x_diag,
-                    inv_sigma_x_off)
-                # compute the stft/istft
-                if self.sig_repr_params['transf'] == 'stftold':
-                    ndata = ao.filter_stft(
-                        self.audioObject.data, WG, analysisWindow=None,
-                        synthWindow=np.hanning(self.sig_repr_params['wlen']),
-                        hopsize=self.sig_repr_params['hopsize'],
-                        nfft=self.sig_repr_params['fsize'],
-                        fs=self.audioObject.samplerate)
-                else:
-                    X = []
-                    for chan1 in range(nc):
-                        self.tft.computeTransform(
-                            self.audioObject.data[:,chan1])
-                        X.append(self.tft.transfo)
-                    ndata = []
-                    if WG.ndim == 3:
-                        for chan1 in range(nc):
-                            self.tft.transfo = np.zeros([self.nbFreqsSigRepr,
-                                                         self.nbFramesSigRepr],
-                                                        dtype=np.complex)
-                            for chan2 in range(nc):
-                                self.tft.transfo += (
-                                    np.vstack(WG[chan1, chan2])
-                                    * X[chan2])
-                            ndata.append(self.tft.invertTransform())
-                            del self.tft.transfo
-                    elif WG.ndim == 4:
-                        for chan1 in range(nc):
-                            self.tft.transfo = np.zeros([self.nbFreqsSigRepr,
-                                                         self.nbFramesSigRepr],
-                                                        dtype=np.complex)
-                            for chan2 in range(nc):
-                                self.tft.transfo += (
-                                    WG[chan1, chan2]
-                                    * X[chan2])
-                            ndata.append(self.tft.invertTransform())
-                            del self.tft.transfo
-                        
-                    ndata = np.array(ndata).T
-                _suffix = ''
-                if suffix is not None and n in suffix:
-                    _suffix = '_' + suffix[n]
-                outAudioName = \
-                    dir_results + '/' + fileroot + '_' + str(n) + \
-                    '-' + str(nbSources) + _suffix + '.wav'
-                self.files['spat_comp'].append(outAudioName)
-                outAudioObj = ao.AudioObject(filename=outAudioName,
-                                             mode='w')
-                outAudioObj._data = np.int16(
-                    ndata[:self.audioObject.nframes,:] *
-                    self.audioObject._maxdata)#(2**15))
-                outAudioObj._maxdata = 1
-                outAudioObj._encoding = 'pcm16'
-                outAudioObj.samplerate = self.audioObject.samplerate
-                outAudioObj._write()
+        for n in range(nbSources):
+            # get the Wiener filters:
+            WG = self.compute_Wiener_gain_2d(
+                sigma_comps_diag[n],
+                sigma_comps_off[n],
+                inv_sigma_x_diag,
+                inv_sigma_x_off)
+            # compute the stft/istft
+            if self.sig_repr_params['transf'] == 'stftold':
+                ndata = ao.filter_stft(
+                    self.audioObject.data, WG, analysisWindow=None,
+                    synthWindow=np.hanning(self.sig_repr_params['wlen']),
+                    hopsize=self.sig_repr_params['hopsize'],
+                    nfft=self.sig_repr_params['fsize'],
+                    fs=self.audioObject.samplerate)
+            else:
+                ndata = self.filter_mix_transf(WG, X)
+            del WG
+            yield n, ndata[:self.audioObject.nframes]
         ## TODO: else for the other transforms
         ##       should work all the same, but with cqt, not very good
         ## means to cut signals and paste them back together...
         
+    def iter_separate_comps_blocked(self, spec_comp_ind):
+        """Generates the source images as
+        :py:meth:`FASST.iter_separate_comps`, but computing the source
+        covariances, the inverse of the mixture covariance and the Wiener
+        gains for one block of :py:attr:`FASST.frameBlockSize` frames at a
+        time, and applying them right away.
+        
+        The inverse mixture covariance and the filtered transforms, as
+        large as the signal representation, are stored in memory-mapped
+        temporary files (see :py:meth:`FASST.create_memmap`), so that the
+        covariances and Wiener gains only take the memory of one block.
+        The analysis (:py:meth:`FASST.comp_mix_transf`) and the synthesis
+        (:py:meth:`pyfasst.tftransforms.tft.TFTransform.invertTransform`)
+        are however computed on the whole signal, one channel at a time:
+        the peak memory is that of one full (`nbFreqsSigRepr` x
+        `nbFramesSigRepr`) complex transform, and not bounded by the block
+        size. The covariances of each source are computed twice: once for
+        the mixture covariance, and once for its Wiener gains.
+        """
+        if self.sig_repr_params['transf'] == 'stftold':
+            raise NotImplementedError(
+                "Separation by frame blocks not implemented for stftold.")
+        nc = self.audioObject.channels
+        nbSources = len(spec_comp_ind)
+        spat_comp_ind = dict(
+            (n, np.unique([self.spec_comps[spec_ind]['spat_comp_ind']
+                           for spec_ind in spec_comp_ind[n]]))
+            for n in range(nbSources))
+        
+        def sigma_source(n, frames):
+            sigma_diag = 0.
+            sigma_off = 0.
+            for spat_ind in spat_comp_ind[n]:
+                sigma_c_diag, sigma_c_off = self.compute_sigma_comp_2d(
+                    spat_ind, spec_comp_ind[n], frames=frames)
+                sigma_diag = sigma_diag + sigma_c_diag
+                sigma_off = sigma_off + sigma_c_off
+                del sigma_c_diag, sigma_c_off
+            return sigma_diag, sigma_off
+        
+        # inverse of the mixture covariance, block by block:
+        inv_sigma_x_diag = self.create_memmap(
+            [2, self.nbFreqsSigRepr, self.nbFramesSigRepr], self.dtype)
+        inv_sigma_x_off = self.create_memmap(
+            [self.nbFreqsSigRepr, self.nbFramesSigRepr], self.complexDtype)
+        for frames in self.frame_blocks():
+            sigma_x_diag = 0.
+            sigma_x_off = 0.
+            for n in range(nbSources):
+                sigma_diag, sigma_off = sigma_source(n, frames)
+                sigma_x_diag = sigma_x_diag + sigma_diag
+                sigma_x_off = sigma_x_off + sigma_off
+                del sigma_diag, sigma_off
+            (inv_sigma_x_diag[:,:,frames],
+             inv_sigma_x_off[:,frames]) = self.compute_inv_sigma_mix_2d(
+                sigma_x_diag[None], sigma_x_off[None])
+            del sigma_x_diag, sigma_x_off
+        
+        # the mixture transform, computed once for all the sources:
+        X = self.comp_mix_transf()
+        
+        for n in range(nbSources):
+            if self.verbose>1: print "    source",n+1,"out of",nbSources
+            Y = [self.create_memmap([self.nbFreqsSigRepr,
+                                     self.nbFramesSigRepr],
+                                    self.complexDtype)
+                 for chan in range(nc)]
+            for frames in self.frame_blocks():
+                sigma_diag, sigma_off = sigma_source(n, frames)
+                WG = self.compute_Wiener_gain_2d(
+                    sigma_diag,
+                    sigma_off,
+                    inv_sigma_x_diag[:,:,frames],
+                    inv_sigma_x_off[:,frames])
+                del sigma_diag, sigma_off
+                for chan1 in range(nc):
+                    Y[chan1][:,frames] = 0.
+                    for chan2 in range(nc):
+                        Y[chan1][:,frames] += (
+                            WG[chan1, chan2] * X[chan2][:,frames])
+                del WG
+            ndata = []
+            for chan1 in range(nc):
+                self.tft.transfo = Y[chan1]
+                ndata.append(self.tft.invertTransform())
+                del self.tft.transfo
+            del Y
+            ndata = np.array(ndata).T
+            yield n, ndata[:self.audioObject.nframes]
+        
     def mvdr_2d(self,
                 theta,
                 distanceInterMic=.3,
@@ -1250,16 +2974,16 @@ class FASST(object):
         self.Cx is supposed to provide the necessary covariance matrix, for
         the \"Capon\" filter.
         """
-        Cx = np.copy(self.Cx)
-        Cx[0][:,:] = np.vstack(Cx[0].mean(axis=1))
-        Cx[1][:,:] = np.vstack(Cx[1].mean(axis=1))
-        Cx[2][:,:] = np.vstack(Cx[2].mean(axis=1))
+        # the covariance averaged over the frames, as F x 1 arrays:
+        Cx_diag = np.array([np.vstack(np.real(self.Cx[0].mean(axis=1))),
+                            np.vstack(np.real(self.Cx[2].mean(axis=1)))])
+        Cx_off = np.vstack(self.Cx[1].mean(axis=1))
         if self.verbose>1:
-            print Cx
+            print Cx_diag, Cx_off
         
         inv_Cx_diag, inv_Cx_off, det_Cx = inv_herm_mat_2d(
-            [Cx[0], Cx[2]],
-            Cx[1],
+            Cx_diag,
+            Cx_off,
             verbose=self.verbose)
         freqs = (
             np.arange(self.nbFreqsSigRepr) * 1. /
@@ -1275,7 +2999,7 @@ class FASST(object):
         W = np.zeros([self.audioObject.channels, # nc x nc x F x N
                       self.audioObject.channels,
                       self.nbFreqsSigRepr,
-                      self.nbFramesSigRepr], dtype=np.complex)
+                      self.nbFramesSigRepr], dtype=self.complexDtype)
         
         den = (
             np.vstack(np.abs(filt[0])**2) * inv_Cx_diag[0] + 
@@ -1319,18 +3043,23 @@ class FASST(object):
         Cross-Correlation GCC), with the phase transform (GCC-PHAT) weighing
         function for the cross-spectrum.
         """
-        return np.fft.irfft(self.Cx[1]/np.abs(self.Cx[1]),
+        cross = np.asarray(self.Cx[1])
+        return np.fft.irfft(cross / np.abs(cross),
                             n=self.sig_repr_params['fsize'],
                             axis=0)
     
     
-    def compute_sigma_comp_2d(self, spat_ind, spec_comp_ind):
+    def compute_sigma_comp_2d(self, spat_ind, spec_comp_ind, frames=None):
         """only for stereo case self.audioObject.channels==2
+        
+        If the slice `frames` is provided, only computes the covariances
+        for these frames.
         """
         
         spat_comp_power = self.comp_spat_comp_power(
             spat_comp_ind=spat_ind,
-            spec_comp_ind=spec_comp_ind)
+            spec_comp_ind=spec_comp_ind,
+            frames=frames)
         
         # getting the mixing coefficients for corresponding
         # spatial source, depending on mix_type
@@ -1351,9 +3080,8 @@ class FASST(object):
             mix_coefficients[:, 0] *
             np.conj(mix_coefficients[:, 1])).sum(axis=0))
         
-        sigma_comp_diag = np.zeros([2,
-                                    self.nbFreqsSigRepr,
-                                    self.nbFramesSigRepr])
+        sigma_comp_diag = np.zeros([2,] + list(spat_comp_power.shape),
+                                   dtype=self.dtype)
         if self.verbose>1:
             print R_diag0, "R_diag0.shape", R_diag0.shape
             print R_diag1, "R_diag1.shape", R_diag1.shape
@@ -1387,7 +3115,7 @@ class FASST(object):
         
         inv_sigma_x_diag, inv_sigma_x_off, _ = (
             inv_herm_mat_2d(sigma_x_diag, sigma_x_off,
-                            verbose=self.verbose))
+                            verbose=self.verbose, eps=self.eps))
         
         del sigma_x_diag, sigma_x_off
         
@@ -1444,12 +3172,11 @@ class FASST(object):
         if timeInvariant:
             WG = np.zeros([2, 2,
                            self.nbFreqsSigRepr,],
-                          dtype=complex)# stands for Wiener Gains
+                          dtype=self.complexDtype)# stands for Wiener Gains
         else:
-            WG = np.zeros([2, 2,
-                           self.nbFreqsSigRepr,
-                           self.nbFramesSigRepr],
-                          dtype=complex)# stands for Wiener Gains
+            # possibly for a block of frames only:
+            WG = np.zeros([2, 2,] + list(np.shape(sigma_comp_off)),
+                          dtype=self.complexDtype)# stands for Wiener Gains
         WG[0,0] = sigma_comp_off * np.conj(inv_sigma_mix_off)
         WG[1,1] = np.conj(WG[0,0])
         WG[0,0] += sigma_comp_diag[0] * inv_sigma_mix_diag[0]
@@ -1470,512 +3197,779 @@ class FASST(object):
         """Update the spectral components,
         with `hat_W` as the expected value of power
         (and computed from )
+        
+        The spectral powers are kept in :py:attr:`FASST.spec_power_cache`
+        (see :py:meth:`FASST.init_spec_power_cache`), and only the power of
+        the factor that has just been updated is re-computed.
+        
+        If :py:attr:`FASST.nbThreads` is more than 1, and without
+        correlation penalization (:py:attr:`FASST.lambdaCorr`), the
+        spectral components of different spatial components are updated
+        concurrently, see :py:meth:`FASST.spec_comps_update_groups`.
         """
         if self.verbose:
             print "    Update the spectral components"
-        omega = self.nmfUpdateCoeff
-        nbspeccomp = len(self.spec_comps)
         
+        self.init_spec_power_cache()
+        
+        groups = self.spec_comps_update_groups()
+        def update_group(group):
+            for spec_comp_ind in group:
+                self.update_spectral_component(spec_comp_ind, hat_W)
+        
+        if len(groups) > 1:
+            pool = ThreadPool(min(self.nbThreads, len(groups)))
+            try:
+                pool.map(update_group, groups, chunksize=1)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            for group in groups:
+                update_group(group)
+        
+        del self.spec_power_cache
+    
+    def spec_comps_update_groups(self):
+        """Splits the spectral components into groups that can be updated
+        concurrently by :py:meth:`FASST.update_spectral_components`.
+        
+        The spectral components only interact through the power of their
+        spatial component: the components of a same spatial component
+        are therefore kept in the same group, in the order of
+        :py:attr:`FASST.spec_comps`, so that the concurrent updates give
+        exactly the same parameters as the sequential ones. With
+        correlation penalization, all the powers are involved, and a
+        single group is returned, as when :py:attr:`FASST.nbThreads` is
+        1 or `None`.
+        
+        :returns:
+            `groups`: a list of lists of spectral component indices.
+        """
+        if not self.nbThreads or self.nbThreads <= 1 or self.lambdaCorr > 0:
+            return [list(self.spec_comps.keys())]
+        groups = {}
+        spat_inds = []
         for spec_comp_ind, spec_comp in self.spec_comps.items():
-            nbfactors = len(spec_comp['factor'])
             spat_comp_ind = spec_comp['spat_comp_ind']
+            if spat_comp_ind not in groups:
+                groups[spat_comp_ind] = []
+                spat_inds.append(spat_comp_ind)
+            groups[spat_comp_ind].append(spec_comp_ind)
+        return [groups[spat_comp_ind] for spat_comp_ind in spat_inds]
+    
+    def update_spectral_component(self, spec_comp_ind, hat_W):
+        """Updates the factors of the spectral component `spec_comp_ind`,
+        for :py:meth:`FASST.update_spectral_components`, using and
+        updating :py:attr:`FASST.spec_power_cache`.
+        """
+        omega = self.nmfUpdateCoeff
+        spec_comp = self.spec_comps[spec_comp_ind]
+        spat_comp_ind = spec_comp['spat_comp_ind']
+        
+        # DEBUG
+        if self.lambdaCorr > 0: # min inter-src correlation approach
+            # this is the sum of all the spatial component powers
+            spat_comp_powers = np.maximum(self.spec_power_cache['total'],
+                                          self.eps)
+            ### we need the squared of that matrix too:
+            ##spat_comp_powers_sqd = spat_comp_powers ** 2
+            # the initial spatial comp. power of the current comp:
+            spat_comp_power = (
+                np.maximum(
+                    self.spec_power_cache['spat'][spat_comp_ind],
+                    self.eps)
+                )
+            # ... and removing from the other powers - for correlation
+            # control:
+            # (non-negative, up to the rounding errors of the incremental
+            # updates of the cache)
+            spat_comp_pow_minus = np.maximum(
+                spat_comp_powers - spat_comp_power, self.eps)
             
-            # DEBUG
-            if self.lambdaCorr > 0: # min inter-src correlation approach
-                # this is the sum of all the spatial component powers
-                spat_comp_powers = np.maximum(self.comp_spat_cmps_powers(
-                    self.spat_comps.keys()), eps)
-                ### we need the squared of that matrix too:
-                ##spat_comp_powers_sqd = spat_comp_powers ** 2
-                # the initial spatial comp. power of the current comp:
+        for fact_ind, factor in spec_comp['factor'].items():
+            # update FB - freq basis
+            other_fact_prod = self.comp_other_factors_power(
+                spec_comp_ind, fact_ind)
+            other_fact_power = np.maximum(other_fact_prod, self.eps)
+            if factor['FB_frdm_prior'] == 'free':
+                if self.verbose>1:
+                    print "    Updating frequency basis %d-%d" %(
+                        spec_comp_ind, fact_ind)
                 spat_comp_power = (
                     np.maximum(
-                        self.comp_spat_comp_power(
-                            spat_comp_ind,
-                            #spec_comp_ind=[spec_comp_ind],
-                            ),
-                        eps)
+                        self.spec_power_cache['spat'][spat_comp_ind],
+                        self.eps)
                     )
-                # ... and removing from the other powers - for correlation
-                # control:
-                spat_comp_pow_minus = spat_comp_powers - spat_comp_power
+                #comp_num = hat_W[spat_comp_ind] / spat_comp_power**(2)
+                #comp_den = 1 / spat_comp_power
                 
-                if np.all(spat_comp_pow_minus >=0): # DEBUG
-                    warnings.warn(
-                        "Not all spat_comp_pow_minus, "+
-                        "%d negative values!" %np.sum(spat_comp_pow_minus >=0))
-                    spat_comp_pow_minus = np.maximum(spat_comp_pow_minus, eps)
+                if len(factor['TB']):
+                    H = np.dot(factor['TW'], factor['TB'])
+                else:
+                    H = factor['TW']
+                    
+                FW_H = np.dot(factor['FW'], H).T
                 
-            for fact_ind, factor in spec_comp['factor'].items():
-                # update FB - freq basis
-                other_fact_ind_arr = range(nbfactors)
-                other_fact_ind_arr.remove(fact_ind)
-                other_fact_power = (
+                # denominator + correlation penalization
+                if self.lambdaCorr > 0:
+                    corrPen = (
+                        self.lambdaCorr
+                        * spat_comp_pow_minus #np.maximum(spat_comp_powers,
+                        #           eps)
+                        / np.maximum(spat_comp_powers**2, self.eps)
+                        )
+                else:
+                    corrPen = 0.
+                
+                comp_den = (
+                    np.dot(other_fact_power * 
+                           (1. / spat_comp_power +
+                            corrPen),
+                           FW_H))
+                # numerator
+                if self.lambdaCorr > 0:
+                    corrPen *= 2 *(
+                        spat_comp_power
+                        / spat_comp_powers
+                        )
+                comp_num = (
+                    np.dot((hat_W[spat_comp_ind]
+                            / (spat_comp_power**2)
+                            # np.maximum(spat_comp_power**(2), eps)
+                            + corrPen)
+                           * other_fact_power,
+                           FW_H))
+                
+                factor['FB'] *= (
+                    comp_num / np.maximum(comp_den, self.eps)) ** omega
+                del comp_num, comp_den, spat_comp_power, H, FW_H
+                self.update_spec_power_cache(spec_comp_ind, fact_ind,
+                                             other_fact_prod)
+                
+            # update FW - freq weight
+            if factor['FW_frdm_prior'] == 'free':
+                if self.verbose>1:
+                    print "    Updating frequency weights %d-%d" %(
+                        spec_comp_ind, fact_ind)
+                spat_comp_power = (
                     np.maximum(
-                        self.comp_spat_comp_power(
-                            spat_comp_ind=spat_comp_ind,
-                            spec_comp_ind=[spec_comp_ind],
-                            factor_ind=other_fact_ind_arr),
-                        eps)
+                        self.spec_power_cache['comp'][spec_comp_ind],
+                        self.eps)
+                    )
+                
+                if len(factor['TB']):
+                    H = np.dot(factor['TW'], factor['TB'])
+                else:
+                    H = factor['TW']
+                    
+                # denominator + correlation penalization
+                if self.lambdaCorr > 0:
+                    corrPen = (
+                        self.lambdaCorr
+                        * np.maximum(spat_comp_pow_minus,#-spat_comp_power,
+                                     self.eps)
+                        / np.maximum(spat_comp_powers**2, self.eps)
+                        )
+                else:
+                    corrPen = 0.
+                comp_den = (
+                    np.dot(factor['FB'].T,
+                           np.dot(other_fact_power * 
+                                  (1. / spat_comp_power +
+                                   corrPen),
+                                  #other_fact_power /
+                                  #spat_comp_power,
+                                  H.T))
                     )
-                if factor['FB_frdm_prior'] == 'free':
+                
+                # numerator
+                if self.lambdaCorr > 0:# 
+                    corrPen *= 2 *(
+                        spat_comp_power
+                        / spat_comp_powers
+                        )
+                comp_num = (
+                    np.dot(factor['FB'].T,
+                           np.dot((hat_W[spat_comp_ind]
+                                   / (spat_comp_power**2) #np.maximum(spat_comp_power**2,eps)
+                                   + corrPen)
+                                  * other_fact_power,
+                                  H.T))
+                    )
+                factor['FW'] *= (
+                    comp_num / np.maximum(comp_den, self.eps)) ** omega
+                del comp_num, comp_den, spat_comp_power, H
+                self.update_spec_power_cache(spec_comp_ind, fact_ind,
+                                             other_fact_prod)
+                
+            # update TW - time weights
+            if factor['TW_frdm_prior'] == 'free':
+                if factor['TW_constr'] == 'NMF':
                     if self.verbose>1:
-                        print "    Updating frequency basis %d-%d" %(
+                        print "    Updating time weights %d-%d" %(
                             spec_comp_ind, fact_ind)
                     spat_comp_power = (
                         np.maximum(
-                            self.comp_spat_comp_power(
-                                spat_comp_ind,
-                                #spec_comp_ind=[spec_comp_ind]
-                                ),
-                            eps)
+                            self.spec_power_cache['comp'][spec_comp_ind],
+                            self.eps)
                         )
-                    #comp_num = hat_W[spat_comp_ind] / spat_comp_power**(2)
-                    #comp_den = 1 / spat_comp_power
                     
-                    if len(factor['TB']):
-                        H = np.dot(factor['TW'], factor['TB'])
-                    else:
-                        H = factor['TW']
-                        
-                    FW_H = np.dot(factor['FW'], H).T
+                    W = np.dot(factor['FB'], factor['FW'])
                     
-                    # denominator + correlation penalization
+                    # correlation penalization
                     if self.lambdaCorr > 0:
                         corrPen = (
                             self.lambdaCorr
-                            * spat_comp_pow_minus #np.maximum(spat_comp_powers,
-                            #           eps)
-                            / np.maximum(spat_comp_powers**2, eps)
+                            * np.maximum(spat_comp_pow_minus,
+                                         # - spat_comp_power,
+                                         self.eps)
+                            / np.maximum(spat_comp_powers**2, self.eps)
                             )
+                        ##if self.verbose>2: # DEBUG
+                        ##    # pedantic :
+                        ##    print "correlation stuff",
+                        ##    print corrPen.mean(), (1./spat_comp_power).mean()
                     else:
                         corrPen = 0.
                     
-                    comp_den = (
-                        np.dot(other_fact_power * 
-                               (1. / spat_comp_power +
-                                corrPen),
-                               FW_H))
-                    # numerator
-                    if self.lambdaCorr > 0:
-                        corrPen *= 2 *(
-                            spat_comp_power
-                            / spat_comp_powers
-                            )
-                    comp_num = (
-                        np.dot((hat_W[spat_comp_ind]
-                                / (spat_comp_power**2)
-                                # np.maximum(spat_comp_power**(2), eps)
-                                + corrPen)
-                               * other_fact_power,
-                               FW_H))
-                    
-                    factor['FB'] *= (
-                        comp_num / np.maximum(comp_den, eps)) ** omega
-                    del comp_num, comp_den, spat_comp_power, H, FW_H
-                    
-                # update FW - freq weight
-                if factor['FW_frdm_prior'] == 'free':
-                    if self.verbose>1:
-                        print "    Updating frequency weights %d-%d" %(
-                            spec_comp_ind, fact_ind)
-                    spat_comp_power = (
-                        np.maximum(
-                            self.comp_spat_comp_power(
-                                spat_comp_ind,
-                                spec_comp_ind=[spec_comp_ind]),
-                            eps)
-                        )
-                    
                     if len(factor['TB']):
-                        H = np.dot(factor['TW'], factor['TB'])
-                    else:
-                        H = factor['TW']
-                        
-                    # denominator + correlation penalization
-                    if self.lambdaCorr > 0:
-                        corrPen = (
-                            self.lambdaCorr
-                            * np.maximum(spat_comp_pow_minus,#-spat_comp_power,
-                                         eps)
-                            / np.maximum(spat_comp_powers**2, eps)
+                        # denominator
+                        comp_den = (
+                            np.dot(W.T,
+                                   np.dot(other_fact_power * 
+                                          (1. / spat_comp_power +
+                                           corrPen),#other_fact_power / 
+                                          #spat_comp_power,
+                                          factor['TB'].T)
+                                   )
+                            )
+                        # numerator
+                        if self.lambdaCorr > 0:# corrPen > 0:
+                            corrPen *= 2 *(
+                                spat_comp_power
+                                / spat_comp_powers
+                                )
+                        comp_num = (
+                            np.dot(W.T,
+                                   np.dot((hat_W[spat_comp_ind] /
+                                           (spat_comp_power**2) #np.maximum(spat_comp_power**2,
+                                           #            eps)
+                                           + corrPen)
+                                          * other_fact_power,
+                                          factor['TB'].T)
+                                   )
                             )
                     else:
-                        corrPen = 0.
-                    comp_den = (
-                        np.dot(factor['FB'].T,
-                               np.dot(other_fact_power * 
-                                      (1. / spat_comp_power +
-                                       corrPen),
-                                      #other_fact_power /
-                                      #spat_comp_power,
-                                      H.T))
-                        )
-                    
-                    # numerator
-                    if self.lambdaCorr > 0:# 
-                        corrPen *= 2 *(
-                            spat_comp_power
-                            / spat_comp_powers
+                        # denominator
+                        comp_den = (
+                            np.dot(W.T,
+                                   other_fact_power * 
+                                   (1. / spat_comp_power +
+                                    corrPen), #other_fact_power / 
+                                   #spat_comp_power
+                                   )
                             )
-                    comp_num = (
-                        np.dot(factor['FB'].T,
-                               np.dot((hat_W[spat_comp_ind]
-                                       / (spat_comp_power**2) #np.maximum(spat_comp_power**2,eps)
-                                       + corrPen)
-                                      * other_fact_power,
-                                      H.T))
-                        )
-                    factor['FW'] *= (
-                        comp_num / np.maximum(comp_den, eps)) ** omega
-                    del comp_num, comp_den, spat_comp_power, H
-                    
-                # update TW - time weights
-                if factor['TW_frdm_prior'] == 'free':
-                    if factor['TW_constr'] == 'NMF':
-                        if self.verbose>1:
-                            print "    Updating time weights %d-%d" %(
-                                spec_comp_ind, fact_ind)
-                        spat_comp_power = (
-                            np.maximum(
-                                self.comp_spat_comp_power(
-                                    spat_comp_ind,
-                                    spec_comp_ind=[spec_comp_ind]),
-                                eps)
+                        # numerator
+                        if self.lambdaCorr > 0:# corrPen > 0:
+                            corrPen *= 2 *(
+                                spat_comp_power
+                                / spat_comp_powers
+                                )
+                        ##if self.verbose>5: # DEBUG to discover origin of NaN
+                        ##    print "corrPen", corrPen
+                        ##    print "other_fact_power", other_fact_power
+                        ##    print "hat_W", hat_W[spat_comp_ind]
+                        ##    print "squared", np.maximum(spat_comp_power**2,eps)
+                            
+                        comp_num = (
+                            np.dot(W.T,
+                                   other_fact_power * (hat_W[spat_comp_ind] /
+                                    (spat_comp_power**2)
+                                    + corrPen)
+                                   )
                             )
                         
-                        W = np.dot(factor['FB'], factor['FW'])
-                        
-                        # correlation penalization
-                        if self.lambdaCorr > 0:
-                            corrPen = (
-                                self.lambdaCorr
-                                * np.maximum(spat_comp_pow_minus,
-                                             # - spat_comp_power,
-                                             eps)
-                                / np.maximum(spat_comp_powers**2, eps)
-                                )
-                            ##if self.verbose>2: # DEBUG
-                            ##    # pedantic :
-                            ##    print "correlation stuff",
-                            ##    print corrPen.mean(), (1./spat_comp_power).mean()
-                        else:
-                            corrPen = 0.
+                    ##if self.verbose > 8: #DEBUG
+                    ##    print "comp_num", comp_num
+                    ##    print "comp_den", comp_den
+                    factor['TW'] *= (
+                        comp_num / np.maximum(comp_den, self.eps)) ** omega
+                    del comp_num, comp_den, spat_comp_power, W
+                    self.update_spec_power_cache(spec_comp_ind, fact_ind,
+                                                 other_fact_prod)
+                elif factor['TW_constr'] in ('GMM', 'GSMM', 'HMM', 'SHMM'):
+                    nbfaccomps = factor['TW'].shape[0]
+                    if self.verbose>1:
+                        print "    Updating time weights, "+\
+                              "discrete state-based constraints"
+                    if len(factor['TB']):
+                        errorMsg = "In this implementation, "+\
+                                   "as in Ozerov's, non-trivial "+\
+                                   "time blobs TB is incompatible with "+\
+                                   "discrete state-based constraints for"+\
+                                   " the time weights TW"
+                        raise AttributeError(errorMsg)
+                    
+                    if not('TW_all' in factor):
+                        factor['TW_all'] = (
+                            np.outer(np.ones(nbfaccomps),
+                                     np.max(factor['TW'], axis=0))
+                            )
                         
-                        if len(factor['TB']):
-                            # denominator
-                            comp_den = (
-                                np.dot(W.T,
-                                       np.dot(other_fact_power * 
-                                              (1. / spat_comp_power +
-                                               corrPen),#other_fact_power / 
-                                              #spat_comp_power,
-                                              factor['TB'].T)
-                                       )
-                                )
-                            # numerator
-                            if self.lambdaCorr > 0:# corrPen > 0:
-                                corrPen *= 2 *(
-                                    spat_comp_power
-                                    / spat_comp_powers
-                                    )
-                            comp_num = (
-                                np.dot(W.T,
-                                       np.dot((hat_W[spat_comp_ind] /
-                                               (spat_comp_power**2) #np.maximum(spat_comp_power**2,
-                                               #            eps)
-                                               + corrPen)
-                                              * other_fact_power,
-                                              factor['TB'].T)
-                                       )
-                                )
+                    if 'TW_DP_params' not in factor:
+                        if factor['TW_constr'] in ('GMM', 'GSMM'):
+                            # prior probabilities
+                            factor['TW_DP_params'] = (
+                                np.ones(nbfaccomps) /
+                                np.double(nbfaccomps))
                         else:
-                            # denominator
-                            comp_den = (
-                                np.dot(W.T,
-                                       other_fact_power * 
-                                       (1. / spat_comp_power +
-                                        corrPen), #other_fact_power / 
-                                       #spat_comp_power
-                                       )
-                                )
-                            # numerator
-                            if self.lambdaCorr > 0:# corrPen > 0:
-                                corrPen *= 2 *(
-                                    spat_comp_power
-                                    / spat_comp_powers
-                                    )
-                            ##if self.verbose>5: # DEBUG to discover origin of NaN
-                            ##    print "corrPen", corrPen
-                            ##    print "other_fact_power", other_fact_power
-                            ##    print "hat_W", hat_W[spat_comp_ind]
-                            ##    print "squared", np.maximum(spat_comp_power**2,eps)
-                                
-                            comp_num = (
-                                np.dot(W.T,
-                                       other_fact_power * (hat_W[spat_comp_ind] /
-                                        (spat_comp_power**2)
-                                        + corrPen)
-                                       )
-                                )
+                            # transition probabilities
+                            factor['TW_DP_params'] = (
+                                np.ones([nbfaccomps, nbfaccomps]) /
+                                np.double(nbfaccomps))
                             
-                        ##if self.verbose > 8: #DEBUG
-                        ##    print "comp_num", comp_num
-                        ##    print "comp_den", comp_den
-                        factor['TW'] *= (
-                            comp_num / np.maximum(comp_den, eps)) ** omega
-                        del comp_num, comp_den, spat_comp_power, W
-                    elif factor['TW_constr'] in ('GMM', 'GSMM', 'HMM', 'SHMM'):
-                        warnings.warn(
-                            "The GMM/GSMM/HMM still needs to be adapted "+
-                            "to take into account the different factors. ")
-                        nbfaccomps = factor['TW'].shape[0]
-                        if self.verbose>1:
-                            print "    Updating time weights, "+\
-                                  "discrete state-based constraints"
-                        if len(factor['TB']):
-                            errorMsg = "In this implementation, "+\
-                                       "as in Ozerov's, non-trivial "+\
-                                       "time blobs TB is incompatible with "+\
-                                       "discrete state-based constraints for"+\
-                                       " the time weights TW"
-                            raise AttributeError(errorMsg)
+                    if factor['TW_constr'] in ('GMM', 'HMM') and \
+                           (np.max(factor['TW_all'])>1 or \
+                            np.min(factor['TW_all'])<1):
+                        factor['FB'] *= np.mean(factor['TW_all'])
+                        factor['TW_all'][:] = 1.
                         
-                        if not('TW_all' in factor):
-                            factor['TW_all'] = (
-                                np.outer(np.ones(nbfaccomps),
-                                         np.max(factor['TW'], axis=0))
-                                )
-                            
-                        if 'TW_DP_params' not in factor:
-                            if factor['TW_constr'] in ('GMM', 'GSMM'):
-                                # prior probabilities
-                                factor['TW_DP_params'] = (
-                                    np.ones(nbfaccomps) /
-                                    np.double(nbfaccomps))
-                            else:
-                                # transition probabilities
-                                factor['TW_DP_params'] = (
-                                    np.ones([nbfaccomps, nbfaccomps]) /
-                                    np.double(nbfaccomps))
-                                
-                        if factor['TW_constr'] in ('GMM', 'HMM') and \
-                               (np.max(factor['TW_all'])>1 or \
-                                np.min(factor['TW_all'])<1):
-                            factor['FB'] *= np.mean(factor['TW_all'])
-                            factor['TW_all'][:] = 1.
-                            
-                        if self.verbose:
-                            print "    Computing the Itakura Saito distance"+\
-                                  " matrix"
-                        ISdivMatrix = np.zeros([nbfaccomps,
-                                                self.nbFramesSigRepr])
-                        for compnb in range(nbfaccomps):
-                            factor['TW'][:] = 0
-                            factor['TW'][compnb] = factor['TW_all'][compnb]
-                            
-                            if factor['TW_constr'] not in ('GMM', 'HMM'):
-                                # re-estimating the weights for discrete
-                                # state model with the constraint on the
-                                # single state presence active.
-                                # NB: for GMM and HMM, these weights are
-                                #     assumed to be 1
-                                spat_comp_power = (
-                                    np.maximum(
-                                        self.comp_spat_comp_power(
-                                            spat_comp_ind,
-                                            spec_comp_ind=[spec_comp_ind],),
-                                        eps)
-                                    )
-                                 
-                                # NMF like updating for estimating the weight
-                                Wbasis = np.dot(factor['FB'],
-                                                factor['FW'][:,compnb])
-                                comp_num = (
-                                    np.dot(Wbasis,
-                                           hat_W[spat_comp_ind] /
-                                           np.maximum(spat_comp_power**2, eps))
-                                    )
-                                comp_den = (
-                                    np.dot(Wbasis,
-                                           1 / spat_comp_power)
-                                    )
-                                
-                                factor['TW'][compnb] *= (
-                                    comp_num /
-                                    np.maximum(comp_den, eps)
-                                    ) ** omega
-                                
-                                factor['TW_all'][compnb]=factor['TW'][compnb]
-                                
-                                del comp_num, comp_den, spat_comp_power
-                                
-                            # ratio to compute IS divergence between expected
-                            # variance hat_W and the spatial component
-                            # with the discrete state restriction
-                            spat_comp_power = (
-                                np.maximum(
-                                self.comp_spat_comp_power(spat_comp_ind),
-                                eps)
-                                )
-                            
-                            W_V_ratio = (
-                                hat_W[spat_comp_ind] /
-                                spat_comp_power)
-                            
-                            ISdivMatrix[compnb] = (
-                                np.sum(W_V_ratio
-                                       - np.log(np.maximum(W_V_ratio, eps))
-                                       - 1,axis=0)
-                                )
-                            
-                            del W_V_ratio, spat_comp_power
+                    if self.verbose:
+                        print "    Computing the Itakura Saito distance"+\
+                              " matrix"
+                    # for GSMM and SHMM, the weights of the discrete
+                    # states are re-estimated with the constraint on the
+                    # single state presence active.
+                    # NB: for GMM and HMM, these weights are assumed to
+                    #     be 1
+                    ISdivMatrix = self.comp_state_IS_divergences(
+                        spec_comp_ind, fact_ind, hat_W[spat_comp_ind],
+                        other_fact_prod,
+                        update_weights=(factor['TW_constr']
+                                        not in ('GMM', 'HMM')))
+                    
+                    # decode the state sequence that minimizes the
+                    # track in the IS div matrix, with best
+                    # trade-off with the provided TW_DP_params
+                    # (temporal constraints)
+                    if self.verbose:
+                        print "    Decoding the state sequence"
+                    active_state_seq = self.decode_state_sequence(
+                        factor, ISdivMatrix)
+                    
+                    if self.verbose:
+                        print "    Update Time Weights"
                         
-                        # decode the state sequence that minimizes the
-                        # track in the IS div matrix, with best
-                        # trade-off with the provided TW_DP_params
-                        # (temporal constraints)
-                        if self.verbose:
-                            print "    Decoding the state sequence"
-                        if factor['TW_constr'] in ('GMM', 'GSMM'):
-                            active_state_seq = (
-                                np.argmin(
-                                    ISdivMatrix -
-                                    np.vstack(
-                                        np.log(factor['TW_DP_params'] + eps)),
-                                    axis=0)
-                                )
-                            del ISdivMatrix
-                        elif factor['TW_constr'] in ('HMM', 'SHMM'):
-                            if self.verbose:
-                                print "        Viterbi algorithm to "+\
-                                      "determine the active state sequence"
-                            accumulateVec = (
-                                ISdivMatrix[:,0] -
-                                np.log(1. / nbfaccomps)
-                                )
-                            antecedentMat = np.zeros([nbfaccomps,
-                                                      self.nbFramesSigRepr],
-                                                     dtype=np.int32)
-                            for n in range(1, self.nbFramesSigRepr):
-                                tmpMat = (
-                                    np.vstack(accumulateVec) -
-                                    np.log(factor['TW_DP_params'] + eps))
-                                
-                                antecedentMat[:,n] = (
-                                    np.argmin(tmpMat, axis=0)
-                                    )
-                                accumulateVec += (
-                                    tmpMat[antecedentMat[:,n],
-                                           range(nbfaccomps)] + 
-                                    ISdivMatrix[:,n]
-                                    )
-                                # to avoid overflow?
-                                accumulateVec -= accumulateVec.min()
-                            
-                            del tmpMat
-                            
-                            active_state_seq = np.zeros(self.nbFramesSigRepr,
-                                                        dtype=np.int32)
-                            active_state_seq[-1] = np.argmin(accumulateVec)
-                            for framenb in range(self.nbFramesSigRepr-1,0,-1):
-                                active_state_seq[framenb-1] = (
-                                    antecedentMat[active_state_seq[framenb],
-                                                  framenb-1]
-                                    )
-                            
-                        else:
-                            raise NotImplementedError(
-                                "No implementation for time constraint other "+
-                                "than GMM, GSMM, HMM and SHMM")
+                    frames = np.arange(self.nbFramesSigRepr)
+                    factor['TW'][:] = 0.
+                    factor['TW'][active_state_seq, frames] = (
+                        factor['TW_all'][active_state_seq, frames])
                         
+                    if factor['TW_DP_frdm_prior'] == 'free':
                         if self.verbose:
-                            print "    Update Time Weights"
-                            
-                        factor['TW'][:] = 0.
-                        for framenb in range(self.nbFramesSigRepr):
-                            factor['TW'][active_state_seq[framenb],framenb] = (
-                                factor['TW_all'][active_state_seq[framenb],
-                                                 framenb]
-                                )
-                            
-                        if factor['TW_DP_frdm_prior'] == 'free':
                             print "    Updating the transition probabilities"
-                            if factor['TW_constr'] in ('GMM', 'GSMM'):
-                                for compnb in range(nbfaccomps):
-                                    factor['TW_DP_params'][compnb] = (
-                                        np.sum(active_state_seq==compnb) * 1. /
-                                        self.nbFramesSigRepr
-                                        )
-                            elif factor['TW_constr'] in ('HMM', 'SHMM'):
-                                for prevstate in range(nbfaccomps):
-                                    upd_den = np.sum(
-                                        active_state_seq[:-1]==prevstate)
-                                    if upd_den:
-                                        for nextstate in range(nbfaccomps):
-                                            upd_num = 1. * np.sum(
-                                                (active_state_seq[:-1]==
-                                                 prevstate) *
-                                                (active_state_seq[1:]==
-                                                 nextstate))
-                                            factor['TW_DP_params'][prevstate,
-                                                                   nextstate]=(
-                                                upd_num / upd_den
-                                                ) # TODO: check this part
-                            else:
-                                raise NotImplementedError(
-                                    "Required time constraints not "+
-                                    "implemented.")
-                        
-                # update TB = time basis
-                if len(factor['TB']) and factor['TB_frdm_prior'] == 'free':
-                    if self.verbose>1: print "    Updating Time basis"
-                    spat_comp_power = (
-                        np.maximum(
-                            self.comp_spat_comp_power(
-                                spat_comp_ind,
-                                spec_comp_ind=[spec_comp_ind],),
-                            eps)
-                        )
-                    W = (
-                        np.dot(np.dot(factor['FB'], factor['FW']),
-                               factor['TW'])
-                        )
-                    # denominator + correlation penalization
-                    if self.lambdaCorr > 0:
-                        corrPen = (
-                            self.lambdaCorr
-                            * np.maximum(spat_comp_pow_minus,# - spat_comp_power,
-                                         eps)
-                            / np.maximum(spat_comp_powers**2, eps)
-                            )
-                        ##if self.verbose>2:#DEBUG
-                        ##    # pedantic :
-                        ##    print corrPen.mean(), (1./spat_comp_power).mean()
-                    else:
-                        corrPen = 0.
-                    comp_den = (
-                        np.dot(W.T,
-                               other_fact_power * 
-                               (1. / spat_comp_power +
-                                corrPen))
+                        if factor.get('TW_DP_reestim', 'hard') == 'soft':
+                            state_counts = self.comp_expected_state_counts(
+                                factor, ISdivMatrix)
+                        else:
+                            state_counts = self.comp_state_counts(
+                                factor, active_state_seq)
+                        self.reestimate_state_params(factor, state_counts)
+                        del state_counts
+                    del ISdivMatrix
+                    
+                    # FB and TW were modified without the cache:
+                    self.update_spec_power_cache(spec_comp_ind, fact_ind,
+                                                 other_fact_prod)
+                    
+            # update TB = time basis
+            if len(factor['TB']) and factor['TB_frdm_prior'] == 'free':
+                if self.verbose>1: print "    Updating Time basis"
+                spat_comp_power = (
+                    np.maximum(
+                        self.spec_power_cache['comp'][spec_comp_ind],
+                        self.eps)
+                    )
+                W = (
+                    np.dot(np.dot(factor['FB'], factor['FW']),
+                           factor['TW'])
+                    )
+                # denominator + correlation penalization
+                if self.lambdaCorr > 0:
+                    corrPen = (
+                        self.lambdaCorr
+                        * np.maximum(spat_comp_pow_minus,# - spat_comp_power,
+                                     self.eps)
+                        / np.maximum(spat_comp_powers**2, self.eps)
                         )
-                    # numerator
-                    if self.lambdaCorr > 0:# corrPen > 0:
-                        corrPen *= 2 *(
-                            spat_comp_power
-                            / spat_comp_powers
-                            )
-                    comp_num = (
-                        np.dot(W.T,
-                               (hat_W[spat_comp_ind]
-                                / np.maximum(spat_comp_power**2, eps)
-                                + corrPen)
-                               * other_fact_power)
+                    ##if self.verbose>2:#DEBUG
+                    ##    # pedantic :
+                    ##    print corrPen.mean(), (1./spat_comp_power).mean()
+                else:
+                    corrPen = 0.
+                comp_den = (
+                    np.dot(W.T,
+                           other_fact_power * 
+                           (1. / spat_comp_power +
+                            corrPen))
+                    )
+                # numerator
+                if self.lambdaCorr > 0:# corrPen > 0:
+                    corrPen *= 2 *(
+                        spat_comp_power
+                        / spat_comp_powers
                         )
-                    factor['TB'] *= (
-                        comp_num / np.maximum(comp_den, eps)) ** omega
-                    del comp_num, comp_den, spat_comp_power, W
+                comp_num = (
+                    np.dot(W.T,
+                           (hat_W[spat_comp_ind]
+                            / np.maximum(spat_comp_power**2, self.eps)
+                            + corrPen)
+                           * other_fact_power)
+                    )
+                factor['TB'] *= (
+                    comp_num / np.maximum(comp_den, self.eps)) ** omega
+                del comp_num, comp_den, spat_comp_power, W
+                self.update_spec_power_cache(spec_comp_ind, fact_ind,
+                                             other_fact_prod)
+
+    def comp_state_IS_divergences(self, spec_comp_ind, fact_ind, hat_W,
+                                  other_fact_power=None,
+                                  update_weights=False):
+        """Computes the Itakura-Saito divergences between the expected
+        power `hat_W` of the spatial component of spectral component
+        `spec_comp_ind` and the power of this spatial component, when the
+        factor `fact_ind`, with discrete state time constraints, is
+        restricted to each one of its states.
+        
+        In state `s`, the power of the spatial component is
+        ``V_rest + other_fact_power * outer(W[:,s], TW_all[s])``, with
+        ``W = FB FW``, and `V_rest` the power of the other spectral
+        components, taken from :py:attr:`FASST.spec_power_cache`. The
+        states are evaluated by blocks of :py:attr:`FASST.stateBlockSize`,
+        without re-computing the powers of the other components. When the
+        spectral component has a single factor and is the only one of its
+        spatial component, the divergences are separable and obtained
+        from a single matrix product over the frequencies.
+        
+        :param numpy.ndarray hat_W:
+            the (`nbFreqsSigRepr` x `nbFramesSigRepr`) expected power of
+            the spatial component.
+        :param other_fact_power:
+            the product of the powers of the other factors of the spectral
+            component, as given by
+            :py:meth:`FASST.comp_other_factors_power`. Ignored for a single
+            factor.
+        :param bool update_weights:
+            if `True`, the weights of the states, in `factor['TW_all']`,
+            are first re-estimated with a multiplicative update, each
+            state being active alone (for `'GSMM'` and `'SHMM'`).
+        
+        :returns:
+            the (`nbStates` x `nbFramesSigRepr`) matrix of divergences.
+        """
+        spec_comp = self.spec_comps[spec_comp_ind]
+        spat_comp_ind = spec_comp['spat_comp_ind']
+        factor = spec_comp['factor'][fact_ind]
+        omega = self.nmfUpdateCoeff
+        # the spectra of the states, in columns:
+        W = np.dot(factor['FB'], factor['FW'])
+        TW_all = factor['TW_all']
+        nbStates = W.shape[1]
+        if len(spec_comp['factor']) == 1:
+            other_fact_power = None
+        nbSpecComps = len([k for k, comp in self.spec_comps.items()
+                           if comp['spat_comp_ind'] == spat_comp_ind])
+        
+        if other_fact_power is None and nbSpecComps == 1:
+            # sum over the frequencies of hat_W / W, for all the states:
+            ratio_sums = np.dot(1. / np.maximum(W.T, self.eps), hat_W)
+            if update_weights:
+                TW_all *= (
+                    ratio_sums /
+                    np.maximum(W.shape[0] * TW_all, self.eps)) ** omega
+            TW = np.maximum(TW_all, self.eps)
+            return (
+                ratio_sums / TW
+                + W.shape[0] * np.log(TW)
+                + np.vstack(np.sum(np.log(np.maximum(W, self.eps)), axis=0))
+                - np.sum(np.log(np.maximum(hat_W, self.eps)), axis=0)
+                - W.shape[0])
+        
+        V_rest = (
+            self.spec_power_cache['spat'][spat_comp_ind] -
+            self.spec_power_cache['comp'][spec_comp_ind])
+        ISdivMatrix = np.zeros([nbStates, self.nbFramesSigRepr])
+        for start in range(0, nbStates, self.stateBlockSize):
+            states = slice(start, min(start + self.stateBlockSize, nbStates))
+            # the power of the component for each state, with unit weights:
+            basis = W.T[states, :, None]
+            if other_fact_power is not None:
+                basis = basis * other_fact_power
+            if update_weights:
+                V = np.maximum(basis * TW_all[states, None, :], self.eps)
+                comp_num = np.sum(basis * hat_W / np.maximum(V**2, self.eps),
+                                  axis=1)
+                comp_den = np.sum(basis / V, axis=1)
+                TW_all[states] *= (
+                    comp_num / np.maximum(comp_den, self.eps)) ** omega
+                del comp_num, comp_den, V
+            V = basis * TW_all[states, None, :]
+            V += V_rest
+            W_V_ratio = hat_W / np.maximum(V, self.eps)
+            del V, basis
+            ISdivMatrix[states] = np.sum(
+                W_V_ratio - np.log(np.maximum(W_V_ratio, self.eps)) - 1,
+                axis=1)
+            del W_V_ratio
+        return ISdivMatrix
+    
+    def decode_state_sequence(self, factor, ISdivMatrix):
+        """Decodes the sequence of the active states of `factor`, with
+        discrete state time constraints, from the Itakura-Saito divergences
+        `ISdivMatrix` computed by
+        :py:meth:`FASST.comp_state_IS_divergences`, the opposite of the
+        log-likelihoods of the states, up to a constant.
+        
+        For `'GMM'` and `'GSMM'`, the most likely state is chosen for each
+        frame, with the prior probabilities `factor['TW_DP_params']`. For
+        `'HMM'` and `'SHMM'`, the best state path is decoded by the Viterbi
+        algorithm (:py:func:`viterbiTracking`, from
+        :py:mod:`pyfasst.SeparateLeadStereo.tracking`), with uniform initial
+        probabilities and the transition probabilities
+        `factor['TW_DP_params']`.
+        
+        :returns:
+            the `nbFramesSigRepr` array of the indices of the active states.
+        """
+        nbStates, nbFrames = ISdivMatrix.shape
+        logTransitions = np.log(factor['TW_DP_params'] + self.eps)
+        if factor['TW_constr'] in ('GMM', 'GSMM'):
+            return np.argmin(ISdivMatrix - np.vstack(logTransitions), axis=0)
+        elif factor['TW_constr'] in ('HMM', 'SHMM'):
+            if self.verbose:
+                print "        Viterbi algorithm to "+\
+                      "determine the active state sequence"
+            return viterbiTracking(
+                nbStates, nbFrames,
+                np.ascontiguousarray(- ISdivMatrix, dtype=np.float64),
+                np.log(np.ones(nbStates) / nbStates),
+                np.ascontiguousarray(logTransitions, dtype=np.float64),
+                self.verbose > 1)
+        else:
+            raise NotImplementedError(
+                "No implementation for time constraint other "+
+                "than GMM, GSMM, HMM and SHMM")
+    
+    def comp_state_counts(self, factor, active_state_seq):
+        """Counts, in the decoded sequence `active_state_seq`, the
+        occurrences of the states of `factor` (for `'GMM'` and `'GSMM'`),
+        or the transitions between these states (for `'HMM'` and
+        `'SHMM'`), in a single pass over the frames.
+        
+        :returns:
+            the (`nbStates`) or (`nbStates` x `nbStates`) array of counts.
+        """
+        nbStates = factor['TW_DP_params'].shape[0]
+        if factor['TW_constr'] in ('GMM', 'GSMM'):
+            return 1. * np.bincount(active_state_seq, minlength=nbStates)
+        # index of the pairs (previous state, next state):
+        transitions = active_state_seq[:-1] * nbStates + active_state_seq[1:]
+        return 1. * np.bincount(
+            transitions, minlength=nbStates**2).reshape(nbStates, nbStates)
+    
+    def comp_expected_state_counts(self, factor, ISdivMatrix):
+        """Computes the expected counts of the states of `factor` (for
+        `'GMM'` and `'GSMM'`), or of the transitions between them (for
+        `'HMM'` and `'SHMM'`), under the posterior probabilities of the
+        states, the log-likelihoods being the opposite of the
+        Itakura-Saito divergences `ISdivMatrix` (see
+        :py:meth:`FASST.comp_state_IS_divergences`).
+        
+        For the HMMs, the posterior probabilities of the transitions are
+        computed by the (scaled) forward-backward algorithm, with uniform
+        initial probabilities and the transition probabilities
+        `factor['TW_DP_params']`.
+        
+        :returns:
+            the (`nbStates`) or (`nbStates` x `nbStates`) array of expected
+            counts.
+        """
+        nbStates, nbFrames = ISdivMatrix.shape
+        tiny = np.finfo(np.float64).tiny
+        # the likelihoods, up to a factor on each frame:
+        likelihood = np.exp(np.min(ISdivMatrix, axis=0) - ISdivMatrix)
+        if factor['TW_constr'] in ('GMM', 'GSMM'):
+            posterior = np.vstack(factor['TW_DP_params']) * likelihood
+            posterior /= np.maximum(posterior.sum(axis=0), tiny)
+            return posterior.sum(axis=1)
+        transitions = factor['TW_DP_params']
+        forward = np.zeros([nbStates, nbFrames])
+        scale = np.zeros(nbFrames)
+        forward[:, 0] = likelihood[:, 0] / nbStates
+        for n in range(nbFrames):
+            if n:
+                forward[:, n] = (
+                    np.dot(forward[:, n-1], transitions) * likelihood[:, n])
+            scale[n] = max(forward[:, n].sum(), tiny)
+            forward[:, n] /= scale[n]
+        backward = np.ones([nbStates, nbFrames])
+        for n in range(nbFrames - 2, -1, -1):
+            backward[:, n] = (
+                np.dot(transitions, likelihood[:, n+1] * backward[:, n+1])
+                / scale[n+1])
+        # sum over the frames of the posterior transition probabilities:
+        return transitions * np.dot(
+            forward[:, :-1],
+            (likelihood[:, 1:] * backward[:, 1:] / scale[1:]).T)
+    
+    def reestimate_state_params(self, factor, state_counts):
+        """Re-estimates the prior (for `'GMM'` and `'GSMM'`) or transition
+        (for `'HMM'` and `'SHMM'`) probabilities `factor['TW_DP_params']`
+        from the (expected) counts `state_counts`, given by
+        :py:meth:`FASST.comp_state_counts` or
+        :py:meth:`FASST.comp_expected_state_counts`.
+        
+        The counts are smoothed by the Dirichlet prior pseudo-counts
+        `factor['TW_DP_prior_counts']` (a number or an array of the shape
+        of `state_counts`, 0 by default). The transitions from a state that
+        was never visited are not modified.
+        """
+        states = state_counts.sum(axis=-1) > 0
+        state_counts = state_counts + factor.get('TW_DP_prior_counts', 0.)
+        if state_counts.ndim == 1:
+            if states:
+                factor['TW_DP_params'][:] = state_counts / state_counts.sum()
+            return
+        factor['TW_DP_params'][states] = (
+            state_counts[states] /
+            np.vstack(state_counts[states].sum(axis=1)))
+    
+    def update_spectral_components_blocked(self, hat_W):
+        """Update the spectral components, as
+        :py:meth:`FASST.update_spectral_components`, but processing the
+        frames block by block (see :py:attr:`FASST.frameBlockSize`).
+        `hat_W` can therefore be a memory-mapped array.
+        
+        The numerators and denominators of the multiplicative updates are
+        accumulated over the blocks for `FB`, `FW` (and `TW` when there are
+        time blocks `TB`), and computed block by block for `TW` and `TB`.
+        Instead of being cached over all the frames, the powers are
+        re-computed from the parameters, for each block.
+        
+        NB: only the NMF time constraint (`'TW_constr'`) is supported, and
+        no correlation penalization (:py:attr:`FASST.lambdaCorr`).
+        """
+        if self.lambdaCorr > 0:
+            raise NotImplementedError(
+                "Correlation penalization not implemented by frame blocks.")
+        if self.verbose:
+            print "    Update the spectral components, by frame blocks"
+        omega = self.nmfUpdateCoeff
+        
+        for spec_comp_ind, spec_comp in self.spec_comps.items():
+            nbfactors = len(spec_comp['factor'])
+            spat_comp_ind = spec_comp['spat_comp_ind']
+            
+            for fact_ind, factor in spec_comp['factor'].items():
+                if factor['TW_frdm_prior'] == 'free' and \
+                       factor['TW_constr'] != 'NMF':
+                    raise NotImplementedError(
+                        "Only NMF time constraint implemented by frame "+
+                        "blocks, not " + str(factor['TW_constr']))
+                other_fact_ind_arr = range(nbfactors)
+                other_fact_ind_arr.remove(fact_ind)
+                if nbfactors == 1:
+                    # the "other" factors power is then the power of the
+                    # component, with the parameters before the updates:
+                    init_factor = dict(
+                        [(part, np.copy(factor[part]))
+                         for part in ('FB', 'FW', 'TW', 'TB')])
+                
+                for part in ('FB', 'FW', 'TW', 'TB'):
+                    if not len(factor[part]) or \
+                           factor[part + '_frdm_prior'] != 'free':
+                        continue
+                    if self.verbose>1:
+                        print "    Updating %s %d-%d" %(
+                            part, spec_comp_ind, fact_ind)
+                    comp_num = np.zeros_like(factor[part])
+                    comp_den = np.zeros_like(factor[part])
+                    for frames in self.frame_blocks():
+                        if nbfactors == 1:
+                            if len(init_factor['TB']):
+                                H = np.dot(init_factor['TW'],
+                                           init_factor['TB'][:,frames])
+                            else:
+                                H = init_factor['TW'][:,frames]
+                            other_fact_power = np.dot(
+                                np.dot(init_factor['FB'], init_factor['FW']),
+                                H)
+                        else:
+                            other_fact_power = self.comp_spat_comp_power(
+                                spat_comp_ind=spat_comp_ind,
+                                spec_comp_ind=[spec_comp_ind],
+                                factor_ind=other_fact_ind_arr,
+                                frames=frames)
+                        other_fact_power = np.maximum(other_fact_power,
+                                                      self.eps)
+                        if part == 'FB':
+                            spat_comp_power = self.comp_spat_comp_power(
+                                spat_comp_ind, frames=frames)
+                        else:
+                            spat_comp_power = self.comp_spat_comp_power(
+                                spat_comp_ind, spec_comp_ind=[spec_comp_ind],
+                                frames=frames)
+                        spat_comp_power = np.maximum(spat_comp_power,
+                                                     self.eps)
+                        if part == 'TB':
+                            num_ratio = (
+                                hat_W[spat_comp_ind][:,frames] /
+                                np.maximum(spat_comp_power**2, self.eps)
+                                * other_fact_power)
+                        else:
+                            num_ratio = (
+                                hat_W[spat_comp_ind][:,frames] /
+                                (spat_comp_power**2)
+                                * other_fact_power)
+                        den_ratio = other_fact_power / spat_comp_power
+                        del other_fact_power, spat_comp_power
+                        
+                        if len(factor['TB']):
+                            H = np.dot(factor['TW'], factor['TB'][:,frames])
+                        else:
+                            H = factor['TW'][:,frames]
+                        
+                        if part == 'FB':
+                            FW_H = np.dot(factor['FW'], H).T
+                            comp_num += np.dot(num_ratio, FW_H)
+                            comp_den += np.dot(den_ratio, FW_H)
+                        elif part == 'FW':
+                            comp_num += np.dot(factor['FB'].T,
+                                               np.dot(num_ratio, H.T))
+                            comp_den += np.dot(factor['FB'].T,
+                                               np.dot(den_ratio, H.T))
+                        elif part == 'TW':
+                            W = np.dot(factor['FB'], factor['FW'])
+                            if len(factor['TB']):
+                                TB = factor['TB'][:,frames]
+                                comp_num += np.dot(W.T,
+                                                   np.dot(num_ratio, TB.T))
+                                comp_den += np.dot(W.T,
+                                                   np.dot(den_ratio, TB.T))
+                            else:
+                                comp_num[:,frames] = np.dot(W.T, num_ratio)
+                                comp_den[:,frames] = np.dot(W.T, den_ratio)
+                        else: # TB
+                            W = np.dot(np.dot(factor['FB'], factor['FW']),
+                                       factor['TW'])
+                            comp_num[:,frames] = np.dot(W.T, num_ratio)
+                            comp_den[:,frames] = np.dot(W.T, den_ratio)
+                        del num_ratio, den_ratio, H
+                    
+                    factor[part] *= (
+                        comp_num / np.maximum(comp_den, self.eps)) ** omega
+                    del comp_num, comp_den
     
     def renormalize_parameters(self):
         """renormalize_parameters
@@ -1991,6 +3985,13 @@ class FASST(object):
         Kspat = len(self.spat_comps)
         spat_global_energy = np.zeros(Kspat)
         for spat_ind, spat_comp in self.spat_comps.items():
+            # making sure the parameters have the desired precision:
+            if np.iscomplexobj(spat_comp['params']):
+                spat_comp['params'] = spat_comp['params'].astype(
+                    self.complexDtype, copy=False)
+            else:
+                spat_comp['params'] = spat_comp['params'].astype(
+                    self.dtype, copy=False)
             spat_global_energy[spat_ind] = (
                 np.mean (np.abs(spat_comp['params'])**2))
             spat_comp['params'] /= np.sqrt(spat_global_energy[spat_ind])
@@ -2006,6 +4007,10 @@ class FASST(object):
             nbfactors = len(spec_comp['factor'])
             
             for fact_ind, factor in spec_comp['factor'].items():
+                for part in ('FB', 'FW', 'TW', 'TB'):
+                    if len(factor[part]):
+                        factor[part] = factor[part].astype(self.dtype,
+                                                           copy=False)
                 factor['FB'] *= global_energy
                 w = factor['FB'].max(axis=0)#.mean(axis=0)
                 w[w==0] = 1.
@@ -2020,9 +4025,9 @@ class FASST(object):
                     # Only testing this: in order to avoid
                     # big crash, if for one factor, everything in TW
                     # turns out to get 0, then "restart" it with random
-                    if np.sum(factor['TW']) < eps:
+                    if np.sum(factor['TW']) < self.eps:
                         factor['TW'] = np.random.randn(*factor['TW'].shape)**2
-                        factor['TW'] *= 1e3 * eps # so it s not too small
+                        factor['TW'] *= 1e3 * self.eps # so it s not too small
                         if self.verbose:
                             print "    renorm: reinitialized TW for spec",
                             print spec_ind, "factor", fact_ind
@@ -2118,10 +4123,20 @@ class FASST(object):
     def initialize_all_spec_comps_with_NMF_indiv(self, niter=10,
                                                  updateFreqBasis=True,
                                                  updateTimeWeight=True,
+                                                 nbRestarts=1,
+                                                 restartIter=5,
+                                                 nbProcesses=None,
+                                                 seed=None,
                                                  **kwargs):
         """initialize the spectral components with an NMF decomposition,
         with individual decomposition of the monophonic signal TF
         representation.
+        
+        With `nbRestarts` more than 1, the NMF is started from the current
+        parameters and from `nbRestarts - 1` random starts, and only the
+        best of these after `restartIter` iterations is continued (see
+        :py:func:`pyfasst.tools.nmf.NMF_multi_restart`, for `nbProcesses`
+        and `seed`).
 
         TODO make keepFBind and keepTWind, in order to provide
         finer control on which indices are updated. Also requires
@@ -2148,20 +4163,16 @@ class FASST(object):
         
         # computing the monaural signal representation
         #     summing the contributions over all the channels:
-        nc = self.audioObject.channels
-        Cx = np.copy(np.real(self.Cx[0]))
-        for chan in range(1, nc):
-            # stored an "efficient" way, so index "complicated":
-            index = np.sum(np.arange(nc, nc-chan, -1))
-            Cx += np.real(self.Cx[index])
-            
-        Cx /= np.double(nc)
+        Cx = self.comp_mono_Cx()
         
-        W, H = NMF_decomp_init(SX=Cx, nbComps=totalNMFComps,
-                               niter=niter, verbose=self.verbose,
-                               Winit=FBinit, Hinit=TWinit,
-                               updateW=updateFreqBasis,
-                               updateH=updateTimeWeight)
+        W, H = NMF_multi_restart(SX=Cx, nbComps=totalNMFComps,
+                                 niter=niter, verbose=self.verbose,
+                                 Winit=FBinit, Hinit=TWinit,
+                                 updateW=updateFreqBasis,
+                                 updateH=updateTimeWeight,
+                                 nbRestarts=nbRestarts,
+                                 restartIter=restartIter,
+                                 nbProcesses=nbProcesses, seed=seed)
         
         # copy the result in the corresponding spec_comps:
         for spec_ind, spec_comp in self.spec_comps.items():
@@ -2171,19 +4182,27 @@ class FASST(object):
                 spec_comp['factor'][0]['FB'] = (
                     np.maximum(
                         W[:,ind_start:ind_stop],
-                        eps)
+                        self.eps)
                     )
             if updateTimeWeight:
                 spec_comp['factor'][0]['TW'] = ( 
-                    np.maximum(H[ind_start:ind_stop],eps))
+                    np.maximum(H[ind_start:ind_stop],self.eps))
                 
         self.renormalize_parameters()
     
     def initialize_all_spec_comps_with_NMF_same(self, niter=10,
+                                                nbRestarts=1,
+                                                restartIter=5,
+                                                nbProcesses=None,
+                                                seed=None,
                                                 **kwargs):
         """
         Initialize all the components with the same amplitude and spectral
         matrices `W` and `H`.
+        
+        With `nbRestarts` more than 1, the best of `nbRestarts` random
+        starts after `restartIter` iterations is continued (see
+        :py:func:`pyfasst.tools.nmf.NMF_multi_restart`).
         """
         if not np.all([len(spec_comp['factor'])==1
                        for spec_comp in self.spec_comps.values()]):
@@ -2194,19 +4213,19 @@ class FASST(object):
                        for spec_comp in self.spec_comps.values()]
         nbComps = np.max(nbSpecComps)
         
-        nc = self.audioObject.channels
         # computing the signal representation
-        Cx = np.copy(np.real(self.Cx[0]))
-        for chan in range(1, nc):
-            # stored an "efficient" way, so index "complicated":
-            index = np.sum(np.arange(nc, nc-chan, -1))
-            Cx += np.real(self.Cx[index])
-            
-        Cx /= np.double(nc)
+        Cx = self.comp_mono_Cx()
         
         # computing NMF of Cx:
-        W, H = NMF_decomposition(SX=Cx, verbose=self.verbose,
-                                 nbComps=nbComps, niter=niter)
+        if nbRestarts > 1:
+            W, H = NMF_multi_restart(SX=Cx, verbose=self.verbose,
+                                     nbComps=nbComps, niter=niter,
+                                     nbRestarts=nbRestarts,
+                                     restartIter=restartIter,
+                                     nbProcesses=nbProcesses, seed=seed)
+        else:
+            W, H = NMF_decomposition(SX=Cx, verbose=self.verbose,
+                                     nbComps=nbComps, niter=niter)
         
         # reordering so that most energy in first components
         Hsum = H.sum(axis=1)
@@ -2287,7 +4306,7 @@ class FASST(object):
             spat_comp['params'] = np.zeros([self.rank[nspat],
                                             nc,
                                             self.nbFreqsSigRepr],
-                                           dtype=np.complex)
+                                           dtype=self.complexDtype)
             for r in range(self.rank[nspat]):
                 spat_comp['params'][r] = (
                     A[spat_ind].T
@@ -2503,7 +4522,7 @@ class MultiChanNMFConv(MultiChanNMFInst_FASST):
                 spat_comp['params'] = np.zeros([self.rank[nspat],
                                                 nc,
                                                 self.nbFreqsSigRepr],
-                                               dtype=np.complex)
+                                               dtype=self.complexDtype)
                 for f in range(self.nbFreqsSigRepr):
                     spat_comp['params'][:,:,f] = spat_comp_param_inst.T
 
@@ -2626,7 +4645,7 @@ class multiChanSourceF0Filter(FASST):
         # removing patterns in low energy bins - setting to eps:
         for nwf0comp in range(WF0.shape[1]): 
             indLowEnergy = np.where(WF0[:,nwf0comp]<WF0[:,nwf0comp].max()*1e-4)
-            WF0[indLowEnergy, nwf0comp] = eps
+            WF0[indLowEnergy, nwf0comp] = self.eps
         self.sourceFreqComps = (
             np.ascontiguousarray(
             np.hstack([WF0[:self.nbFreqsSigRepr],
@@ -2880,15 +4899,8 @@ class multiChanSourceF0Filter(FASST):
         """
         # we initialize the matrices with NMF decomposition using the
         # source matrix as basis W, the residual is left uninitialized
-        nc = self.audioObject.channels
         # computing the signal representation
-        Cx = np.copy(np.real(self.Cx[0]))
-        for chan in range(1, nc):
-            # stored an "efficient" way, so index "complicated":
-            index = np.sum(np.arange(nc, nc-chan, -1))
-            Cx += np.real(self.Cx[index])
-        
-        Cx /= np.double(nc)
+        Cx = self.comp_mono_Cx()
         
         # computing NMF of Cx:
         W, H = NMF_decomp_init(SX=Cx,
@@ -2925,58 +4937,27 @@ class multiChanSourceF0Filter(FASST):
                 spat_comp['params'] = np.zeros([self.rank[nspat],
                                                 nc,
                                                 self.nbFreqsSigRepr],
-                                               dtype=np.complex)
+                                               dtype=self.complexDtype)
                 for f in range(self.nbFreqsSigRepr):
                     spat_comp['params'][:,:,f] = (
                         np.atleast_2d(spat_comp_param_inst.T))
     
-    def estim_param_a_post_model(self,):
-        """estim_param_a_post_model
+    def post_GEM_iteration(self, progress):
+        """post_GEM_iteration
         
-        Estimation of model parameters, using the sparsity constraints.
+        Reweighs the sparsity constraints after each GEM iteration: the
+        width of the sparsity prior decreases geometrically with the
+        `progress` in the estimation schedule.
         """
-        
         logSigma0 = np.log(np.max([spec['factor'][0]['TW'].shape[0]
                                    for spec in self.spec_comps.values()])**2)
         logSigmaInf = np.log(9.0)
         
-        logliks = np.ones(self.iter_num)
-        
-        if self.noise['sim_ann_opt'] in ['ann', ]:
-            self.noise['PSD'] = self.noise['ann_PSD_lim'][0]
-        elif self.noise['sim_ann_opt'] is 'no_ann':
-            self.noise['PSD'] = self.noise['ann_PSD_lim'][1]
-        else:
-            warnings.warn("To add noise to the signal, provide the "+
-                          "sim_ann_opt from any of 'ann', "+
-                          "'no_ann' or 'ann_ns_inj' ")
-            
-        for i in range(self.iter_num):
-            if self.verbose:
-                print "Iteration", i+1, "on", self.iter_num
-            # adding the noise psd if required:
-            if self.noise['sim_ann_opt'] in ['ann', 'ann_ns_inj']:
-                self.noise['PSD'] = (
-                    (np.sqrt(self.noise['ann_PSD_lim'][0]) *
-                     (self.iter_num - i) +
-                     np.sqrt(self.noise['ann_PSD_lim'][1]) * i) /
-                    self.iter_num) ** 2
-                
-            # running the GEM iteration:
-            logliks[i] = self.GEM_iteration()
-            if self.verbose:
-                print "    log-likelihood:", logliks[i]
-                if i>0:
-                    print "        improvement:", logliks[i]-logliks[i-1]
-                    
-            # sparsity
-            sigma = np.exp(logSigma0 +
-                           (logSigmaInf - 
-                            logSigma0) / 
-                           max(self.iter_num - 1.0, 1.) * i)
-            self.reweigh_sparsity_constraint(sigma)
-            
-        return logliks
+        # sparsity
+        sigma = np.exp(logSigma0 +
+                       (logSigmaInf - 
+                        logSigma0) * progress)
+        self.reweigh_sparsity_constraint(sigma)
     
     def reweigh_sparsity_constraint(self, sigma):
         """reweigh_sparsity_constraint
@@ -2996,7 +4977,7 @@ class multiChanSourceF0Filter(FASST):
                            (np.arange(K - 1, 0, -1))**2, 
                            TW[:-1,:]) / 
                     np.dot((np.arange(K - 1, 0, -1))**2,
-                           np.maximum(TW[:-1,:], eps))
+                           np.maximum(TW[:-1,:], self.eps))
                     )
                 # smoothing the sequence:
                 muTW  = st.medianFilter(muTW, length=spec_comp['sparsity'])
@@ -3060,13 +5041,28 @@ class multichanLead(multiChanSourceF0Filter):
     def runDecomp(self, instrus=[],
                   instru2modelfile={},
                   dir_results='tmp/', maxFrames=4000,
-                  niter_nmf=20, niter_simm=30):
+                  niter_nmf=20, niter_simm=30, writeIntermediate=True):
         """Running the scheme that should make me famous.
+        
+        The sources separated before the final GEM estimation are passed
+        in memory to DEMIX (see :py:meth:`multichanLead.initConvDemixOnSepSrc`).
+        They are also written in `dir_results` if `writeIntermediate` is
+        `True`.
+        
+        If :py:attr:`FASST.checkpointFile` exists, the previous run was
+        interrupted during the final GEM estimation: it is resumed with
+        :py:meth:`multichanLead.resumeDecomp`, skipping the SIMM and DEMIX
+        stages.
         """
         # checking the folder for results
         if not os.path.isdir(dir_results):
             os.mkdir(dir_results)
         
+        if self.checkpointFile is not None and \
+               os.path.isfile(self.checkpointFile):
+            return self.resumeDecomp(instrus=instrus,
+                                     dir_results=dir_results)
+        
         # running some checks that the input is alright:
         for i in instrus:
             if not(i=='SourceFilter' or
@@ -3226,8 +5222,9 @@ class multichanLead(multiChanSourceF0Filter):
         
         # separate the files with these parameters:
         self.renormalize_parameters()
-        self.separate_spat_comps(dir_results=dir_results,
-                                 suffix=suffix)
+        images = self.separate_spat_comps(dir_results=dir_results,
+                                          suffix=suffix,
+                                          writeFiles=writeIntermediate)
         
         if self.verbose>1:
             print suffix
@@ -3248,10 +5245,12 @@ class multichanLead(multiChanSourceF0Filter):
         ##
         ##self.renormalize_parameters()
         
-        estFiles = self.initConvDemixOnSepSrc(suffix)
+        self.initConvDemixOnSepSrc(suffix, images=images)
+        del images
         
-        self.separate_spatial_filter_comp(dir_results=dir_results,
-                                          suffix=suffix)
+        if writeIntermediate:
+            self.separate_spatial_filter_comp(dir_results=dir_results,
+                                              suffix=suffix)
         
         # Re-estimating all the parameters:
         logliks = self.estim_param_a_post_model()
@@ -3264,6 +5263,22 @@ class multichanLead(multiChanSourceF0Filter):
                                  suffix=suffix)
         return logliks
     
+    def resumeDecomp(self, instrus=[], dir_results='tmp/'):
+        """Resumes the GEM estimation of :py:meth:`multichanLead.runDecomp`
+        from :py:attr:`FASST.checkpointFile`, and writes the separated
+        sources. `instrus` should be the same as for the interrupted run.
+        """
+        self.rank = self.spatial_rank
+        self.comp_transf_Cx()
+        logliks = self.resume_estimation()
+        
+        suffix = dict(enumerate(instrus))
+        if self.verbose:
+            print "Writing files to", dir_results
+        self.separate_spat_comps(dir_results=dir_results,
+                                 suffix=suffix)
+        return logliks
+    
     def estimSIMM(self, maxFrames=4000, dir_results='tmp/', simmIterNum=30):
         """This method runs the SIMM estimation on the provided audio file.
         
@@ -3355,6 +5370,9 @@ class multichanLead(multiChanSourceF0Filter):
     def demixOnGivenFile(self, filename, nsources=1):
         '''running the DEMIX algorithm from :demix.DEMIX:
         
+        `filename` can also be an :py:class:`pyfasst.audioObject.AudioObject`,
+        for instance with the data of a separated source, see
+        :py:meth:`multichanLead.initConvDemixOnSepSrc`.
         '''
         maxclusters = 40
         neighbours = 15
@@ -3392,22 +5410,41 @@ class multichanLead(multiChanSourceF0Filter):
                                                    A.shape[1], A.shape[2]])
         return A
     
-    def initConvDemixOnSepSrc(self, suffix):
+    def initConvDemixOnSepSrc(self, suffix, images=None):
         """initialize the convolutive parameters with DEMIX, running on each of
         the separated sources
+        
+        :param list images:
+            the separated source images, as returned by
+            :py:meth:`FASST.separate_spat_comps`. If `None`, the files
+            written by the latter, in :py:attr:`FASST.files`, are read.
+        
+        :returns:
+            `estFiles`: the list of the files of the separated sources, or
+            `None` if `images` were provided.
         """
-        if not hasattr(self, "files"):
+        if images is not None:
+            estFiles = None
+            estAudio = []
+            for ndata in images:
+                audioObj = ao.AudioObject(filename=None, mode='w')
+                audioObj.samplerate = self.audioObject.samplerate
+                audioObj.data = ndata
+                estAudio.append(audioObj)
+        elif not hasattr(self, "files"):
             warnings.warn("The sources were not separated, compute them first"+
                           " with separate_spat_comps.")
             return None
-        estFiles = self.files['spat_comp']
+        else:
+            estFiles = self.files['spat_comp']
+            estAudio = estFiles
         nbSources = len(self.spat_comps)
         if self.verbose>1:
             print nbSources, "sources:", estFiles
-        for nest, estfilename in enumerate(estFiles):
+        for nest, estaudio in enumerate(estAudio):
             if self.verbose>1:
-                print estfilename
-            A = self.demixOnGivenFile(estfilename, nsources=1)
+                print estaudio
+            A = self.demixOnGivenFile(estaudio, nsources=1)
             for r in range(self.rank[nest]):
                 self.spat_comps[nest]['params'][r][:,:] = (
                     A[0].T + 1e-3 * np.random.randn(*A[0].T.shape))
@@ -3416,3 +5453,292 @@ class multichanLead(multiChanSourceF0Filter):
         
         return estFiles
     
+
+class StreamFASST(object):
+    """\
+    Streaming separation with a FASST model, for live input: the signal is
+    provided block by block to :py:meth:`StreamFASST.process`, which returns
+    the separated source images with a bounded latency, of about one
+    analysis window.
+    
+    The spectral dictionaries, that is the frequency bases `FB` and
+    weights `FW` of the spectral components of `model`, are kept fixed
+    (learned offline, or set with
+    :py:meth:`MultiChanNMFInst_FASST.setSpecCompFB`). For each block, only
+    the time weights `TW` of the new frames are estimated, and the mixing
+    parameters are updated from exponentially forgotten sufficient
+    statistics. The separated images are synthesized by overlap-add with
+    :py:class:`pyfasst.tftransforms.stft.StreamSTFT`.
+    
+    **Inputs:**
+    
+    :param model:
+        a :py:class:`FASST` instance, with the STFT as signal
+        representation, a stereo signal, and spectral components with
+        NMF time constraints and no time blobs `TB`. It is copied, and not
+        modified.
+    :param double forgetFactor:
+        the forgetting factor, per frame, of the statistics for the mixing
+        parameters: the statistics of a frame `n` frames in the past are
+        weighted by ``forgetFactor ** n``.
+    :param integer nbIterPerBlock:
+        number of GEM iterations for each block of frames.
+    
+    **Example:**
+    
+    ::
+    
+        >>> model = am.MultiChanNMFInst_FASST(audio='data/tamy.wav',
+                                              nbComps=2, spatial_rank=1)
+        >>> model.estim_param_a_post_model()
+        >>> stream = am.StreamFASST(model)
+        >>> for block in blocks: # (nsamples x 2) arrays, as they arrive
+        ...     images = stream.process(block)
+        >>> images = stream.flush()
+    
+    """
+    def __init__(self, model, forgetFactor=0.99, nbIterPerBlock=5):
+        if model.sig_repr_params['transf'] != 'stft':
+            raise NotImplementedError(
+                "Streaming only implemented for the STFT.")
+        nc = model.audioObject.channels
+        if nc != 2:
+            raise NotImplementedError(
+                "Streaming separation only implemented for stereo signals.")
+        
+        # the parameters are modified block by block on a copy of the model:
+        self.model = copy.copy(model)
+        self.model.spat_comps = copy.deepcopy(model.spat_comps)
+        self.model.spec_comps = copy.deepcopy(model.spec_comps)
+        self.model.noise = copy.deepcopy(model.noise)
+        self.model.Cx = None
+        self.model.frameBlockSize = None
+        if self.model.noise['sim_ann_opt'] in ['ann', 'ann_ns_inj']:
+            # the end of the annealing schedule:
+            self.model.noise['PSD'] = self.model.noise['ann_PSD_lim'][1]
+        
+        for spec_comp in self.model.spec_comps.values():
+            for factor in spec_comp['factor'].values():
+                if len(factor['TB']) or factor['TW_constr'] != 'NMF':
+                    raise NotImplementedError(
+                        "Streaming only implemented for NMF time weights, "+
+                        "without time blobs.")
+                factor['FB_frdm_prior'] = 'fixed'
+                factor['FW_frdm_prior'] = 'fixed'
+        # the state at the beginning of a stream, see reset_state:
+        self.init_spat_comps = copy.deepcopy(self.model.spat_comps)
+        self.init_TW = {}
+        for spec_ind, spec_comp in self.model.spec_comps.items():
+            self.init_TW[spec_ind] = {}
+            for fact_ind, factor in spec_comp['factor'].items():
+                self.init_TW[spec_ind][fact_ind] = np.mean(factor['TW'],
+                                                           axis=1)
+        
+        self.forgetFactor = forgetFactor
+        self.nbIterPerBlock = nbIterPerBlock
+        self.reset_state()
+        
+        tfparams = dict(linFTLen=model.tft.ftlen,
+                        atomHopFactor=model.tft.atomHopFactor,
+                        winFunc=model.tft.winFunc,
+                        synthWinFunc=model.tft.synthWinFunc,
+                        fs=model.tft.fs)
+        self.stft = tft.StreamSTFT(nchannels=nc, **tfparams)
+        self.synth = [tft.StreamSTFT(nchannels=nc, **tfparams)
+                      for spat_ind in self.model.spat_comps]
+        self.nbSamplesIn = 0
+        self.nbSamplesOut = 0
+    
+    def reset_state(self):
+        """Resets the estimation state to the one at the beginning of a
+        stream: the mixing parameters of the model, the initial time
+        weights :py:attr:`StreamFASST.TW_init` (the mean time weights of
+        the model) and the forgotten statistics.
+        """
+        self.model.spat_comps = copy.deepcopy(self.init_spat_comps)
+        # the time weights of the new frames start from their mean:
+        self.TW_init = dict(
+            (spec_ind, dict((fact_ind, np.copy(TW))
+                            for fact_ind, TW in TWs.items()))
+            for spec_ind, TWs in self.init_TW.items())
+        # forgotten sums of hat_Rxs and hat_Rss, and their total weight:
+        self.mix_stats = None
+        self.mix_stats_weight = 0.
+    
+    def process(self, data, estimate=True):
+        """Processes the new samples in `data`, a (`nsamples` x 2) array,
+        in the same scale as the data of the model,
+        :py:attr:`FASST.audioObject.data`.
+        
+        If `estimate` is `False`, or if the new frames are silent (their
+        power is below :py:attr:`FASST.eps`), the parameters are not
+        estimated on the new frames: their time weights are the initial
+        ones (:py:attr:`StreamFASST.TW_init`). Silent frames carry no
+        information on the mixing parameters, which would be set to 0.
+        
+        :returns:
+            `images`: the list of the newly synthesized samples of the
+            images of the spatial components, as (`nsamples_out` x 2)
+            arrays. The number of samples depends on the frames that could
+            be completed, `nsamples_out` may be 0.
+        """
+        self.nbSamplesIn += data.shape[0]
+        X = self.stft.analyse(data).astype(self.model.complexDtype)
+        if X.shape[-1] and estimate and \
+               np.max(np.abs(X))**2 >= self.model.eps:
+            self.estim_block(X)
+        elif X.shape[-1]:
+            self.init_block_frames(X.shape[-1])
+        images = self.separate_block(X)
+        self.nbSamplesOut += images[0].shape[0]
+        return images
+    
+    def flush(self):
+        """Processes the remaining samples, and returns the end of the
+        source images, as :py:meth:`StreamFASST.process`. The total
+        number of returned samples is then the number of processed samples.
+        
+        The frames overlapping the end of the signal are completed with
+        zeros, and synthesized with the current parameters, without
+        estimation. The buffers and the estimation state are then reset
+        (see :py:meth:`StreamFASST.reset_state`), for a new stream.
+        """
+        nbSamplesIn = self.nbSamplesIn
+        images = self.process(np.zeros([self.stft.ftlen, 2]), estimate=False)
+        nbRemaining = nbSamplesIn - self.nbSamplesOut + images[0].shape[0]
+        images = [
+            np.concatenate((image, synth.flush()))[:nbRemaining]
+            for image, synth in zip(images, self.synth)]
+        self.stft.reset()
+        self.nbSamplesIn = 0
+        self.nbSamplesOut = 0
+        self.reset_state()
+        return images
+    
+    def init_block_frames(self, nbFrames):
+        """Sets the time weights of the `nbFrames` frames of a new block to
+        the initial ones, :py:attr:`StreamFASST.TW_init`.
+        """
+        model = self.model
+        model.nbFramesSigRepr = nbFrames
+        for spec_ind, spec_comp in model.spec_comps.items():
+            for fact_ind, factor in spec_comp['factor'].items():
+                factor['TW'] = np.outer(self.TW_init[spec_ind][fact_ind],
+                                        np.ones(nbFrames)).astype(model.dtype)
+    
+    def estim_block(self, X):
+        """Estimates the time weights of the frames in `X`, (2 x
+        `nbFreqsSigRepr` x `nframes`) STFT of a new block, and updates the
+        mixing parameters, with :py:attr:`StreamFASST.nbIterPerBlock` GEM
+        iterations.
+        """
+        model = self.model
+        nbFrames = X.shape[-1]
+        self.init_block_frames(nbFrames)
+        if model.compactCx:
+            model.Cx = st.PackedCx(np.abs(X)**2, X[:1] * np.conj(X[1:]))
+        else:
+            model.Cx = np.array([np.abs(X[0])**2,
+                                 X[0] * np.conj(X[1]),
+                                 np.abs(X[1])**2])
+        
+        # weight of the forgotten statistics, relative to the new frames:
+        forget = self.forgetFactor ** nbFrames
+        for i in range(self.nbIterPerBlock):
+            spat_comp_powers, mix_matrix, rank_part_ind = (
+                model.retrieve_subsrc_params())
+            hat_Rxx, hat_Rxs, hat_Rss, hat_Ws, loglik = (
+                model.compute_suff_stat(spat_comp_powers, mix_matrix))
+            
+            # adding the forgotten statistics of the previous blocks:
+            block_stats = (nbFrames * hat_Rxs, nbFrames * hat_Rss)
+            if self.mix_stats is not None:
+                stats = [forget * past_stat + block_stat
+                         for past_stat, block_stat in zip(self.mix_stats,
+                                                          block_stats)]
+            else:
+                stats = block_stats
+            weight = forget * self.mix_stats_weight + nbFrames
+            model.update_mix_matrix(stats[0] / weight, stats[1] / weight,
+                                    mix_matrix, rank_part_ind)
+            
+            hat_W = np.zeros([len(rank_part_ind),
+                              model.nbFreqsSigRepr,
+                              nbFrames], dtype=model.dtype)
+            for w in range(len(rank_part_ind)):
+                hat_W[w] = np.mean(hat_Ws[rank_part_ind[w]], axis=0)
+            del spat_comp_powers, mix_matrix, hat_Rxx, hat_Ws
+            
+            # only the time weights are free:
+            model.update_spectral_components(hat_W)
+            self.renormalize_block()
+            
+        self.mix_stats = stats
+        self.mix_stats_weight = weight
+        for spec_ind, spec_comp in model.spec_comps.items():
+            for fact_ind, factor in spec_comp['factor'].items():
+                self.TW_init[spec_ind][fact_ind] = np.mean(factor['TW'],
+                                                           axis=1)
+    
+    def renormalize_block(self):
+        """Normalizes the mixing parameters, as
+        :py:meth:`FASST.renormalize_parameters`, but moving their energy to
+        the time weights of the last factors of the spectral components,
+        so that the dictionaries `FB` and `FW` are left unchanged.
+        
+        The spatial components whose energy is below :py:attr:`FASST.eps`
+        are left unchanged.
+        """
+        model = self.model
+        for spat_ind, spat_comp in model.spat_comps.items():
+            spat_global_energy = np.mean(np.abs(spat_comp['params'])**2)
+            if spat_global_energy < model.eps:
+                continue
+            spat_comp['params'] /= np.sqrt(spat_global_energy)
+            for spec_comp in model.spec_comps.values():
+                if spec_comp['spat_comp_ind'] == spat_ind:
+                    last_fact = max(spec_comp['factor'].keys())
+                    spec_comp['factor'][last_fact]['TW'] *= (
+                        spat_global_energy)
+    
+    def separate_block(self, X):
+        """Filters the frames `X` of the block with the Wiener gains of the
+        spatial components, and synthesizes their new samples.
+        
+        :returns:
+            `images`: the new samples of the spatial component images.
+        """
+        model = self.model
+        if not X.shape[-1]:
+            return [synth.synthesise(X) for synth in self.synth]
+        
+        nbSources = len(model.spat_comps)
+        sigma_comps_diag = []
+        sigma_comps_off = []
+        for spat_ind in range(nbSources):
+            spec_comp_ind = [spec_ind
+                             for spec_ind, spec_comp in model.spec_comps.items()
+                             if spec_comp['spat_comp_ind'] == spat_ind]
+            sigma_c_diag, sigma_c_off = model.compute_sigma_comp_2d(
+                spat_ind, spec_comp_ind)
+            sigma_comps_diag.append(sigma_c_diag)
+            sigma_comps_off.append(sigma_c_off)
+        sigma_comps_diag = np.array(sigma_comps_diag)
+        sigma_comps_off = np.array(sigma_comps_off)
+        inv_sigma_x_diag, inv_sigma_x_off = model.compute_inv_sigma_mix_2d(
+            sigma_comps_diag, sigma_comps_off)
+        
+        images = []
+        for n in range(nbSources):
+            WG = model.compute_Wiener_gain_2d(
+                sigma_comps_diag[n],
+                sigma_comps_off[n],
+                inv_sigma_x_diag,
+                inv_sigma_x_off)
+            Y = np.zeros_like(X)
+            for chan1 in range(2):
+                for chan2 in range(2):
+                    Y[chan1] += WG[chan1, chan2] * X[chan2]
+            images.append(self.synth[n].synthesise(Y))
+            del WG, Y
+        return images
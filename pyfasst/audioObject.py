@@ -153,10 +153,17 @@ class AudioObject(object):
             self._data = np.array(data.T, order='C')
         else:
             self._data = np.array(data, order='C')
-        self._maxdata = 1.1 * np.abs(self._data).max()
+        self._maxdata = np.maximum(
+            1.1 * np.abs(self._data).max(),
+            1e-10)
         self._encoding = self._data.dtype.name
         
         self._data = self._data / self._maxdata
+        if len(self._data.shape)==2:
+            self._nframes, self._channels = self._data.shape
+        else:
+            self._nframes = self._data.size
+            self._channels = 1
     
     def _get_data(self):
         if not hasattr(self, '_data'):
@@ -0,0 +1,173 @@
+"""\
+Description
+-----------
+
+Storage of fitted FASST models, to initialize the estimation on new signals
+of similar material (same band, same recording setup...) with
+:py:meth:`pyfasst.audioModel.FASST.warm_start`.
+
+The models are stored in a directory, one ``.npz`` archive per model, with
+their spectral and spatial components, the parameters of the signal
+representation and user-defined metadata, used to find the models suited to
+a new signal.
+
+Example::
+
+    >>> import pyfasst.audioModel as am
+    >>> from pyfasst.modelStore import ModelStore
+    >>> store = ModelStore('models/')
+    >>> model = am.MultiChanNMFInst_FASST(audio='data/tamy.wav', nbComps=2)
+    >>> model.estim_param_a_post_model()
+    >>> store.save(model, 'tamy', artist='tamy', studio='live')
+    >>> # a new track, from the same artist:
+    >>> model = am.MultiChanNMFInst_FASST(audio='data/tamy2.wav', nbComps=2,
+                                          iter_num=10)
+    >>> store.warm_start(model, artist='tamy')
+    >>> model.estim_param_a_post_model()
+
+2013 Jean-Louis Durrieu
+
+http://www.durrieu.ch
+
+"""
+
+import numpy as np
+import os, json
+
+from tools.utils import flatten_tree, unflatten_tree
+
+# the signal representation parameters that should match, for a warm start
+sig_repr_keys = ['transf', 'fsize', 'tffmin', 'tffmax', 'tfbpo']
+
+class ModelStore(object):
+    """A store of fitted models, in the directory `directory`.
+    
+    :param str directory:
+        the directory of the store, created if it does not exist.
+    
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        if not os.path.isdir(self.directory):
+            os.makedirs(self.directory)
+    
+    def filename(self, name):
+        """The filename of the archive for the model `name`.
+        """
+        return os.path.join(self.directory, name + '.npz')
+    
+    def names(self):
+        """Returns the sorted list of the names of the stored models.
+        """
+        return sorted(filename[:-4]
+                      for filename in os.listdir(self.directory)
+                      if filename.endswith('.npz'))
+    
+    def save(self, model, name, **metadata):
+        """Saves the spectral and spatial components of `model`, a fitted
+        :py:class:`pyfasst.audioModel.FASST` instance, under `name`, with
+        the keyword arguments as `metadata`. The metadata should be simple
+        python values (strings, numbers, lists of them).
+        
+        An existing model with the same name is replaced.
+        """
+        sig_repr = dict((key, model.sig_repr_params[key])
+                        for key in sig_repr_keys)
+        sig_repr['samplerate'] = model.audioObject.samplerate
+        sig_repr['nbFreqsSigRepr'] = int(model.nbFreqsSigRepr)
+        sig_repr['channels'] = model.audioObject.channels
+        entry = {'spec_comps': model.spec_comps,
+                 'spat_comps': model.spat_comps,}
+        skeleton, arrays = flatten_tree(entry)
+        description = {'metadata': metadata,
+                       'sig_repr': sig_repr,
+                       'class': type(model).__name__}
+        filename = self.filename(name)
+        tmpFilename = filename + '.tmp'
+        with open(tmpFilename, 'wb') as fileobj:
+            np.savez(fileobj, skeleton=json.dumps(skeleton),
+                     description=json.dumps(description), **arrays)
+        os.rename(tmpFilename, filename)
+        return filename
+    
+    def describe(self, name):
+        """Returns the description of the model `name`, a dictionary with
+        its `'metadata'`, the parameters of its signal representation
+        `'sig_repr'`, and the name of the model `'class'`. Only this
+        description is read from the archive.
+        """
+        archive = np.load(self.filename(name))
+        description = json.loads(str(archive['description']))
+        archive.close()
+        return description
+    
+    def load(self, name):
+        """Loads the model `name`.
+        
+        :returns:
+            `spec_comps`, `spat_comps`: the spectral and spatial components
+            of the model, as in :py:class:`pyfasst.audioModel.FASST`.
+        """
+        archive = np.load(self.filename(name))
+        skeleton = json.loads(str(archive['skeleton']))
+        arrays = dict((key, archive[key])
+                      for key in archive.files
+                      if key not in ('skeleton', 'description'))
+        archive.close()
+        entry = unflatten_tree(skeleton, arrays)
+        return entry['spec_comps'], entry['spat_comps']
+    
+    def find(self, model=None, **metadata):
+        """Finds the models whose metadata contain the provided keyword
+        arguments. If `model` is provided, only the models of the same
+        class and with the same signal representation are kept.
+        
+        :returns:
+            the list of the names of the matching models.
+        """
+        names = []
+        for name in self.names():
+            description = self.describe(name)
+            if any(description['metadata'].get(key) != value
+                   for key, value in metadata.items()):
+                continue
+            if model is not None and not self.is_compatible(description,
+                                                            model):
+                continue
+            names.append(name)
+        return names
+    
+    def is_compatible(self, description, model):
+        """Checks that `model` is of the class of the stored model with the
+        given `description`, so that their components have the same
+        structure, and that their signal representations are the same.
+        """
+        sig_repr = description['sig_repr']
+        return (description.get('class') == type(model).__name__ and
+                all(sig_repr[key] == model.sig_repr_params[key]
+                    for key in sig_repr_keys) and
+                sig_repr['samplerate'] == model.audioObject.samplerate and
+                sig_repr['nbFreqsSigRepr'] == model.nbFreqsSigRepr and
+                sig_repr['channels'] == model.audioObject.channels)
+    
+    def warm_start(self, model, name=None, **metadata):
+        """Initializes `model` with a stored model, with
+        :py:meth:`pyfasst.audioModel.FASST.warm_start`: the model `name`,
+        or else the first compatible model matching `metadata`, see
+        :py:meth:`ModelStore.find`.
+        
+        :returns:
+            the name of the model used for the initialization.
+        """
+        if name is None:
+            names = self.find(model=model, **metadata)
+            if not len(names):
+                raise ValueError("No stored model matches "+str(metadata))
+            name = names[0]
+        elif not self.is_compatible(self.describe(name), model):
+            raise ValueError("The class or the signal representation of "+
+                             "the stored model "+name+" does not match "+
+                             "the model's.")
+        spec_comps, spat_comps = self.load(name)
+        model.warm_start(spec_comps, spat_comps)
+        return name
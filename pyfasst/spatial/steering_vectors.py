@@ -82,7 +82,8 @@ def dir_diag_stereo(Cx,
     """Compute the diagram of directivity for the input
     short time Fourier transform second order statistics in Cx
     (this Cx is compatible with the attribute from an instantiation
-    of :py:class:`pyfasst.audioModel.FASST`)
+    of :py:class:`pyfasst.audioModel.FASST`, including its compact layout
+    :py:class:`pyfasst.tools.signalTools.PackedCx`, with real powers)
     
     .. math::
     
@@ -120,8 +121,8 @@ def dir_diag_stereo(Cx,
     nchannels = 2 # this function only works for stereo audio
     
     # for capon, we need the average of Cx:
-    meanCx_diag = np.array([Cx[0].mean(axis=1),
-                            Cx[2].mean(axis=1)],
+    meanCx_diag = np.array([np.real(Cx[0].mean(axis=1)),
+                            np.real(Cx[2].mean(axis=1))],
                            dtype=np.float64)
     meanCx_off  = Cx[1].mean(axis=1)
     # ... and its inverse:
@@ -0,0 +1,228 @@
+"""\
+Description
+-----------
+
+Array-backed storage of the factors of the spectral components of a
+:py:class:`pyfasst.audioModel.FASST` model.
+
+In :py:attr:`pyfasst.audioModel.FASST.spec_comps`, the parameters of the
+factor `f` of the spectral component `k` are in the dictionary
+``spec_comps[k]['factor'][f]``. With a :py:class:`SpecCompStore`, the
+factors whose parameters `FB`, `FW`, `TW` (and `TB`) have the same shapes,
+for instance the source factors of all the sources of
+:py:class:`pyfasst.audioModel.multiChanSourceF0Filter`, are stacked in
+contiguous 3-D arrays, such that their powers are computed with batched
+matrix products (:py:meth:`SpecCompStore.iter_factor_powers`).
+
+The factor dictionaries are replaced by :py:class:`StackedFactor` objects,
+which behave as the original dictionaries, the parameters being views in
+the stacked arrays: the existing code, reading or modifying the
+parameters, in place or not, works unchanged.
+
+2013 Jean-Louis Durrieu
+
+http://www.durrieu.ch
+
+"""
+
+import numpy as np
+import collections
+
+from tools.signalTools import batch_dot
+
+# the parameters of a factor that can be stacked:
+stacked_parts = ('FB', 'FW', 'TW', 'TB')
+
+class SpecCompStore(object):
+    """Stacks the factors of the spectral components `spec_comps` which
+    have the same shapes, and replaces them, in `spec_comps`, by
+    :py:class:`StackedFactor` views on the stacked arrays.
+    
+    :param dict spec_comps:
+        the spectral components, as in
+        :py:attr:`pyfasst.audioModel.FASST.spec_comps`, modified in place.
+    :param dtype:
+        the floating point type of the stacked arrays.
+    
+    :var list groups:
+        the groups of stacked factors, as :py:class:`FactorGroup` objects.
+    
+    """
+    def __init__(self, spec_comps, dtype=np.float64):
+        self.dtype = np.dtype(dtype)
+        members = collections.OrderedDict()
+        for k, spec_comp in spec_comps.items():
+            for f, factor in spec_comp['factor'].items():
+                parts = tuple(part for part in stacked_parts
+                              if len(factor[part]))
+                key = (parts, tuple(np.shape(factor[part])
+                                    for part in parts))
+                members.setdefault(key, []).append((k, f))
+        
+        self.groups = []
+        for (parts, shapes), group_members in members.items():
+            group = FactorGroup(parts, shapes, len(group_members),
+                                self.dtype)
+            for index, (k, f) in enumerate(group_members):
+                spec_comps[k]['factor'][f] = group.attach(
+                    index, (k, f), spec_comps[k]['factor'][f])
+            self.groups.append(group)
+    
+    def iter_factor_powers(self, spec_comps, frames=None):
+        """Computes the powers :math:`(FB FW) (TW TB)` of the stacked
+        factors, group by group, with batched matrix products, restricted
+        to the slice `frames` if provided.
+        
+        Only the factors which are still stacked and still in
+        `spec_comps` are considered: a factor is no longer stacked when
+        the shape of one of its parameters changed, and the components
+        may have been replaced.
+        
+        :returns:
+            a generator of tuples ``(k, f, power)``, with `power` the
+            (`nbFreqs` x `nbFrames`) power of the factor `f` of the spectral
+            component `k`.
+        """
+        if frames is None:
+            frames = slice(None)
+        for group in self.groups:
+            index = group.stacked_index(spec_comps)
+            if not len(index):
+                continue
+            if len(index) == group.size:
+                arrays = group.arrays
+            else:
+                arrays = dict((part, array[index])
+                              for part, array in group.arrays.items())
+            W = batch_dot(arrays['FB'], arrays['FW'])
+            if 'TB' in arrays:
+                H = batch_dot(arrays['TW'], arrays['TB'][:,:,frames])
+            else:
+                H = arrays['TW'][:,:,frames]
+            powers = batch_dot(W, H)
+            del W, H
+            for n, power in zip(index, powers):
+                k, f = group.members[n][0]
+                yield k, f, power
+    
+    def map_time_params(self, function, spec_comps):
+        """Replaces the frame dependent parameters of the stacked factors,
+        the time blobs `TB` if any, otherwise the time weights `TW`, by
+        `function` applied to their stacked arrays. `function` should only
+        change the last axis, the frames: the factors stay stacked.
+        
+        :returns:
+            the set of the factors ``(k, f)`` of `spec_comps` that were
+            modified.
+        """
+        modified = set()
+        for group in self.groups:
+            index = group.stacked_index(spec_comps)
+            if not len(index):
+                continue
+            part = 'TB' if 'TB' in group.parts else 'TW'
+            group.arrays[part] = np.ascontiguousarray(
+                function(group.arrays[part]), dtype=self.dtype)
+            modified.update(group.members[n][0] for n in index)
+        return modified
+
+class FactorGroup(object):
+    """A group of `size` factors, whose parameters `parts`, of shapes
+    `shapes`, are stacked in the arrays of the dictionary
+    :py:attr:`FactorGroup.arrays`, of shapes ``(size,) + shape``.
+    """
+    def __init__(self, parts, shapes, size, dtype):
+        self.parts = parts
+        self.size = size
+        self.arrays = dict((part, np.empty((size,) + shape, dtype=dtype))
+                           for part, shape in zip(parts, shapes))
+        self.members = [None, ] * size
+    
+    def attach(self, index, member, factor):
+        """Copies the parameters of `factor` in the slot `index` of the
+        group, and returns the corresponding :py:class:`StackedFactor`.
+        `member` identifies the factor, as ``(k, f)``.
+        """
+        for part in self.parts:
+            self.arrays[part][index] = factor[part]
+        view = StackedFactor(self, index, dict(
+            (key, value) for key, value in factor.items()
+            if key not in self.parts))
+        self.members[index] = (member, view)
+        return view
+    
+    def stacked_index(self, spec_comps):
+        """Returns the indices of the factors of the group which are still
+        stacked and still in `spec_comps`.
+        """
+        return [n for n, (member, view) in enumerate(self.members)
+                if view.is_stacked() and
+                spec_comps.get(member[0], {}).get(
+                    'factor', {}).get(member[1]) is view]
+
+class StackedFactor(collections.MutableMapping):
+    """A factor of a spectral component, as a dictionary, whose parameters
+    `FB`, `FW`, `TW` (and `TB`) are views in the arrays of a
+    :py:class:`FactorGroup`.
+    
+    Assigning a parameter with the same shape writes it in the stacked
+    array. Assigning an array of another shape, or a parameter which is
+    not stacked (a non-empty `TB`, for instance), unstacks the factor:
+    its parameters are then copied and stored in the factor, which
+    behaves as a normal dictionary.
+    """
+    def __init__(self, group, index, others):
+        self._group = group
+        self._index = index
+        self._others = others
+    
+    def is_stacked(self):
+        """`True` if the parameters are still in the stacked arrays.
+        """
+        return self._group is not None
+    
+    def unstack(self):
+        """Copies the parameters out of the stacked arrays.
+        """
+        if self._group is None:
+            return
+        for part in self._group.parts:
+            self._others[part] = np.copy(self._group.arrays[part][self._index])
+        self._group = None
+    
+    def __getitem__(self, key):
+        if self._group is not None and key in self._group.parts:
+            return self._group.arrays[key][self._index]
+        return self._others[key]
+    
+    def __setitem__(self, key, value):
+        if self._group is not None and key in stacked_parts:
+            if key in self._group.parts:
+                slot = self._group.arrays[key][self._index]
+                if np.shape(value) == slot.shape:
+                    slot[...] = value
+                    return
+                self.unstack()
+            elif len(value):
+                self.unstack()
+        self._others[key] = value
+    
+    def __delitem__(self, key):
+        if self._group is not None and key in self._group.parts:
+            self.unstack()
+        del self._others[key]
+    
+    def __iter__(self):
+        if self._group is not None:
+            for part in self._group.parts:
+                yield part
+        for key in self._others:
+            yield key
+    
+    def __len__(self):
+        if self._group is not None:
+            return len(self._group.parts) + len(self._others)
+        return len(self._others)
+    
+    def __repr__(self):
+        return repr(dict(self.items()))
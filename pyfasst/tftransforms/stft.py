@@ -392,3 +392,101 @@ class STFT():
             hopsize=self.fthop,
             nfft=self.ftlen
             )[:self.datalen_init]
+
+class StreamSTFT(STFT):
+    """Object that computes the STFT of a signal provided block by block,
+    as for live input, and its inverse with an overlap-add output stage.
+    
+    The frames are the same as those of :py:func:`stft`, the first one
+    being centered on the first sample. The synthesized samples are
+    returned as soon as no more frame overlaps them, that is with a
+    latency of about one window length, `linFTLen` samples.
+    
+    **Inputs:**
+    
+    :param integer nchannels:
+        number of channels of the signal
+    :param kwargs:
+        the parameters of :py:class:`STFT`
+    
+    """
+    def __init__(self, nchannels=1, **kwargs):
+        STFT.__init__(self, **kwargs)
+        self.nchannels = nchannels
+        self.reset()
+    
+    def reset(self):
+        """Resets the analysis and synthesis buffers, to start a new
+        stream.
+        """
+        # zeros such that the first frame is centered on the first sample:
+        self.inbuffer = np.zeros([self.ftlen / 2, self.nchannels])
+        self.outbuffer = np.zeros([self.ftlen, self.nchannels])
+        self.normbuffer = np.zeros(self.ftlen)
+        # the first synthesized samples correspond to these zeros:
+        self.outskip = self.ftlen / 2
+    
+    def analyse(self, data):
+        """Computes the frames that are complete with the new samples in
+        `data`, a (`nsamples` x `nchannels`) array (or 1D for mono).
+        
+        :returns:
+            `X`: the (`nchannels` x `freqbins` x `nframes`) STFT of the
+            new frames, possibly with no frame.
+        """
+        data = np.reshape(data, [-1, self.nchannels])
+        self.inbuffer = np.concatenate((self.inbuffer, data))
+        nframes = max(
+            (self.inbuffer.shape[0] - self.ftlen) / self.fthop + 1, 0)
+        X = np.zeros([self.nchannels, self.freqbins, nframes], dtype=complex)
+        for n in range(nframes):
+            frameToProcess = (
+                np.vstack(self.window) *
+                self.inbuffer[n * self.fthop:n * self.fthop + self.ftlen])
+            X[:,:,n] = np.fft.rfft(frameToProcess, self.ftlen, axis=0).T
+        self.inbuffer = self.inbuffer[nframes * self.fthop:]
+        return X
+    
+    def synthesise(self, X):
+        """Overlap-adds the frames of `X`, a (`nchannels` x `freqbins` x
+        `nframes`) array, following the previously synthesized ones.
+        
+        :returns:
+            `data`: the (`nsamples` x `nchannels`) samples that are
+            complete, `fthop` samples per frame, once the samples before the
+            first frame center are discarded.
+        """
+        data = []
+        for n in range(X.shape[-1]):
+            frameTMP = np.fft.irfft(X[:,:,n], self.ftlen, axis=-1)
+            self.outbuffer += (
+                np.vstack(self.synthWindow) * frameTMP[:,:self.ftlen].T)
+            self.normbuffer += self.synthWindow * self.window
+            data.append(self._pop_output(self.fthop))
+        if not len(data):
+            return np.zeros([0, self.nchannels])
+        return self._skip_output(np.concatenate(data))
+    
+    def flush(self):
+        """Returns the remaining synthesized samples, those that would be
+        overlapped by the next frames, and resets the buffers.
+        """
+        data = self._skip_output(self._pop_output(self.ftlen - self.fthop))
+        self.reset()
+        return data
+    
+    def _pop_output(self, nsamples):
+        # normalising the liutkus way, as in istft:
+        normalisationSeq = self.normbuffer[:nsamples].copy()
+        normalisationSeq[normalisationSeq==0] = 1.
+        data = self.outbuffer[:nsamples] / np.vstack(normalisationSeq)
+        self.outbuffer = np.concatenate(
+            (self.outbuffer[nsamples:], np.zeros([nsamples, self.nchannels])))
+        self.normbuffer = np.concatenate(
+            (self.normbuffer[nsamples:], np.zeros(nsamples)))
+        return data
+    
+    def _skip_output(self, data):
+        nskip = min(self.outskip, data.shape[0])
+        self.outskip -= nskip
+        return data[nskip:]
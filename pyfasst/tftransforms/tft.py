@@ -5,7 +5,7 @@ for all the possible time-freq transforms)
 """
 from minqt import MinQTransfo, CQTransfo, sqrt_blackmanharris
 
-from stft import STFT # TODO: should be the opposite, should import stft from here into audioObject
+from stft import STFT, StreamSTFT # TODO: should be the opposite, should import stft from here into audioObject
 from nsgt import NSGMinQT
 
 # Possible super class transform: 
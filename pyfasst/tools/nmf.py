@@ -18,6 +18,9 @@ Relevant references:
 """
 
 import numpy as np
+import multiprocessing
+
+from distances import ISDistortion
 
 eps = 1e-10
 
@@ -158,6 +161,90 @@ def NMF_decomp_init(SX, nbComps=10, niter=10, verbose=0,
     
     return W, H.T
 
+def NMF_multi_restart(SX, nbComps=10, niter=10, verbose=0,
+                      Winit=None, Hinit=None,
+                      updateW=True, updateH=True,
+                      nbRestarts=4, restartIter=5,
+                      nbProcesses=None, seed=None):
+    """\
+    NMF with several restarts, for Itakura Saito divergence measure
+    between ``SX`` and ``np.dot(W,H)``: `nbRestarts` short decompositions
+    of `restartIter` iterations with :py:func:`NMF_decomp_init` are run
+    from different random starts, and only the one with the lowest
+    Itakura-Saito divergence (:py:func:`pyfasst.tools.distances.ISDistortion`)
+    is continued, for the remaining ``niter - restartIter`` iterations.
+    
+    The first start is given by `Winit` and `Hinit`, as for
+    :py:func:`NMF_decomp_init`. For the others, the matrices that are
+    updated (and those not provided) are drawn randomly.
+    
+    :param integer nbRestarts:
+        number of starts
+    :param integer restartIter:
+        number of iterations of the short decompositions, included in
+        `niter`
+    :param integer nbProcesses:
+        if more than 1, the short decompositions are run in a pool of
+        `nbProcesses` processes
+    :param integer seed:
+        seed of the random starts. If `None`, the seeds are drawn from
+        the global state of :py:mod:`numpy.random`.
+    
+    The other parameters and the outputs are those of
+    :py:func:`NMF_decomp_init`.
+    """
+    if nbRestarts <= 1:
+        return NMF_decomp_init(SX, nbComps=nbComps, niter=niter,
+                               verbose=verbose, Winit=Winit, Hinit=Hinit,
+                               updateW=updateW, updateH=updateH)
+    restartIter = min(restartIter, niter)
+    if seed is None:
+        seeds = np.random.randint(2**31 - 1, size=nbRestarts - 1)
+    else:
+        seeds = np.random.RandomState(seed).randint(2**31 - 1,
+                                                    size=nbRestarts - 1)
+    restarts = [(SX, nbComps, restartIter, Winit, Hinit, updateW, updateH,
+                 restartSeed)
+                for restartSeed in [None, ] + list(seeds)]
+    if nbProcesses is not None and nbProcesses > 1 and nbRestarts > 1:
+        pool = multiprocessing.Pool(min(nbProcesses, nbRestarts))
+        try:
+            results = pool.map(_NMF_restart, restarts)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        results = [_NMF_restart(restart) for restart in restarts]
+    
+    scores = [score for score, W, H in results]
+    best = np.argmin(scores)
+    if verbose:
+        print "    NMF restarts, IS divergences:", scores
+        print "    NMF restarts, continuing start %d" %best
+    score, W, H = results[best]
+    return NMF_decomp_init(SX, nbComps=nbComps, niter=niter - restartIter,
+                           verbose=verbose, Winit=W, Hinit=H,
+                           updateW=updateW, updateH=updateH)
+
+def _NMF_restart(args):
+    """Runs one of the short decompositions of :py:func:`NMF_multi_restart`,
+    from the random start given by the seed (the provided initial matrices
+    if `None`), and returns its IS divergence, `W` and `H`.
+    """
+    SX, nbComps, niter, Winit, Hinit, updateW, updateH, seed = args
+    if seed is not None:
+        freqs, nframes = SX.shape
+        rng = np.random.RandomState(seed)
+        if updateW or Winit is None:
+            Winit = rng.randn(freqs, nbComps)**2
+        if updateH or Hinit is None:
+            Hinit = rng.randn(nbComps, nframes)**2
+    W, H = NMF_decomp_init(SX, nbComps=nbComps, niter=niter,
+                           Winit=Winit, Hinit=Hinit,
+                           updateW=updateW, updateH=updateH)
+    score = ISDistortion(np.maximum(SX, eps), np.maximum(np.dot(W, H), eps))
+    return score, W, H
+
 def SFNMF_decomp_init(SX, nbComps=10, nbFiltComps=10,
                       niter=10, verbose=0,
                       Winit=None, Hinit=None,
@@ -0,0 +1,182 @@
+"""
+``profiling.py``
+
+Instrumentation of the GEM iterations of
+:py:class:`pyfasst.audioModel.FASST`: the time, the memory and the size of
+the arrays computed by each stage of an iteration are gathered by an
+:py:class:`IterationProfiler`, and delivered as one record (a dictionary)
+per iteration to pluggable sinks.
+
+A sink is any callable taking the record as only argument, for instance
+``records.append`` for a list `records`, a user function, or a
+:py:class:`JSONLinesSink`, which appends the records to a file::
+
+    >>> import pyfasst.audioModel as am
+    >>> from pyfasst.tools.profiling import JSONLinesSink
+    >>> records = []
+    >>> model = am.MultiChanNMFInst_FASST(
+            audio='data/tamy.wav', nbComps=2,
+            profileSinks=[records.append, JSONLinesSink('profile.jsonl')])
+    >>> model.estim_param_a_post_model()
+    >>> records[0]['stages']['compute_suff_stat']['time']
+
+2013 Jean-Louis Durrieu
+
+http://www.durrieu.ch
+
+Content
+-------
+"""
+
+import sys, time, json, collections
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows:
+    resource = None
+
+def peak_memory():
+    """Returns the peak resident memory of the process, in bytes, or `None`
+    if it can not be measured.
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        return maxrss
+    # in kB on Linux:
+    return maxrss * 1024
+
+def array_bytes(*arrays):
+    """Returns the total number of bytes of the arrays in `arrays`, which
+    may also be (nested) lists, tuples or dictionaries of arrays.
+    """
+    nbytes = 0
+    for array in arrays:
+        if isinstance(array, collections.Mapping):
+            nbytes += array_bytes(*array.values())
+        elif isinstance(array, (list, tuple)):
+            nbytes += array_bytes(*array)
+        elif hasattr(array, 'nbytes'):
+            nbytes += array.nbytes
+    return nbytes
+
+class IterationProfiler(object):
+    """Gathers, for each GEM iteration, the measures of its stages, and
+    delivers them to the `sinks`.
+    
+    :param list sinks:
+        the callables to which the records are given. If empty or `None`,
+        nothing is measured.
+    
+    A record is a dictionary with the keys:
+    
+        `'iteration'` - the index of the iteration in the estimation, if
+        known, else `None`
+    
+        `'loglik'` - the log-likelihood computed during the iteration
+    
+        `'time'` - the duration of the iteration, in s
+    
+        `'peak_memory'` - the peak resident memory of the process at the end
+        of the iteration, in bytes
+    
+        `'stages'` - a dictionary with, for each stage, its `'time'` (in
+        s), the number of `'calls'` (one per block of frames, with
+        :py:attr:`pyfasst.audioModel.FASST.frameBlockSize`), the
+        `'array_bytes'` of the arrays it computed, and the
+        `'peak_increase'` of the peak resident memory during the stage
+        (in bytes, 0 if the stage did not exceed the previous peak).
+    
+    """
+    def __init__(self, sinks=None):
+        self.sinks = list(sinks) if sinks is not None else []
+        self.record = None
+    
+    def enabled(self):
+        return len(self.sinks) > 0
+    
+    def start(self):
+        """Starts the measures of a new iteration.
+        """
+        if not self.enabled():
+            return
+        self.record = {'stages': collections.OrderedDict()}
+        self._start = time.time()
+    
+    def stage(self, name):
+        """Returns the context manager measuring the stage `name`, such
+        as::
+        
+            with profiler.stage('compute_suff_stat') as stage:
+                stats = model.compute_suff_stat(...)
+                stage.add_arrays(stats)
+        
+        """
+        if self.record is None:
+            return NullStage()
+        return Stage(self.record['stages'].setdefault(
+            name, {'time': 0., 'calls': 0, 'array_bytes': 0,
+                   'peak_increase': 0}))
+    
+    def finish(self, loglik, iteration=None):
+        """Ends the iteration, and gives its record to the sinks.
+        """
+        if self.record is None:
+            return
+        record = self.record
+        self.record = None
+        record['iteration'] = iteration
+        record['loglik'] = float(loglik)
+        record['time'] = time.time() - self._start
+        record['peak_memory'] = peak_memory()
+        for sink in self.sinks:
+            sink(record)
+
+class Stage(object):
+    """Context manager measuring a stage, in its entry `measures` of the
+    record of :py:class:`IterationProfiler`.
+    """
+    def __init__(self, measures):
+        self.measures = measures
+    
+    def __enter__(self):
+        self._peak = peak_memory()
+        self._start = time.time()
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        self.measures['time'] += time.time() - self._start
+        self.measures['calls'] += 1
+        if self._peak is not None:
+            self.measures['peak_increase'] += peak_memory() - self._peak
+        return False
+    
+    def add_arrays(self, *arrays):
+        """Adds the size of the arrays computed by the stage.
+        """
+        self.measures['array_bytes'] += array_bytes(*arrays)
+
+class NullStage(object):
+    """Stage that measures nothing, when the profiler is not enabled.
+    """
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, excType, excValue, traceback):
+        return False
+    
+    def add_arrays(self, *arrays):
+        pass
+
+class JSONLinesSink(object):
+    """Sink appending the records to the file `filename`, one JSON record
+    per line.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+    
+    def __call__(self, record):
+        with open(self.filename, 'a') as fileobj:
+            fileobj.write(json.dumps(record) + '\n')
@@ -129,7 +129,7 @@ def invHermMat2D(a_00, a_01, a_11):
                       %str(det[det==0]))
     return a_11/det, -a_01/det, a_00/det
     
-def inv_herm_mat_2d(sigma_x_diag, sigma_x_off, verbose=False):
+def inv_herm_mat_2d(sigma_x_diag, sigma_x_off, verbose=False, eps=eps):
     """Computes the inverse of 2D hermitian matrices.
 
     **Inputs**
@@ -148,6 +148,9 @@ def inv_herm_mat_2d(sigma_x_diag, sigma_x_off, verbose=False):
         (0,1) element (since the matrices are assumed Hermitian,
         the (1,0) element is the complex conjugate)
 
+     `eps`
+        the minimum absolute value of the determinants
+
     **Outputs**
     
      `inv_sigma_x_diag`
@@ -195,6 +198,410 @@ def inv_herm_mat_2d(sigma_x_diag, sigma_x_off, verbose=False):
 
     return inv_sigma_x_diag, inv_sigma_x_off, det_sigma_x
 
+def herm_mat_packed_index(nc):
+    """Returns the indices of the elements of a `nc` x `nc` Hermitian
+    matrix in its packed storage, as used for
+    :py:attr:`pyfasst.audioModel.FASST.Cx`: only the upper triangular part
+    is kept, row after row, such that the element `(n1, n2)`, with
+    `n1 <= n2`, is at index::
+    
+        n2 - n1 + np.sum(np.arange(nc, nc-n1, -1))
+
+    **Outputs**
+    
+     `packed_index`
+        ndarray of int, `nc` x `nc`
+
+        `packed_index[n1, n2]` is the index of the element `(n1, n2)`,
+        the lower triangular part pointing to the symmetric element.
+
+     `lower`
+        ndarray of bool, `nc` x `nc`
+
+        True where the element is in the strictly lower triangular part,
+        that is where the stored element has to be conjugated.
+    
+    """
+    packed_index = np.zeros([nc, nc], dtype=int)
+    for n1 in range(nc):
+        for n2 in range(n1, nc):
+            n = n2 - n1 + np.sum(np.arange(nc, nc-n1, -1))
+            packed_index[n1, n2] = n
+            packed_index[n2, n1] = n
+    lower = np.tril(np.ones([nc, nc], dtype=bool), -1)
+    return packed_index, lower
+
+def unpack_herm_mat(packed_mat, nc):
+    """Unpacks Hermitian matrices stored as their upper triangular part
+    (see :py:func:`herm_mat_packed_index`).
+
+    **Inputs**
+    
+     `packed_mat`
+        ndarray, with (dim of axis=0) = `nc * (nc + 1) / 2`
+
+        The packed matrices, as in
+        :py:attr:`pyfasst.audioModel.FASST.Cx`, or a
+        :py:class:`PackedCx`
+
+     `nc`
+        the dimension of the matrices
+
+    **Outputs**
+    
+     `mat`
+        ndarray, `packed_mat.shape[1:] + (nc, nc)`
+
+        The full matrices, stacked on the first axes, as expected by the
+        :py:mod:`numpy.linalg` functions.
+    
+    """
+    if isinstance(packed_mat, PackedCx):
+        return packed_mat.unpack()
+    packed_index, lower = herm_mat_packed_index(nc)
+    ndim = packed_mat.ndim + 1
+    # moving the 2 matrix axes at the end:
+    mat = np.array(
+        np.rollaxis(np.rollaxis(packed_mat[packed_index], 0, ndim), 0, ndim),
+        dtype=np.result_type(packed_mat.dtype, np.complex64))
+    mat[..., lower] = np.conj(mat[..., lower])
+    return mat
+
+def herm_mat_diag(packed_mat, nc):
+    """Returns the diagonal elements of Hermitian matrices in packed
+    storage (see :py:func:`herm_mat_packed_index`), either an ndarray or a
+    :py:class:`PackedCx`.
+
+    **Outputs**
+    
+     `diag`
+        real ndarray, `nc` x `packed_mat.shape[1:]`
+
+        `diag[n]` is the element `(n, n)` of the matrices.
+    
+    """
+    if isinstance(packed_mat, PackedCx):
+        return packed_mat.diag
+    packed_index, _ = herm_mat_packed_index(nc)
+    return np.real(packed_mat[np.diag(packed_index)])
+
+class PackedCx(object):
+    """Hermitian matrices in packed storage (see
+    :py:func:`herm_mat_packed_index`), with the diagonal elements, which
+    are real, stored in a real array, and only the strictly upper
+    triangular elements in a complex array. For the covariance matrices
+    :py:attr:`pyfasst.audioModel.FASST.Cx`, this saves about a third of
+    the memory, and the products with the diagonal elements are real.
+
+    The object is indexed as the ndarray it replaces: ``Cx[n]`` is the
+    element of packed index `n`, real if it is on the diagonal, and
+    ``Cx[..., frames]`` (or ``Cx[:, f]``) applies the index to the
+    trailing axes of both arrays, returning another
+    :py:class:`PackedCx`.
+
+    **Inputs**
+    
+     `diag`
+        real ndarray, `nc` x ...
+
+        `diag[n]` is the element `(n, n)` of the matrices.
+
+     `off`
+        complex ndarray, `nc * (nc - 1) / 2` x ...
+
+        The elements `(n1, n2)`, `n1 < n2`, row after row.
+    
+    """
+    def __init__(self, diag, off):
+        self.diag = diag
+        self.off = off
+        self.nc = diag.shape[0]
+        # location, (array, index), of each packed element:
+        self.entries = []
+        k = 0
+        for n1 in range(self.nc):
+            self.entries.append((self.diag, n1))
+            for n2 in range(n1 + 1, self.nc):
+                self.entries.append((self.off, k))
+                k += 1
+    
+    @classmethod
+    def from_packed(cls, packed_mat, diag=None, off=None):
+        """Converts the packed ndarray `packed_mat`, and stores the
+        elements in the arrays `diag` and `off`, if provided (memory-mapped
+        arrays, for instance), otherwise in new arrays.
+        """
+        nc = int(round(np.sqrt(2 * len(packed_mat) + .25) - .5))
+        if diag is None:
+            diag = np.empty((nc, ) + packed_mat.shape[1:],
+                            dtype=np.real(packed_mat[:1]).dtype)
+        if off is None:
+            off = np.empty((nc * (nc - 1) / 2, ) + packed_mat.shape[1:],
+                           dtype=np.result_type(packed_mat.dtype,
+                                                np.complex64))
+        Cx = cls(diag, off)
+        for n in range(len(Cx)):
+            Cx[n] = packed_mat[n]
+        return Cx
+    
+    @property
+    def shape(self):
+        return (len(self), ) + self.diag.shape[1:]
+    
+    @property
+    def ndim(self):
+        return self.diag.ndim
+    
+    @property
+    def dtype(self):
+        return self.off.dtype
+    
+    def __len__(self):
+        return len(self.entries)
+    
+    def __getitem__(self, key):
+        if isinstance(key, tuple) and len(key) and (
+            key[0] is Ellipsis or
+            isinstance(key[0], slice) and key[0] == slice(None)):
+            return PackedCx(self.diag[key], self.off[key])
+        array, n = self.entries[key]
+        return array[n]
+    
+    def __setitem__(self, key, value):
+        array, n = self.entries[key]
+        if array is self.diag:
+            value = np.real(value)
+        array[n] = value
+    
+    def __array__(self, dtype=None):
+        packed_mat = np.empty(self.shape, dtype=self.dtype)
+        for n in range(len(self)):
+            packed_mat[n] = self[n]
+        if dtype is not None:
+            return packed_mat.astype(dtype)
+        return packed_mat
+    
+    def map(self, func):
+        """Applies `func` to the diagonal and off-diagonal arrays, and
+        returns the resulting :py:class:`PackedCx`.
+        """
+        return PackedCx(func(self.diag), func(self.off))
+    
+    def copy(self):
+        """Returns a copy, in memory.
+        """
+        return self.map(np.array)
+    
+    def mean(self, axis=-1, dtype=None, out=None):
+        """Averages the elements over the trailing axis `axis`. The result
+        is a packed ndarray, with the mean elements.
+        """
+        if axis == 0:
+            raise ValueError("The packed elements can not be averaged.")
+        if axis > 0:
+            axis -= 1
+        mean = np.array([np.mean(self[n], axis=axis, dtype=dtype)
+                         for n in range(len(self))],
+                        dtype=np.result_type(self.dtype, dtype or
+                                             self.dtype))
+        if out is None:
+            return mean
+        out[...] = mean
+        return out
+    
+    def unpack(self):
+        """Returns the full matrices, as :py:func:`unpack_herm_mat`.
+        """
+        upper = np.triu_indices(self.nc, 1)
+        mat = np.zeros(self.diag.shape[1:] + (self.nc, self.nc),
+                       dtype=self.dtype)
+        chan_ind = np.arange(self.nc)
+        mat[..., chan_ind, chan_ind] = np.rollaxis(self.diag, 0,
+                                                   self.diag.ndim)
+        off = np.rollaxis(self.off, 0, self.off.ndim)
+        mat[..., upper[0], upper[1]] = off
+        mat[..., upper[1], upper[0]] = np.conj(off)
+        return mat
+
+def inv_herm_mat(sigma, verbose=False, eps=eps):
+    """Computes the inverse of (stacked) Hermitian positive definite
+    matrices, with their Cholesky decompositions. This is the
+    `nc` x `nc` counterpart of :py:func:`inv_herm_mat_2d`.
+
+    **Inputs**
+    
+     `sigma`
+        ndarray, with shape (..., `nc`, `nc`)
+
+        The Hermitian matrices to invert, stacked on the first axes.
+
+     `eps`
+        the minimum value of the determinants
+
+    **Outputs**
+    
+     `inv_sigma`
+        ndarray, same shape as `sigma`
+
+        The inverse matrices.
+
+     `det_sigma`
+        ndarray, `sigma.shape[:-2]`
+
+        For each inversion, the determinant of the matrix.
+
+    **Remarks**
+    
+     With :math:`\\Sigma = L L^H`, :math:`\\Sigma^{-1} = L^{-H} L^{-1}`
+     and the determinant is the squared product of the diagonal of
+     :math:`L`. If some matrices are not numerically positive definite,
+     the matrices are loaded on their diagonals, with
+     ``eps * trace(sigma) / nc`` (and at least `eps`), increased tenfold
+     until the Cholesky decomposition succeeds: the inverses and the
+     determinants are then those of the loaded matrices. Matrices that
+     can not be decomposed (with non finite values) are inverted by their
+     diagonals.
+     
+     As for :py:func:`inv_herm_mat_2d`, a minimum value of the
+     determinant is guaranteed, and the inverses are consistent with the
+     floored determinants.
+    
+    """
+    nc = sigma.shape[-1]
+    diag_ind = np.arange(nc)
+    loaded_sigma = sigma
+    chol_sigma = None
+    loading = None
+    for step in range(12):
+        try:
+            chol_sigma = np.linalg.cholesky(loaded_sigma)
+            break
+        except np.linalg.LinAlgError:
+            if verbose:
+                print "Cholesky decomposition failed, loading the diagonal."
+            if loading is None:
+                loading = np.maximum(
+                    eps * np.real(np.trace(sigma, axis1=-2, axis2=-1)) / nc,
+                    eps)
+            loaded_sigma = np.array(sigma)
+            loaded_sigma[..., diag_ind, diag_ind] += (
+                10. ** step * loading[..., None])
+    sigma = loaded_sigma
+    del loaded_sigma
+    if chol_sigma is None:
+        if verbose:
+            print "Loaded Cholesky decomposition failed, diagonal inverse."
+        diag = np.real(np.diagonal(sigma, axis1=-2, axis2=-1))
+        inv_sigma = np.zeros_like(sigma)
+        inv_sigma[..., diag_ind, diag_ind] = 1. / np.maximum(diag, eps)
+        det_sigma = np.prod(np.maximum(diag, eps), axis=-1, dtype=np.float64)
+    else:
+        inv_chol = np.linalg.inv(chol_sigma)
+        inv_sigma = np.einsum('...ki,...kj->...ij',
+                              np.conj(inv_chol), inv_chol)
+        # in double precision, not to underflow in single precision:
+        det_sigma = np.prod(
+            np.real(np.diagonal(chol_sigma, axis1=-2, axis2=-1)),
+            axis=-1, dtype=np.float64) ** 2
+        del chol_sigma, inv_chol
+    if verbose:
+        print "number of 0s in det ",(det_sigma==0.).sum()
+    floored_det = np.maximum(det_sigma, eps)
+    # as for the explicit 2 x 2 inverse, adj(sigma) / det:
+    inv_sigma *= (det_sigma / floored_det)[..., None, None]
+    return inv_sigma, floored_det
+
+def solve_mat(a, b, verbose=False):
+    """Solves the (stacked) linear systems :math:`a x = b`, in one call
+    to :py:func:`numpy.linalg.solve`, regularising the singular systems
+    instead of raising a :py:class:`numpy.linalg.LinAlgError`.
+
+    **Inputs**
+
+     `a`
+        ndarray, with shape (..., `K`, `K`)
+
+        The square matrices of the systems, stacked on the first axes.
+
+     `b`
+        ndarray, with shape (..., `K`, `M`)
+
+        The right hand sides of the systems.
+
+    **Outputs**
+
+     `x`
+        ndarray, with shape (..., `K`, `M`)
+
+        The solutions of the systems.
+
+    **Remarks**
+
+     If any of the matrices is singular, the systems whose matrices are
+     numerically singular are solved with the pseudo-inverses of the
+     matrices (truncated SVD), which gives their minimum norm least
+     squares solutions. The other systems are solved as usual.
+
+     The pseudo-inverses are computed from the stacked SVD, since
+     :py:func:`numpy.linalg.pinv` only accepts stacked matrices from
+     numpy 1.14.
+
+    """
+    try:
+        return np.linalg.solve(a, b)
+    except np.linalg.LinAlgError:
+        pass
+
+    u, sing_val, vh = np.linalg.svd(a)
+    cutoff = sing_val[..., :1] * a.shape[-1] * np.finfo(a.dtype).eps
+    singular = ~(sing_val[..., -1] > cutoff[..., 0])
+    if verbose:
+        print "regularising", singular.sum(), "singular systems."
+    x = np.empty(np.broadcast(a[..., :1], b).shape,
+                 dtype=np.result_type(a, b))
+    x[~singular] = np.linalg.solve(a[~singular], b[~singular])
+    # truncated SVD, x = V diag(1 / sing_val) U^H b:
+    kept = sing_val[singular] > cutoff[singular]
+    inv_sing_val = np.zeros_like(sing_val[singular])
+    inv_sing_val[kept] = 1. / sing_val[singular][kept]
+    uh_b = np.einsum('...ji,...jk->...ik',
+                     np.conj(u[singular]), b[singular])
+    x[singular] = np.einsum('...ji,...j,...jk->...ik',
+                            np.conj(vh[singular]), inv_sing_val, uh_b)
+    return x
+
+def batch_dot(a, b):
+    """Computes the stacked matrix products :math:`c_g = a_g b_g`.
+
+    **Inputs**
+
+     `a`
+        ndarray, with shape (`G`, `K`, `L`)
+
+     `b`
+        ndarray, with shape (`G`, `L`, `M`)
+
+    **Outputs**
+
+     `c`
+        ndarray, with shape (`G`, `K`, `M`)
+
+        ``c[g] = np.dot(a[g], b[g])``
+
+    **Remarks**
+
+     :py:func:`numpy.matmul`, when available, runs the products from a
+     single call; otherwise, :py:func:`numpy.dot` is called for each `g`.
+
+    """
+    if hasattr(np, 'matmul'):
+        return np.matmul(a, b)
+    c = np.empty((a.shape[0], a.shape[1], b.shape[2]),
+                 dtype=np.result_type(a, b))
+    for g in range(a.shape[0]):
+        c[g] = np.dot(a[g], b[g])
+    return c
+
 def f0detectionFunction(TFmatrix, freqs=None, axis=None,
                         samplingrate=44100, fouriersize=2048,
                         f0min=80, f0max=3000, stepnote=16,
@@ -13,6 +13,7 @@ Content
 
 import numpy as np
 import scipy.signal as spsig  # for the windows
+import collections
 
 def db(val):
     """
@@ -70,3 +71,65 @@ def sqrt_blackmanharris(M):
     For use in scholkhuber and klapuri's framework.
     """
     return np.sqrt(spsig.blackmanharris(M))
+
+def flatten_tree(tree):
+    """Flattens a nested structure of dictionaries (or other mappings),
+    lists and tuples, with arrays or simple python values (numbers,
+    strings, `None`) as leaves, for instance to store it in a ``.npz``
+    archive.
+    
+    :returns:
+        `skeleton`: a JSON-serializable description of the structure,
+        with the simple values, and the paths to the arrays
+        
+        `arrays`: a dictionary with the arrays (and numpy scalars), the
+        keys being their paths in the structure, as ``'key0/key1/...'``
+    
+    The structure is obtained back with :py:func:`unflatten_tree`.
+    """
+    arrays = {}
+    skeleton = _flatten_tree(tree, arrays, '')
+    return skeleton, arrays
+
+def _flatten_tree(tree, arrays, path):
+    if path:
+        path += '/'
+    if isinstance(tree, collections.Mapping):
+        return {'dict': [[key, _flatten_tree(value, arrays, path + str(key))]
+                         for key, value in tree.items()]}
+    elif isinstance(tree, (list, tuple)):
+        return {type(tree).__name__: [
+            _flatten_tree(value, arrays, path + str(n))
+            for n, value in enumerate(tree)]}
+    elif isinstance(tree, np.ndarray):
+        arrays[path[:-1]] = tree
+        return {'array': path[:-1]}
+    elif isinstance(tree, np.generic):
+        arrays[path[:-1]] = np.asarray(tree)
+        return {'scalar': path[:-1]}
+    return {'value': tree}
+
+def unflatten_tree(skeleton, arrays):
+    """Rebuilds the nested structure described by `skeleton`, with the
+    provided `arrays`, as flattened by :py:func:`flatten_tree`.
+    
+    Strings decoded from JSON are converted back to `str`.
+    """
+    if 'dict' in skeleton:
+        return dict((_from_json(key), unflatten_tree(value, arrays))
+                    for key, value in skeleton['dict'])
+    elif 'list' in skeleton:
+        return [unflatten_tree(value, arrays) for value in skeleton['list']]
+    elif 'tuple' in skeleton:
+        return tuple(unflatten_tree(value, arrays)
+                     for value in skeleton['tuple'])
+    elif 'array' in skeleton:
+        return arrays[skeleton['array']]
+    elif 'scalar' in skeleton:
+        return arrays[skeleton['scalar']][()]
+    return _from_json(skeleton['value'])
+
+def _from_json(value):
+    if isinstance(value, unicode):
+        return str(value)
+    return value
@@ -0,0 +1,483 @@
+"""Benchmarks of the hot paths of pyfasst, on synthetic mixtures
+
+The benchmarks generate a synthetic stereo mixture (see
+:py:func:`synthetic_mixture`), of configurable duration and number of
+sources, and time the computations that dominate the processing times:
+
+* :py:meth:`pyfasst.audioModel.FASST.comp_transf_Cx`, for each transform,
+* one :py:meth:`pyfasst.audioModel.FASST.GEM_iteration`,
+* :py:meth:`pyfasst.audioModel.FASST.separate_comps`,
+* the `SIMM` and `Stereo_SIMM` iterations of
+  :py:mod:`pyfasst.SeparateLeadStereo.SIMM.SIMM`,
+* :py:meth:`pyfasst.demixTF.DEMIX.comp_clusters`,
+* the `viterbiTracking*` functions,
+* :py:func:`pyfasst.tools.nmf.NMF_decomp_init`,
+* the forward and inverse CQT, MinQT and NSGT.
+
+Each benchmark is run in its own python process, such that its peak memory
+(maximum resident set size) is measured independently of the others. The
+results are appended, with the commit and the configuration, to a history
+file, one JSON record per line, and compared with the last record of the
+same configuration on the same machine, to detect the regressions.
+
+run at the root of the package::
+
+  python -m pyfasst_tests.benchmarks --duration 10 --nsources 3
+
+or, for some of the benchmarks only::
+
+  python -m pyfasst_tests.benchmarks GEM_iteration separate_comps
+
+2013 Jean-Louis Durrieu
+"""
+# otherwise, pyfasst would be pyfasst_tests.pyfasst:
+from __future__ import absolute_import
+
+import numpy as np
+import os, sys, time, json, platform, subprocess, tempfile, shutil
+import argparse
+import scipy.io.wavfile as wav
+
+# default configuration of the benchmarks:
+default_config = {
+    'duration': 5.,     # s
+    'nsources': 3,
+    'samplerate': 44100,
+    'iterations': 5,    # for the iterative algorithms (SIMM, NMF)
+    'repeat': 3,        # number of timed runs of each benchmark
+    'seed': 0,
+    }
+
+default_history = 'benchmarks.jsonl'
+
+def synthetic_mixture(filename, duration=5., nsources=3, samplerate=44100,
+                      seed=0, **kwargs):
+    """Writes, in the WAV file `filename`, a synthetic stereo mixture of
+    `nsources` harmonic sources: sequences of notes with random
+    fundamental frequencies (between 100 and 800Hz) and durations,
+    panned and delayed at random.
+
+    :returns:
+        `images`: the (`nsources` x `nsamples` x 2) source images.
+    """
+    random = np.random.RandomState(seed)
+    nsamples = int(duration * samplerate)
+    images = np.zeros([nsources, nsamples, 2])
+    for j in range(nsources):
+        source = np.zeros(nsamples)
+        start = 0
+        while start < nsamples:
+            length = min(int(random.uniform(.1, .5) * samplerate),
+                         nsamples - start)
+            t = np.arange(length) * 1. / samplerate
+            f0 = 100. * 2 ** random.uniform(0, 3)
+            envelope = np.exp(- t * random.uniform(2, 10))
+            for h in range(1, 6):
+                if h * f0 < samplerate / 2.:
+                    source[start:start+length] += (
+                        envelope * np.sin(2 * np.pi * h * f0 * t) / h)
+            start += length
+        # instantaneous panning, and a small delay on one channel:
+        pan = random.uniform(0, np.pi / 2)
+        delay = random.randint(0, 10)
+        images[j, :, 0] = np.cos(pan) * source
+        images[j, delay:, 1] = np.sin(pan) * source[:nsamples-delay]
+    mixture = images.sum(axis=0)
+    scale = 0.9 * 2**15 / np.max(np.abs(mixture))
+    wav.write(filename, samplerate, np.int16(mixture * scale))
+    return images
+
+class Benchmarks(object):
+    """The benchmarks, on a synthetic mixture written in the directory
+    `tmpdir` with the configuration `config` (see `default_config`).
+    
+    A benchmark `name` is a method ``bench_name``, which prepares the
+    data and returns the function to time.
+    """
+    transforms = ['stft', 'mqt', 'cqt']
+    
+    def __init__(self, config, tmpdir):
+        self.config = config
+        self.audio = os.path.join(tmpdir, 'mixture.wav')
+        if not os.path.isfile(self.audio):
+            synthetic_mixture(self.audio, **config)
+    
+    @classmethod
+    def names(cls):
+        """The names of the available benchmarks.
+        """
+        names = []
+        for attr in sorted(dir(cls)):
+            if not attr.startswith('bench_'):
+                continue
+            if attr == 'bench_comp_transf_Cx':
+                names.extend('comp_transf_Cx.' + transf
+                             for transf in cls.transforms)
+            else:
+                names.append(attr[len('bench_'):])
+        return names
+    
+    def prepare(self, name):
+        """Prepares the benchmark `name`, and returns the function to time.
+        """
+        name, _, variant = name.partition('.')
+        bench = getattr(self, 'bench_' + name)
+        if variant:
+            return bench(variant)
+        return bench()
+    
+    def model(self, **kwargs):
+        import pyfasst.audioModel as am
+        return am.MultiChanNMFInst_FASST(
+            audio=self.audio, nbComps=self.config['nsources'],
+            iter_num=1, verbose=0, **kwargs)
+    
+    def mono_spectrogram(self):
+        model = self.model()
+        return model.comp_mono_Cx()
+    
+    def bench_comp_transf_Cx(self, transf):
+        model = self.model(transf=transf)
+        return model.comp_transf_Cx
+    
+    def bench_GEM_iteration(self):
+        model = self.model()
+        model.noise['PSD'] = model.noise['ann_PSD_lim'][0]
+        model.init_estim_state()
+        return model.GEM_iteration
+    
+    def bench_separate_comps(self):
+        model = self.model()
+        model.noise['PSD'] = model.noise['ann_PSD_lim'][1]
+        return lambda: model.separate_comps(writeFiles=False)
+    
+    def simm_inputs(self):
+        import pyfasst.SeparateLeadStereo.separateLeadFunctions as slf
+        samplerate, data = wav.read(self.audio)
+        data = data / 2.**15
+        nfft = 2048
+        SX = [np.abs(slf.stft(data[:,n], window=slf.sinebell(nfft),
+                              hopsize=256, nfft=nfft,
+                              fs=samplerate)[0])**2
+              for n in range(2)]
+        F = SX[0].shape[0]
+        F0Table, WF0 = slf.generate_WF0_chirped(
+            minF0=100, maxF0=800, Fs=samplerate, Nfft=nfft,
+            stepNotes=4, lengthWindow=nfft, perF0=1, loadWF0=False,
+            analysisWindow='sinebell')
+        WGAMMA = slf.generateHannBasis(
+            numberFrequencyBins=F, sizeOfFourier=nfft, Fs=samplerate,
+            frequencyScale='linear', numberOfBasis=30, overlap=.75)
+        return SX, WF0[:F], WGAMMA
+    
+    def bench_SIMM(self):
+        from pyfasst.SeparateLeadStereo.SIMM import SIMM
+        SX, WF0, WGAMMA = self.simm_inputs()
+        SX = (SX[0] + SX[1]) / 2.
+        return lambda: SIMM.SIMM(
+            SX, WF0=WF0, WGAMMA=WGAMMA,
+            numberOfIterations=self.config['iterations'],
+            verbose=False)
+    
+    def bench_Stereo_SIMM(self):
+        from pyfasst.SeparateLeadStereo.SIMM import SIMM
+        SX, WF0, WGAMMA = self.simm_inputs()
+        return lambda: SIMM.Stereo_SIMM(
+            SX[0], SX[1], WF0=WF0, WGAMMA=WGAMMA,
+            numberOfIterations=self.config['iterations'],
+            verbose=False)
+    
+    def bench_DEMIX_comp_clusters(self):
+        import pyfasst.demixTF as demix
+        return lambda: demix.DEMIX(
+            audio=self.audio, nsources=self.config['nsources'],
+            verbose=0).comp_clusters()
+    
+    def viterbi_inputs(self, nstates=200):
+        random = np.random.RandomState(self.config['seed'])
+        nframes = int(self.config['duration'] * self.config['samplerate']
+                      / 256)
+        logDensity = np.log(random.rand(nstates, nframes))
+        logPrior = np.log(np.ones(nstates) / nstates)
+        transition = np.exp(- np.abs(np.subtract.outer(np.arange(nstates),
+                                                       np.arange(nstates))))
+        logTransition = np.log(transition / transition.sum(axis=1)[:,None])
+        return logDensity, logPrior, logTransition
+    
+    def bench_viterbiTracking(self):
+        from pyfasst.SeparateLeadStereo.tracking import tracking
+        logDensity, logPrior, logTransition = self.viterbi_inputs()
+        return lambda: tracking.viterbiTracking(logDensity, logPrior,
+                                                logTransition)
+    
+    def bench_viterbiTrackingArray(self):
+        from pyfasst.SeparateLeadStereo.tracking import tracking
+        logDensity, logPrior, logTransition = self.viterbi_inputs()
+        return lambda: tracking.viterbiTrackingArray(logDensity, logPrior,
+                                                     logTransition)
+    
+    def bench_viterbiTracking_cython(self):
+        from pyfasst.SeparateLeadStereo.tracking import _tracking
+        logDensity, logPrior, logTransition = self.viterbi_inputs()
+        nstates, nframes = logDensity.shape
+        return lambda: _tracking.viterbiTracking(
+            nstates, nframes, logDensity, logPrior, logTransition)
+    
+    def bench_NMF_decomp_init(self):
+        from pyfasst.tools.nmf import NMF_decomp_init
+        SX = self.mono_spectrogram()
+        return lambda: NMF_decomp_init(SX=SX, nbComps=10,
+                                       niter=self.config['iterations'])
+    
+    def tf_transform(self, transform):
+        import pyfasst.tftransforms.tft as tft
+        samplerate, data = wav.read(self.audio)
+        data = data[:,0] / 2.**15
+        kwargs = {'fmin': 25, 'fmax': 18000, 'bins': 48, 'fs': samplerate,
+                  'perfRast': 1, 'linFTLen': 2048, 'atomHopFactor': .25}
+        return {'cqt': tft.CQTransfo,
+                'minqt': tft.MinQTransfo}[transform](**kwargs), data
+    
+    def bench_CQT_forward(self):
+        transfo, data = self.tf_transform('cqt')
+        return lambda: transfo.computeTransform(data)
+    
+    def bench_CQT_inverse(self):
+        transfo, data = self.tf_transform('cqt')
+        transfo.computeTransform(data)
+        return transfo.invertTransform
+    
+    def bench_MinQT_forward(self):
+        transfo, data = self.tf_transform('minqt')
+        return lambda: transfo.computeTransform(data)
+    
+    def bench_MinQT_inverse(self):
+        transfo, data = self.tf_transform('minqt')
+        transfo.computeTransform(data)
+        return transfo.invertTransform
+    
+    def nsgt_transform(self):
+        from pyfasst.tftransforms.nsgt.cq import CQ_NSGT
+        samplerate, data = wav.read(self.audio)
+        data = data[:,0] / 2.**15
+        return CQ_NSGT(fmin=25, fmax=18000, bins=48, fs=samplerate,
+                       Ls=data.size), data
+    
+    def bench_NSGT_forward(self):
+        transfo, data = self.nsgt_transform()
+        return lambda: transfo.forward(data)
+    
+    def bench_NSGT_inverse(self):
+        transfo, data = self.nsgt_transform()
+        coefs = transfo.forward(data)
+        return lambda: transfo.backward(coefs)
+
+def peak_memory():
+    """The peak resident memory of the current process, in MB, or `None`
+    if it is not available (on Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # in bytes, instead of kB:
+        return maxrss / 2.**20
+    return maxrss / 2.**10
+
+def run_benchmark(name, config, tmpdir):
+    """Runs the benchmark `name` in the current process.
+
+    :returns:
+        a dictionary with the `'times'` of the runs (in s), their
+        `'median'` and `'min'`, the `'peak_memory'` of the process (in MB)
+        and its `'memory_increase'` during the runs.
+    """
+    run = Benchmarks(config, tmpdir).prepare(name)
+    memory = peak_memory()
+    times = []
+    for i in range(config['repeat']):
+        start = time.time()
+        run()
+        times.append(time.time() - start)
+    result = {'times': times,
+              'median': float(np.median(times)),
+              'min': min(times),
+              'peak_memory': peak_memory(),}
+    if memory is not None:
+        result['memory_increase'] = result['peak_memory'] - memory
+    return result
+
+def run_isolated(name, config, tmpdir):
+    """Runs the benchmark `name` in a new python process, see
+    :py:func:`run_benchmark`. If it fails, the result contains the
+    `'error'` message instead.
+    """
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'pyfasst_tests.benchmarks', '--single',
+         '--config', json.dumps(config), '--tmpdir', tmpdir, name],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = process.communicate()
+    if process.returncode:
+        return {'error': err.strip().splitlines()[-1] if err.strip()
+                else 'exit status %d' %process.returncode}
+    return json.loads(out.strip().splitlines()[-1])
+
+def git_commit():
+    """The current commit of the package, if it is in a git repository.
+    """
+    try:
+        process = subprocess.Popen(
+            ['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=os.path.dirname(os.path.abspath(__file__)))
+        out, _ = process.communicate()
+    except OSError:
+        return None
+    if process.returncode:
+        return None
+    return out.strip()
+
+def run_benchmarks(names=None, config=None, isolated=True, verbose=True):
+    """Runs the benchmarks `names` (by default, all of them, see
+    :py:meth:`Benchmarks.names`) with the configuration `config`, which
+    updates `default_config`.
+
+    :returns:
+        the record of the run, with the `'commit'`, `'date'`, `'machine'`,
+        `'config'` and the `'results'` of the benchmarks, by name.
+    """
+    if names is None:
+        names = Benchmarks.names()
+    runconfig = dict(default_config)
+    if config is not None:
+        runconfig.update(config)
+    record = {'commit': git_commit(),
+              'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'machine': {'node': platform.node(),
+                          'processor': platform.processor(),
+                          'python': platform.python_version(),
+                          'numpy': np.__version__,},
+              'config': runconfig,
+              'results': {},}
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for name in names:
+            if isolated:
+                result = run_isolated(name, runconfig, tmpdir)
+            else:
+                result = run_benchmark(name, runconfig, tmpdir)
+            record['results'][name] = result
+            if verbose:
+                print format_result(name, result)
+    finally:
+        shutil.rmtree(tmpdir)
+    return record
+
+def format_result(name, result):
+    if 'error' in result:
+        return '%-32s failed: %s' %(name, result['error'])
+    line = '%-32s %10.4fs (min %.4fs)' %(name, result['median'],
+                                         result['min'])
+    if result.get('peak_memory') is not None:
+        line += ' %9.1fMB peak, %+9.1fMB' %(result['peak_memory'],
+                                            result['memory_increase'])
+    return line
+
+def load_history(filename):
+    """Loads the records of the history file `filename`, oldest first.
+    """
+    if not os.path.isfile(filename):
+        return []
+    with open(filename) as fileobj:
+        return [json.loads(line) for line in fileobj if line.strip()]
+
+def save_record(filename, record):
+    """Appends `record` to the history file `filename`.
+    """
+    with open(filename, 'a') as fileobj:
+        fileobj.write(json.dumps(record, sort_keys=True) + '\n')
+
+def compare(record, history, tolerance=0.2):
+    """Compares the results of `record` with the last record of `history`
+    with the same configuration, on the same machine.
+
+    :returns:
+        the list of the regressions, as tuples ``(name, quantity, previous,
+        current)``, where the median time or the peak memory of the
+        benchmark `name` increased by more than `tolerance` (relative).
+    """
+    previous = None
+    for past in history:
+        if past['config'] == record['config'] and \
+               past['machine'] == record['machine']:
+            previous = past
+    if previous is None:
+        return []
+    regressions = []
+    for name, result in record['results'].items():
+        past = previous['results'].get(name)
+        if past is None or 'error' in past or 'error' in result:
+            continue
+        for quantity in ('median', 'peak_memory'):
+            if result.get(quantity) is None or past.get(quantity) is None:
+                continue
+            if result[quantity] > (1 + tolerance) * past[quantity]:
+                regressions.append((name, quantity, past[quantity],
+                                    result[quantity]))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmarks of pyfasst, on a synthetic mixture.")
+    parser.add_argument('names', nargs='*',
+                        help="the benchmarks to run, among: " +
+                        ", ".join(Benchmarks.names()))
+    parser.add_argument('--duration', type=float,
+                        help="duration of the mixture, in s")
+    parser.add_argument('--nsources', type=int,
+                        help="number of sources in the mixture")
+    parser.add_argument('--iterations', type=int,
+                        help="iterations of the SIMM and NMF algorithms")
+    parser.add_argument('--repeat', type=int,
+                        help="number of timed runs of each benchmark")
+    parser.add_argument('--history', default=default_history,
+                        help="the history file, where the results are "+
+                        "appended")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="relative increase considered as a regression")
+    parser.add_argument('--no-save', action='store_true',
+                        help="do not append the results to the history")
+    parser.add_argument('--in-process', action='store_true',
+                        help="run all the benchmarks in this process "+
+                        "(the peak memories are then cumulative)")
+    # internal, to run one benchmark in its own process:
+    parser.add_argument('--single', action='store_true',
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--config', help=argparse.SUPPRESS)
+    parser.add_argument('--tmpdir', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        result = run_benchmark(args.names[0], json.loads(args.config),
+                               args.tmpdir)
+        print json.dumps(result)
+        return 0
+
+    config = dict((key, getattr(args, key))
+                  for key in ('duration', 'nsources', 'iterations', 'repeat')
+                  if getattr(args, key) is not None)
+    record = run_benchmarks(names=args.names or None, config=config,
+                            isolated=not args.in_process)
+    regressions = compare(record, load_history(args.history),
+                          tolerance=args.tolerance)
+    for name, quantity, previous, current in regressions:
+        print "REGRESSION %s: %s %.4g -> %.4g" %(name, quantity,
+                                                 previous, current)
+    if not args.no_save:
+        save_record(args.history, record)
+    return int(len(regressions) > 0)
+
+if __name__ == '__main__':
+    sys.exit(main())
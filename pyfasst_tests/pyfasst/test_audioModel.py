@@ -6,7 +6,11 @@
 from ..testing import *
 
 import numpy as np
+import os, shutil, tempfile, json
+import scipy.io.wavfile as wav
 import pyfasst.audioModel as am
+from pyfasst.modelStore import ModelStore
+from pyfasst.tools.profiling import JSONLinesSink
 
 from unittest import TestCase
 
@@ -21,4 +25,653 @@ class FASSTTestCase(TestCase):
             'nbComps' : 3,
             }
         
+    def fit_with(self, estimate=True, **kwargs):
+        """Returns the model built with `fasstkwargs` and the options
+        `kwargs`, from the same random initialization, and the
+        log-likelihoods of its estimation (`None` if not `estimate`).
+        """
+        np.random.seed(0)
+        model = am.MultiChanNMFInst_FASST(**dict(self.fasstkwargs, **kwargs))
+        logliks = None
+        if estimate:
+            logliks = model.estim_param_a_post_model()
+        return model, logliks
+        
+    def read_separations(self, model):
+        """Returns the images of the spatial components separated by
+        `model`, as written in wav files.
+        """
+        dir_results = tempfile.mkdtemp()
+        try:
+            model.separate_spat_comps(dir_results=dir_results)
+            return [wav.read(filename)[1]
+                    for filename in model.files['spat_comp']]
+        finally:
+            shutil.rmtree(dir_results)
+        
+    def assert_arrays_close(self, arrays, arrays_ref):
+        """the arrays are almost equal to the reference ones, relatively to
+        the maximum of each reference array
+        """
+        assert_equal(len(arrays), len(arrays_ref))
+        for array, array_ref in zip(arrays, arrays_ref):
+            scale = np.max(np.abs(array_ref))
+            assert_array_almost_equal(array / scale, array_ref / scale)
+        
+    def test_suff_stat_engines(self, ):
+        """the einsum engine gives the same sufficient statistics as the loop
+        """
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        model.noise['PSD'] = model.noise['ann_PSD_lim'][0]
+        spat_comp_powers, mix_matrix, _ = model.retrieve_subsrc_params()
+        stats_loop = model.compute_suff_stat_loop(spat_comp_powers,
+                                                  mix_matrix)
+        stats_einsum = model.compute_suff_stat_einsum(spat_comp_powers,
+                                                      mix_matrix)
+        for stat_loop, stat_einsum in zip(stats_loop, stats_einsum):
+            assert_array_almost_equal(stat_einsum / np.max(np.abs(stat_loop)),
+                                      stat_loop / np.max(np.abs(stat_loop)))
+        
+    def test_suff_stat_nchan(self, ):
+        """the N-channel sufficient statistics match the stereo ones
+        """
+        model = am.MultiChanNMFConv(**self.fasstkwargs)
+        model.makeItConvolutive()
+        model.noise['PSD'] = model.noise['ann_PSD_lim'][0]
+        spat_comp_powers, mix_matrix, _ = model.retrieve_subsrc_params()
+        mix_matrix += 0.1j * np.random.randn(*mix_matrix.shape)
+        stats_stereo = model.compute_suff_stat_einsum(spat_comp_powers,
+                                                      mix_matrix)
+        stats_nchan = model.compute_suff_stat_nchan(spat_comp_powers,
+                                                    mix_matrix)
+        for stat_stereo, stat_nchan in zip(stats_stereo, stats_nchan):
+            assert_array_almost_equal(
+                stat_nchan / np.max(np.abs(stat_stereo)),
+                stat_stereo / np.max(np.abs(stat_stereo)))
+        
+    def test_nchan_estimation(self, ):
+        """the estimation on a 4-channel mixture of 2 sources, with the
+        N-channel statistics, is finite and increases the likelihood, and
+        the N-channel statistics match the stereo ones on 2 channels
+        """
+        np.random.seed(0)
+        samplerate = 16000
+        t = np.arange(samplerate) * 1. / samplerate
+        sources = np.array([np.sin(2 * np.pi * 220. * t) * (t < .6),
+                            np.sin(2 * np.pi * 330. * t) * (t > .3)])
+        # instantaneous mixture, with more channels than sources:
+        mixture = np.dot(np.random.rand(4, 2), sources).T
+        mixture *= 0.9 * 2**15 / np.max(np.abs(mixture))
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'mixture.wav')
+            wav.write(filename, samplerate, np.int16(mixture))
+            model = am.MultiChanNMFInst_FASST(
+                audio=filename, nbComps=2, spatial_rank=1, iter_num=10,
+                sim_ann_opt='no_ann', verbose=False)
+            logliks = model.estim_param_a_post_model()
+            filename = os.path.join(tmpdir, 'stereo.wav')
+            wav.write(filename, samplerate, np.int16(mixture[:, :2]))
+            stereo = am.MultiChanNMFInst_FASST(
+                audio=filename, nbComps=2, spatial_rank=1,
+                sim_ann_opt='no_ann', verbose=False)
+        finally:
+            shutil.rmtree(tmpdir)
+        assert_equal(model.audioObject.channels, 4)
+        # with the renormalizations, the GEM iterations are not monotonic:
+        assert_true(np.all(np.isfinite(logliks)))
+        assert_true(logliks[-1] > logliks[0])
+        stereo.noise['PSD'] = stereo.noise['ann_PSD_lim'][1]
+        spat_comp_powers, mix_matrix, _ = stereo.retrieve_subsrc_params()
+        stats_stereo = stereo.compute_suff_stat_einsum(spat_comp_powers,
+                                                       mix_matrix)
+        stats_nchan = stereo.compute_suff_stat_nchan(spat_comp_powers,
+                                                     mix_matrix)
+        for stat_stereo, stat_nchan in zip(stats_stereo, stats_nchan):
+            assert_array_almost_equal(
+                stat_nchan / np.max(np.abs(stat_stereo)),
+                stat_stereo / np.max(np.abs(stat_stereo)))
+        
+    def test_suff_stat_frames(self, ):
+        """the mixing statistics on subsets of frames are consistent
+        """
+        model = am.MultiChanNMFInst_FASST(mixStatFraction=1.,
+                                          **self.fasstkwargs)
+        model.noise['PSD'] = model.noise['ann_PSD_lim'][0]
+        spat_comp_powers, mix_matrix, _ = model.retrieve_subsrc_params()
+        stats = model.compute_suff_stat_einsum(spat_comp_powers, mix_matrix)
+        # all the frames, with uniform weights:
+        statFrames, statWeights = model.draw_stat_frames()
+        assert_array_equal(statFrames, np.arange(model.nbFramesSigRepr))
+        stats_frames = model.compute_suff_stat(
+            spat_comp_powers, mix_matrix,
+            statFrames=statFrames, statWeights=statWeights)
+        for stat, stat_frames in zip(stats, stats_frames):
+            assert_array_almost_equal(stat_frames / np.max(np.abs(stat)),
+                                      stat / np.max(np.abs(stat)))
+        for mixStatSampling in ('uniform', 'energy'):
+            model = am.MultiChanNMFInst_FASST(mixStatFraction=.2,
+                                              mixStatSampling=mixStatSampling,
+                                              **self.fasstkwargs)
+            statFrames, statWeights = model.draw_stat_frames()
+            assert_equal(len(statFrames),
+                         int(np.ceil(.2 * model.nbFramesSigRepr)))
+            logliks = model.estim_param_a_post_model()
+            assert_true(np.all(np.isfinite(logliks)))
+            assert_equal(model.mix_stats['nb_updates'], model.iter_num)
+        
+    def test_compact_cx(self, ):
+        """the real diagonal of Cx gives the same statistics and estimates
+        """
+        model, _ = self.fit_with(estimate=False)
+        compact, _ = self.fit_with(estimate=False, compactCx=True)
+        assert_true(np.isrealobj(compact.Cx[0]))
+        assert_array_almost_equal(np.array(compact.Cx), model.Cx)
+        model.noise['PSD'] = model.noise['ann_PSD_lim'][0]
+        compact.noise['PSD'] = compact.noise['ann_PSD_lim'][0]
+        spat_comp_powers, mix_matrix, _ = model.retrieve_subsrc_params()
+        for engine in ('loop', 'einsum', 'nchan'):
+            method = 'compute_suff_stat_' + engine
+            stats = getattr(model, method)(spat_comp_powers, mix_matrix)
+            stats_compact = getattr(compact, method)(spat_comp_powers,
+                                                     mix_matrix)
+            for stat, stat_compact in zip(stats, stats_compact):
+                assert_array_almost_equal(
+                    stat_compact / np.max(np.abs(stat)),
+                    stat / np.max(np.abs(stat)))
+        assert_array_almost_equal(compact.comp_mono_Cx(),
+                                  model.comp_mono_Cx())
+        assert_array_almost_equal(compact.estim_param_a_post_model(),
+                                  model.estim_param_a_post_model())
+        
+    def test_spec_power_cache(self, ):
+        """the cached spectral powers follow the updates of the factors
+        """
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        factor = model.spec_comps[0]['factor'][0]
+        model.spec_comps[0]['factor'][1] = {
+            'FB': np.random.rand(*factor['FB'].shape),
+            'FW': np.copy(factor['FW']),
+            'TW': np.random.rand(*factor['TW'].shape),
+            'TB': [],}
+        model.init_spec_power_cache()
+        model.spec_comps[0]['factor'][1]['TW'][:, 0] = 0.
+        model.update_spec_power_cache(0, 1)
+        model.spec_comps[0]['factor'][0]['FB'] *= 2.
+        model.update_spec_power_cache(0, 0)
+        # the power of factor 1 now has zeros:
+        model.spec_comps[0]['factor'][1]['FB'] *= 3.
+        model.update_spec_power_cache(0, 1)
+        for spat_ind in model.spat_comps:
+            assert_array_almost_equal(
+                model.spec_power_cache['spat'][spat_ind],
+                model.comp_spat_comp_power(spat_ind))
+        
+    def test_total_power_cache(self, ):
+        """with correlation penalization, the cached total power follows
+        the updates of the spectral components
+        """
+        model = am.MultiChanNMFInst_FASST(lambdaCorr=.1, **self.fasstkwargs)
+        model.init_spec_power_cache()
+        hat_W = np.random.rand(len(model.spat_comps), model.nbFreqsSigRepr,
+                               model.nbFramesSigRepr)
+        for spec_comp_ind in model.spec_comps:
+            model.update_spectral_component(spec_comp_ind, hat_W)
+        total = np.sum([model.comp_spat_comp_power(spat_ind)
+                        for spat_ind in model.spat_comps], axis=0)
+        assert_array_almost_equal(model.spec_power_cache['total'] /
+                                  total.max(),
+                                  total / total.max())
+        
+    def test_single_precision(self, ):
+        """separations in single and double precisions are close
+        """
+        model, _ = self.fit_with(dtype=np.float64)
+        single, _ = self.fit_with(dtype=np.float32)
+        assert_equal(single.Cx.dtype, np.complex64)
+        assert_equal(single.spec_comps[0]['factor'][0]['FB'].dtype,
+                     np.float32)
+        for sep64, sep32 in zip(self.read_separations(model),
+                                self.read_separations(single)):
+            sep64, sep32 = sep64 * 1., sep32 * 1.
+            snr = 10 * np.log10(np.sum(sep64**2) / np.sum((sep64 - sep32)**2))
+            assert_true(snr > 40)
+        
+    def test_frame_blocks(self, ):
+        """the GEM algorithm by blocks of frames gives the same estimates
+        """
+        model, logliks = self.fit_with()
+        blocks, logliks_blocks = self.fit_with(frameBlockSize=300)
+        assert_true(isinstance(blocks.Cx, np.memmap))
+        assert_array_almost_equal(logliks_blocks, logliks)
+        self.assert_arrays_close(blocks.get_free_params(),
+                                 model.get_free_params())
+        
+    def test_stack_spec_comps(self, ):
+        """the estimation with stacked spectral components is the same
+        """
+        model, _ = self.fit_with()
+        stacked, _ = self.fit_with(stackSpecComps=True)
+        assert_equal(len(stacked.spec_comp_store.groups), 1)
+        factor = stacked.spec_comps[0]['factor'][0]
+        assert_true(factor.is_stacked())
+        assert_equal(set(factor.keys()), set(
+            ['FB', 'FW', 'TW', 'TB', 'FB_frdm_prior', 'FW_frdm_prior',
+             'TW_frdm_prior', 'TB_frdm_prior', 'TW_constr']))
+        self.assert_arrays_close(stacked.get_free_params(),
+                                 model.get_free_params())
+        # a new shape takes the factor out of the stacked arrays:
+        factor['TW'] = np.ones([factor['TW'].shape[0], 10])
+        assert_true(not factor.is_stacked())
+        assert_equal(
+            stacked.spec_comp_store.groups[0].arrays['TW'].shape[-1],
+            stacked.nbFramesSigRepr)
+        
+    def test_threads(self, ):
+        """the concurrent spectral updates give the sequential estimates
+        """
+        model, _ = self.fit_with()
+        threads, _ = self.fit_with(nbThreads=3)
+        assert_equal(len(threads.spec_comps_update_groups()), 3)
+        for param, param_threads in zip(model.get_free_params(),
+                                        threads.get_free_params()):
+            assert_array_equal(param_threads, param)
+        
+    def test_keep_transf(self, ):
+        """the separation with the kept mixture transform is the same
+        """
+        model, _ = self.fit_with()
+        kept, _ = self.fit_with(keepTransf=True)
+        assert_false(hasattr(model, 'mixTransf'))
+        assert_true(hasattr(kept, 'mixTransf'))
+        for sep, sep_kept in zip(self.read_separations(model),
+                                 self.read_separations(kept)):
+            assert_array_equal(sep_kept, sep)
+        
+    def test_separate_in_memory(self, ):
+        """the separated images are returned, with or without files
+        """
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        model.estim_param_a_post_model()
+        images = model.separate_spat_comps(writeFiles=False)
+        assert_equal(len(images), len(model.spat_comps))
+        dir_results = tempfile.mkdtemp()
+        try:
+            images_written = model.separate_spat_comps(
+                dir_results=dir_results)
+            written = [wav.read(filename)[1]
+                       for filename in model.files['spat_comp']]
+        finally:
+            shutil.rmtree(dir_results)
+        for image, image_written, data in zip(images, images_written,
+                                              written):
+            assert_array_equal(image_written, image)
+            assert_equal(image.shape, data.shape)
+            assert_array_equal(
+                np.int16(image * model.audioObject._maxdata), data)
+        
+    def test_separate_frame_blocks(self, ):
+        """the separation by blocks of frames gives the same images
+        """
+        model, _ = self.fit_with(estimate=False)
+        blocks, _ = self.fit_with(estimate=False, frameBlockSize=300)
+        self.assert_arrays_close(blocks.separate_spat_comps(writeFiles=False),
+                                 model.separate_spat_comps(writeFiles=False))
+        
+    def test_stream(self, ):
+        """the streaming separation returns finite images as long as the
+        input, also after silent blocks
+        """
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        model.estim_param_a_post_model()
+        TW = np.copy(model.spec_comps[0]['factor'][0]['TW'])
+        stream = am.StreamFASST(model, nbIterPerBlock=2)
+        # the signal of tamy.wav starts after 27513 zeros:
+        data = model.audioObject.data[30000:50000]
+        silence_data = np.concatenate((np.zeros([6000, 2]), data))
+        streams = []
+        # two consecutive streams of the same signal, then silence and
+        # the signal:
+        for signal in (data, data, silence_data):
+            images = [[] for spat_ind in model.spat_comps]
+            for start in range(0, signal.shape[0], 3000):
+                for image, new_samples in zip(
+                        images, stream.process(signal[start:start + 3000])):
+                    image.append(new_samples)
+            for image, new_samples in zip(images, stream.flush()):
+                image.append(new_samples)
+            images = [np.concatenate(image) for image in images]
+            for image in images:
+                assert_equal(image.shape, signal.shape)
+                assert_true(np.all(np.isfinite(image)))
+            streams.append(images)
+        for image, image_again in zip(*streams[:2]):
+            assert_true(np.max(np.abs(image)) > 0)
+            assert_array_almost_equal(image_again, image)
+        for image in streams[2]:
+            assert_true(np.max(np.abs(image[6000:])) > 0)
+        assert_true(np.all(model.spec_comps[0]['factor'][0]['TW'] == TW))
+        
+    def test_warm_start(self, ):
+        """a model warm started from the store starts from the fitted one
+        """
+        np.random.seed(0)
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        model.estim_param_a_post_model()
+        dir_results = tempfile.mkdtemp()
+        try:
+            store = ModelStore(dir_results)
+            store.save(model, 'tamy', artist='tamy')
+            assert_equal(store.find(artist='tamy'), ['tamy'])
+            assert_equal(store.find(artist='other'), [])
+            # the components of another class have another structure:
+            other = am.MultiChanNMFConv(**self.fasstkwargs)
+            assert_equal(store.find(model=other, artist='tamy'), [])
+            assert_raises(ValueError, store.warm_start, other, 'tamy')
+            warm = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+            assert_equal(store.warm_start(warm, artist='tamy'), 'tamy')
+        finally:
+            shutil.rmtree(dir_results)
+        for spec_ind in model.spec_comps:
+            factor = model.spec_comps[spec_ind]['factor'][0]
+            warm_factor = warm.spec_comps[spec_ind]['factor'][0]
+            assert_equal(warm_factor['TW'].shape, factor['TW'].shape)
+            assert_array_almost_equal(
+                warm_factor['FB'] / np.max(factor['FB']),
+                factor['FB'] / np.max(factor['FB']))
+        
+    def test_warm_start_discrete_states(self, ):
+        """the weights of the discrete states are adapted to the number of
+        frames of the warm started model
+        """
+        np.random.seed(0)
+        # the weights of the states are estimated with the SHMM:
+        model = am.MultiChanHMM(**self.fasstkwargs)
+        model.makeItSHMM()
+        model.estim_param_a_post_model()
+        assert_equal(model.spec_comps[0]['factor'][0]['TW_all'].shape[1],
+                     model.nbFramesSigRepr)
+        # another number of frames, with a smaller hop size:
+        warm = am.MultiChanHMM(hopsize=256, **self.fasstkwargs)
+        warm.makeItSHMM()
+        assert_true(warm.nbFramesSigRepr != model.nbFramesSigRepr)
+        warm.warm_start(model.spec_comps, model.spat_comps)
+        for spec_comp in warm.spec_comps.values():
+            factor = spec_comp['factor'][0]
+            assert_equal(factor['TW_all'].shape,
+                         (factor['TW'].shape[0], warm.nbFramesSigRepr))
+        logliks = warm.estim_param_a_post_model()
+        assert_true(np.all(np.isfinite(logliks)))
+        
+    def test_squarem(self, ):
+        """the accelerated iterations do not decrease the log-likelihood
+        """
+        self.fasstkwargs.update({'iter_num': 9, 'sim_ann_opt': 'no_ann'})
+        records = []
+        model = am.MultiChanNMFInst_FASST(acceleration='squarem',
+                                          profileSinks=[records.append],
+                                          **self.fasstkwargs)
+        params = model.get_free_params()
+        model.set_free_params(params)
+        for param, param_set in zip(params, model.iter_free_params()):
+            assert_array_equal(param_set, param)
+        # no extrapolation for a stationary trajectory:
+        for param, param_extra in zip(
+                params, model.extrapolate_params(params, params, params)):
+            assert_array_equal(param_extra, param)
+        # the real mixing parameters become complex, the spectral ones
+        # stay positive:
+        nbSpat = len(model.spat_comps)
+        params1 = [param + .1j if n < nbSpat else 1.1 * param
+                   for n, param in enumerate(params)]
+        params2 = [param + .3j if n < nbSpat else 1.3 * param
+                   for n, param in enumerate(params)]
+        params_extra = model.extrapolate_params(params, params1, params2)
+        for n, param_extra in enumerate(params_extra):
+            assert_equal(param_extra.dtype, params2[n].dtype)
+            if n < nbSpat:
+                assert_true(np.all(np.imag(param_extra) > .29))
+            else:
+                assert_true(np.all(param_extra >= 0))
+        logliks = model.estim_param_a_post_model()
+        assert_equal(len(logliks), 9)
+        # one GEM iteration per call, even for a rejected extrapolation:
+        assert_equal(len(records), 9)
+        assert_equal(model.accel_state['phase'], 0)
+        assert_true(np.all(np.diff(logliks) > - 1e-6 * np.abs(logliks[1:])))
+        
+    def test_coarse_to_fine(self, ):
+        """the coarse to fine estimation ends at full resolution, close to
+        the full resolution estimation
+        """
+        np.random.seed(0)
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        Cx = np.copy(model.Cx)
+        logliks_coarse, logliks = model.estim_param_coarse_to_fine(
+            decimation=3, fineIterNum=2)
+        assert_equal(len(logliks_coarse), model.iter_num)
+        assert_equal(len(logliks), 2)
+        assert_true(np.all(np.isfinite(logliks)))
+        assert_array_equal(model.Cx, Cx)
+        for spec_comp in model.spec_comps.values():
+            assert_equal(spec_comp['factor'][0]['TW'].shape[1],
+                         model.nbFramesSigRepr)
+        assert_equal(model.noise['sim_ann_opt'], 'ann')
+        # as many iterations at full resolution:
+        np.random.seed(0)
+        self.fasstkwargs['iter_num'] += 2
+        full = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        logliks_full = full.estim_param_a_post_model()
+        assert_true(np.abs(logliks[-1] - logliks_full[-1]) <=
+                    .05 * np.abs(logliks_full[-1]))
+        # the stacked factors are upsampled in their stacked arrays:
+        np.random.seed(0)
+        self.fasstkwargs['iter_num'] -= 2
+        stacked = am.MultiChanNMFInst_FASST(stackSpecComps=True,
+                                            **self.fasstkwargs)
+        logliks_stacked = stacked.estim_param_coarse_to_fine(
+            decimation=3, fineIterNum=2)[1]
+        for spec_comp in stacked.spec_comps.values():
+            assert_true(spec_comp['factor'][0].is_stacked())
+        assert_array_almost_equal(logliks_stacked / np.abs(logliks[-1]),
+                                  logliks / np.abs(logliks[-1]))
+        
+    def test_state_IS_divergences(self, ):
+        """the batched divergences of the discrete states match the loop
+        over the states
+        """
+        model = am.MultiChanNMFInst_FASST(stateBlockSize=2,
+                                          **self.fasstkwargs)
+        hat_W = np.random.rand(model.nbFreqsSigRepr, model.nbFramesSigRepr)
+        factor = model.spec_comps[1]['factor'][0]
+        # with a second factor, the states are evaluated by blocks:
+        model.spec_comps[1]['factor'][1] = {
+            'FB': np.random.rand(*factor['FB'].shape),
+            'FW': np.copy(factor['FW']),
+            'TW': np.random.rand(*factor['TW'].shape),
+            'TB': [],}
+        for spec_ind in (0, 1):
+            model.init_spec_power_cache()
+            factor = model.spec_comps[spec_ind]['factor'][0]
+            spat_ind = model.spec_comps[spec_ind]['spat_comp_ind']
+            factor['TW_all'] = np.random.rand(*factor['TW'].shape) + .5
+            TW_all = np.copy(factor['TW_all'])
+            ISdivMatrix = model.comp_state_IS_divergences(
+                spec_ind, 0, hat_W,
+                model.comp_other_factors_power(spec_ind, 0))
+            for state in range(factor['TW'].shape[0]):
+                factor['TW'][:] = 0.
+                factor['TW'][state] = TW_all[state]
+                W_V_ratio = hat_W / np.maximum(
+                    model.comp_spat_comp_power(spat_ind), model.eps)
+                ISdiv = np.sum(W_V_ratio - np.log(W_V_ratio) - 1, axis=0)
+                assert_array_almost_equal(ISdivMatrix[state] / ISdiv.max(),
+                                          ISdiv / ISdiv.max())
+            assert_array_almost_equal(factor['TW_all'], TW_all)
+        
+    def test_decode_state_sequence(self, ):
+        """the HMM states are decoded with the Viterbi algorithm
+        """
+        from pyfasst.SeparateLeadStereo.tracking.tracking import (
+            viterbiTrackingArray)
+        model = am.MultiChanHMM(**self.fasstkwargs)
+        model.makeItSHMM()
+        factor = model.spec_comps[0]['factor'][0]
+        nbStates = factor['TW_DP_params'].shape[0]
+        ISdivMatrix = np.random.rand(nbStates, 50) * 10
+        assert_array_equal(
+            model.decode_state_sequence(factor, ISdivMatrix),
+            viterbiTrackingArray(
+                - ISdivMatrix, np.log(np.ones(nbStates) / nbStates),
+                np.log(factor['TW_DP_params'] + model.eps)))
+        factor['TW_constr'] = 'GSMM'
+        factor['TW_DP_params'] = np.ones(nbStates) / nbStates
+        assert_array_equal(
+            model.decode_state_sequence(factor, ISdivMatrix),
+            np.argmin(ISdivMatrix, axis=0))
+        
+    def test_state_params_reestimation(self, ):
+        """the transition probabilities are re-estimated from the hard and
+        soft counts of the transitions
+        """
+        model = am.MultiChanHMM(**self.fasstkwargs)
+        model.makeItSHMM()
+        factor = model.spec_comps[0]['factor'][0]
+        nbStates = factor['TW_DP_params'].shape[0]
+        active_state_seq = np.random.randint(nbStates - 1, size=200)
+        counts = model.comp_state_counts(factor, active_state_seq)
+        for prevstate in range(nbStates):
+            for nextstate in range(nbStates):
+                assert_equal(counts[prevstate, nextstate],
+                             np.sum((active_state_seq[:-1] == prevstate) *
+                                    (active_state_seq[1:] == nextstate)))
+        # with well separated states, the soft counts are the hard ones:
+        ISdivMatrix = 1000. * np.ones([nbStates, 200])
+        ISdivMatrix[active_state_seq, np.arange(200)] = 0.
+        assert_array_almost_equal(
+            model.comp_expected_state_counts(factor, ISdivMatrix), counts)
+        # the last state never occurs, its transitions are kept:
+        last_transitions = np.copy(factor['TW_DP_params'][-1])
+        factor['TW_DP_prior_counts'] = 1.
+        model.reestimate_state_params(factor, counts)
+        assert_array_almost_equal(
+            factor['TW_DP_params'][:-1],
+            (counts[:-1] + 1.) / np.vstack(counts[:-1].sum(axis=1) +
+                                           nbStates))
+        assert_array_equal(factor['TW_DP_params'][-1], last_transitions)
+        
+    def test_profile_sinks(self, ):
+        """the stages of the GEM iterations are reported to the sinks
+        """
+        records = []
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'profile.jsonl')
+            model = am.MultiChanNMFInst_FASST(
+                profileSinks=[records.append, JSONLinesSink(filename)],
+                **self.fasstkwargs)
+            logliks = model.estim_param_a_post_model()
+            with open(filename) as fileobj:
+                lines = [json.loads(line) for line in fileobj]
+        finally:
+            shutil.rmtree(tmpdir)
+        assert_equal(len(records), model.iter_num)
+        assert_equal(len(lines), model.iter_num)
+        for i, record in enumerate(records):
+            assert_equal(record['iteration'], i)
+            assert_almost_equal(record['loglik'], logliks[i])
+            assert_equal(set(record['stages'].keys()),
+                         set(['retrieve_subsrc_params', 'compute_suff_stat',
+                              'update_mix_matrix',
+                              'update_spectral_components',
+                              'renormalize_parameters']))
+            assert_true(record['stages']['compute_suff_stat']['array_bytes']
+                        > 0)
+        assert_equal(set(lines[-1]['stages'].keys()),
+                     set(records[-1]['stages'].keys()))
+        
+    def test_stopping_criteria(self, ):
+        """the estimation stops early, at the end of the annealing schedule
+        """
+        self.fasstkwargs['iter_num'] = 10
+        model = am.MultiChanNMFInst_FASST(
+            callback=lambda model, i, loglik: i >= 1, **self.fasstkwargs)
+        logliks = model.estim_param_a_post_model()
+        assert_equal(len(logliks), 2)
+        # any improvement is too small: the schedule is compressed
+        model = am.MultiChanNMFInst_FASST(tol=np.inf, patience=1,
+                                          **self.fasstkwargs)
+        logliks = model.estim_param_a_post_model()
+        assert_equal(len(logliks), 3)
+        psd_end = (0.1 * np.sqrt(model.noise['ann_PSD_lim'][0]) +
+                   0.9 * np.sqrt(model.noise['ann_PSD_lim'][1])) ** 2
+        assert_array_almost_equal(model.noise['PSD'] / np.max(psd_end),
+                                  psd_end / np.max(psd_end))
+        
+    def test_checkpoint_resume(self, ):
+        """a resumed estimation continues exactly where it was interrupted
+        """
+        def interrupt(model, i, loglik):
+            if i == 2:
+                raise KeyboardInterrupt
+        self.fasstkwargs['iter_num'] = 4
+        np.random.seed(0)
+        model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+        logliks = model.estim_param_a_post_model()
+        dir_results = tempfile.mkdtemp()
+        try:
+            self.fasstkwargs.update({
+                'checkpointFile': os.path.join(dir_results, 'state.npz'),
+                'checkpointEvery': 2,
+                'cxCacheFile': os.path.join(dir_results, 'Cx.npy'),})
+            np.random.seed(0)
+            interrupted = am.MultiChanNMFInst_FASST(callback=interrupt,
+                                                    **self.fasstkwargs)
+            assert_raises(KeyboardInterrupt,
+                          interrupted.estim_param_a_post_model)
+            resumed = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+            assert_true(isinstance(resumed.Cx, np.memmap))
+            logliks_resumed = resumed.resume_estimation()
+        finally:
+            shutil.rmtree(dir_results)
+        assert_true(np.all(logliks_resumed == logliks))
+        for spec_ind in model.spec_comps:
+            assert_true(np.all(
+                resumed.spec_comps[spec_ind]['factor'][0]['TW'] ==
+                model.spec_comps[spec_ind]['factor'][0]['TW']))
+        for spat_ind in model.spat_comps:
+            assert_true(np.all(resumed.spat_comps[spat_ind]['params'] ==
+                               model.spat_comps[spat_ind]['params']))
+
+    def test_cx_cache_validation(self, ):
+        """the cached Cx is only loaded for the same signal representation
+        """
+        dir_results = tempfile.mkdtemp()
+        try:
+            cxCacheFile = os.path.join(dir_results, 'Cx.npy')
+            self.fasstkwargs['cxCacheFile'] = cxCacheFile
+            model = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+            assert_true(os.path.isfile(cxCacheFile + '.json'))
+            cached = am.MultiChanNMFInst_FASST(**self.fasstkwargs)
+            assert_true(isinstance(cached.Cx, np.memmap))
+            assert_array_equal(cached.Cx, model.Cx)
+            # another hop size: the cache is computed again
+            other = am.MultiChanNMFInst_FASST(hopsize=256,
+                                              **self.fasstkwargs)
+            assert_false(isinstance(other.Cx, np.memmap))
+            assert_equal(np.load(cxCacheFile).shape, other.Cx.shape)
+            assert_true(other.Cx.shape != model.Cx.shape)
+            compact = am.MultiChanNMFInst_FASST(hopsize=256, compactCx=True,
+                                                **self.fasstkwargs)
+            assert_true(isinstance(compact.Cx.off, np.memmap))
+            assert_array_almost_equal(np.array(compact.Cx), other.Cx)
+        finally:
+            shutil.rmtree(dir_results)
+    
+    def test_suff_stat_engine_not_implemented(self, ):
+        """an unknown sufficient statistics engine raises an error
+        """
+        assert_raises(NotImplementedError, am.MultiChanNMFInst_FASST,
+                      suffStatEngine='blas', **self.fasstkwargs)
+        
 # class FASSTTestCase
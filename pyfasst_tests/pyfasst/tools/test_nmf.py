@@ -0,0 +1,29 @@
+"""tests for pyfasst.tools.nmf
+
+2013 Jean-Louis Durrieu
+"""
+
+from ...testing import *
+
+import numpy as np
+import pyfasst.tools.nmf as nmf
+from pyfasst.tools.distances import ISDistortion
+
+def test_NMF_multi_restart():
+    """the multi-restart NMF keeps the best start, in a process pool or not
+    """
+    SX = np.dot(np.random.rand(30, 3), np.random.rand(3, 40)) + .1
+    Winit = np.random.rand(30, 3)
+    Hinit = np.random.rand(3, 40)
+    W, H = nmf.NMF_multi_restart(SX, nbComps=3, niter=5, restartIter=5,
+                                 Winit=Winit, Hinit=Hinit,
+                                 nbRestarts=4, seed=1)
+    W0, H0 = nmf.NMF_decomp_init(SX, nbComps=3, niter=5,
+                                 Winit=Winit, Hinit=Hinit)
+    assert_true(ISDistortion(SX, np.dot(W, H)) <=
+                ISDistortion(SX, np.dot(W0, H0)) + 1e-8)
+    W2, H2 = nmf.NMF_multi_restart(SX, nbComps=3, niter=5, restartIter=5,
+                                   Winit=Winit, Hinit=Hinit,
+                                   nbRestarts=4, seed=1, nbProcesses=2)
+    assert_array_almost_equal(W2, W)
+    assert_array_almost_equal(H2, H)
@@ -63,3 +63,112 @@ def test_inv_herm_mat_2d():
         np.zeros_like(inv_sigma_x_off)
         )
 
+
+def test_unpack_herm_mat():
+    """unpack the upper triangular storage of covariance matrices
+    """
+    nc = 3
+    X = np.random.randn(nc, 10) + 1j * np.random.randn(nc, 10)
+    packed_mat = np.zeros([nc * (nc + 1) / 2, 10], dtype=np.complex)
+    for n1 in range(nc):
+        for n2 in range(n1, nc):
+            n = n2 - n1 + np.sum(np.arange(nc, nc-n1, -1))
+            packed_mat[n] = X[n1] * np.conj(X[n2])
+    mat = st.unpack_herm_mat(packed_mat, nc)
+    assert_equal(mat.shape, (10, nc, nc))
+    assert_array_almost_equal(mat,
+                              np.einsum('in,jn->nij', X, np.conj(X)))
+    
+def test_packed_cx():
+    """store the diagonal of packed covariance matrices as real arrays
+    """
+    nc = 3
+    X = np.random.randn(nc, 4, 10) + 1j * np.random.randn(nc, 4, 10)
+    packed_mat = np.zeros([nc * (nc + 1) / 2, 4, 10], dtype=np.complex)
+    for n1 in range(nc):
+        for n2 in range(n1, nc):
+            n = n2 - n1 + np.sum(np.arange(nc, nc-n1, -1))
+            packed_mat[n] = X[n1] * np.conj(X[n2])
+    Cx = st.PackedCx.from_packed(packed_mat)
+    assert_true(np.isrealobj(Cx.diag))
+    assert_equal(Cx.shape, packed_mat.shape)
+    assert_true(np.isrealobj(Cx[nc]))
+    assert_array_almost_equal(np.array(Cx), packed_mat)
+    assert_array_almost_equal(np.mean(Cx, axis=-1),
+                              np.mean(packed_mat, axis=-1))
+    assert_array_almost_equal(np.array(Cx[..., 2:5]),
+                              packed_mat[..., 2:5])
+    assert_array_almost_equal(st.unpack_herm_mat(Cx[:, 1], nc),
+                              st.unpack_herm_mat(packed_mat[:, 1], nc))
+    assert_array_almost_equal(st.herm_mat_diag(Cx, nc),
+                              st.herm_mat_diag(packed_mat, nc))
+    
+def test_inv_herm_mat():
+    """invert stacked 4D Hermitian matrices
+    """
+    nc = 4
+    X = np.random.randn(10, nc, 2 * nc) + 1j * np.random.randn(10, nc, 2 * nc)
+    sigma = np.einsum('nik,njk->nij', X, np.conj(X))
+    inv_sigma, det_sigma = st.inv_herm_mat(sigma)
+    assert_array_almost_equal(
+        np.einsum('nij,njk->nik', inv_sigma, sigma),
+        np.resize(np.eye(nc), (10, nc, nc)))
+    assert_array_almost_equal(det_sigma / np.real(np.linalg.det(sigma)),
+                              np.ones(10))
+    
+def test_inv_herm_mat_singular():
+    """invert singular Hermitian matrices, with diagonal loading
+    """
+    nc = 4
+    # rank 2 matrices, and a null matrix:
+    X = np.random.randn(10, nc, 2) + 1j * np.random.randn(10, nc, 2)
+    sigma = np.einsum('nik,njk->nij', X, np.conj(X))
+    sigma[0] = 0.
+    inv_sigma, det_sigma = st.inv_herm_mat(sigma)
+    assert_true(np.all(np.isfinite(inv_sigma)))
+    assert_true(np.all(det_sigma >= st.eps))
+    # the quadratic forms of the log-likelihood stay non-negative:
+    assert_true(np.all(
+        np.real(np.einsum('nij,nji->n', inv_sigma, sigma)) >= - 1e-6))
+    
+def test_inv_herm_mat_vs_2d():
+    """invert 2D Hermitian matrices, as with inv_herm_mat_2d
+    """
+    sigma = st.unpack_herm_mat(
+        np.array([sigma_x_diag[0], sigma_x_off, sigma_x_diag[1]]), 2)
+    inv_sigma, det_sigma = st.inv_herm_mat(sigma)
+    inv_sigma_x_diag, inv_sigma_x_off, det_sigma_x = (
+        st.inv_herm_mat_2d(sigma_x_diag, sigma_x_off))
+    assert_array_almost_equal(inv_sigma[:, 0, 0] / inv_sigma_x_diag[0],
+                              np.ones(10))
+    assert_array_almost_equal(inv_sigma[:, 1, 1] / inv_sigma_x_diag[1],
+                              np.ones(10))
+    assert_array_almost_equal(inv_sigma[:, 0, 1] / inv_sigma_x_off,
+                              np.ones(10))
+    
+def test_solve_mat():
+    """solve stacked systems, regularising the singular ones
+    """
+    nc = 3
+    X = np.random.randn(10, nc, 2 * nc) + 1j * np.random.randn(10, nc, 2 * nc)
+    a = np.einsum('nik,njk->nij', X, np.conj(X))
+    a[4] = 0
+    # a rank 1 matrix:
+    a[6] = np.outer(X[6, :, 0], np.conj(X[6, :, 0]))
+    b = np.random.randn(10, nc, 2) + 1j * np.random.randn(10, nc, 2)
+    x = st.solve_mat(a, b)
+    assert_true(np.all(np.isfinite(x)))
+    assert_array_almost_equal(x[4], 0 * b[4])
+    assert_array_almost_equal(x[6], np.dot(np.linalg.pinv(a[6]), b[6]))
+    regular = (np.arange(10) != 4) & (np.arange(10) != 6)
+    assert_array_almost_equal(np.einsum('nij,njk->nik', a, x)[regular],
+                              b[regular])
+    
+def test_batch_dot():
+    """stacked matrix products
+    """
+    a = np.random.randn(4, 3, 5)
+    b = np.random.randn(4, 5, 2)
+    c = st.batch_dot(a, b)
+    for g in range(4):
+        assert_array_almost_equal(c[g], np.dot(a[g], b[g]))
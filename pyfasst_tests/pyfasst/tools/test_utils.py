@@ -6,6 +6,7 @@
 from ...testing import * # is this really legal?
 
 import numpy as np
+import json
 import pyfasst.tools.utils as utils
 
 def test_db():
@@ -62,3 +63,22 @@ def test_sqrt_blackmanharris():
             0.57691724,  0.43029881,  0.29549176,  0.18273402,  0.09757199,
             0.04002509,  0.00774597]))
     
+
+def test_flatten_tree():
+    """a flattened structure is rebuilt identically
+    """
+    tree = {0: {'params': np.random.randn(2, 3),
+                'mix_type': 'inst',
+                'factor': {1: {'TB': [], 'TW_DP_params': 9}}},
+            'noise': [np.float32(1.5), None, (np.arange(3), 1e-10)]}
+    skeleton, arrays = utils.flatten_tree(tree)
+    assert_equal(sorted(arrays.keys()),
+                 ['0/params', 'noise/0', 'noise/2/0'])
+    rebuilt = utils.unflatten_tree(json.loads(json.dumps(skeleton)), arrays)
+    assert_true(isinstance(rebuilt[0]['mix_type'], str))
+    assert_equal(rebuilt[0]['factor'][1], {'TB': [], 'TW_DP_params': 9})
+    assert_true(rebuilt[0]['params'] is tree[0]['params'])
+    assert_equal(rebuilt['noise'][0].dtype, np.float32)
+    assert_equal(rebuilt['noise'][1:2], [None])
+    assert_true(isinstance(rebuilt['noise'][2], tuple))
+    assert_array_almost_equal(rebuilt['noise'][2][0], np.arange(3))